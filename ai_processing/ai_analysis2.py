@@ -3,14 +3,21 @@ import pandas as pd
 import json
 import uuid
 import openai
-import requests
 import re
+from io import BytesIO
 import os
 import numpy as np
 import os
 from dotenv import load_dotenv
 import traceback
 from firebase_api.utils import save_summary_to_firestore
+from . import price_store
+from .price_store import PUBLIC_PRICE_CSV_URLS
+from .cache import create_cache
+from .http_client import get_session
+from .utils import run_concurrently
+from .tracing import span
+from .gpt import chat_completion, count_tokens, is_json
 from datetime import datetime, timezone
 load_dotenv()
 
@@ -19,6 +26,17 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 client = openai.OpenAI(api_key=OPENAI_API_KEY)
 NAVER_MAP_CLIENT_ID = os.getenv("NAVER_MAP_CLIENT_ID")
 NAVER_MAP_CLIENT_SECRET = os.getenv("NAVER_MAP_CLIENT_SECRET")
+SOLUTION_TIMEOUT = float(os.getenv("SOLUTION_TIMEOUT", "120"))  # solution_1/2/3 동시 실행 대기 시간(초)
+# 주소 좌표 캐시 설정 (GEOCODE_CACHE_DB가 있으면 워커 재시작 후에도 유지)
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "4096"))
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+GEOCODE_NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL", str(24 * 3600)))
+geocode_cache = create_cache(
+    "geocode",
+    max_size=GEOCODE_CACHE_SIZE,
+    ttl=GEOCODE_CACHE_TTL,
+    db_path=os.getenv("GEOCODE_CACHE_DB")
+)
 
 def remove_bounding_boxes(data):
     """Bounding Box 값을 제거하고 저장하는 함수"""
@@ -101,29 +119,58 @@ def remove_brackets(address):
     cleaned_address = re.sub(r'\s+', ' ', cleaned_address).strip()
     return cleaned_address
 # 네이버 Geocoding API 호출 함수 정의
-def geocode_address(address):
+def _request_geocode(address):
+    """
+    네이버 Geocoding API 호출
+
+    Returns:
+        tuple: ((위도, 경도), 캐시 TTL). 결과 없음은 짧은 TTL로 캐시, API 오류는 캐시하지 않음(False)
+    """
     url = f"https://naveropenapi.apigw.ntruss.com/map-geocode/v2/geocode?query={address}"
     headers = {
         'X-NCP-APIGW-API-KEY-ID': NAVER_MAP_CLIENT_ID,
         'X-NCP-APIGW-API-KEY': NAVER_MAP_CLIENT_SECRET
     }
-    response = requests.get(url, headers=headers)
+    response = get_session("geocoding").get(url, headers=headers)
     if response.status_code == 200:
         data = response.json()
         if data['addresses']:
             location = data['addresses'][0]
-            return location['y'], location['x']
+            return (location['y'], location['x']), GEOCODE_CACHE_TTL
         else:
-            return None, None
+            return (None, None), GEOCODE_NEGATIVE_TTL
     else:
         print(f"Error {response.status_code}: {response.text}")
-        return None, None
+        return (None, None), False
+
+def geocode_address(address):
+    """
+    주소를 (위도, 경도)로 변환 (대괄호/공백을 정리한 주소 기준으로 캐시)
+
+    Returns:
+        tuple: (위도, 경도). 결과가 없으면 (None, None)
+    """
+    normalized = remove_brackets(address)
+    lat, lng = geocode_cache.get_or_load(normalized, lambda: _request_geocode(normalized))
+    return lat, lng
 #gpt 기동
-def analyze_with_gpt(analysis_data):
+def analyze_with_gpt(analysis_data, site="analyze", use_cache=True):
+    """
+    GPT로 데이터를 분석해 JSON 응답을 받는 함수
+
+    Args:
+        analysis_data (str): 분석할 데이터 (프롬프트)
+        site (str): 호출 위치 이름 (GPT 캐시 구분용)
+        use_cache (bool): False면 GPT 응답 캐시를 사용하지 않음
+    """
     message_content = f"다음 데이터를 분석하고 JSON 형식으로 응답해주세요. {analysis_data}"
     
     try:
-        response = client.chat.completions.create(
+        text = chat_completion(
+            client,
+            site,
+            use_cache=use_cache,
+            cache_if=is_json,
             model=MODEL,
             messages=[{
                 "role": "user",
@@ -135,10 +182,10 @@ def analyze_with_gpt(analysis_data):
         
         # 응답 안전하게 파싱
         try:
-            return json.loads(response.choices[0].message.content.strip())
+            return json.loads(text.strip())
         except json.JSONDecodeError as e:
             print(f"JSON 파싱 오류: {e}")
-            print(f"원본 응답: {response.choices[0].message.content}")
+            print(f"원본 응답: {text}")
             
             # 기본 응답 반환
             return {"error": f"JSON 파싱 오류: {str(e)}"}
@@ -185,60 +232,50 @@ def parse_address(address):
             parsed_result[key] = "nan"
 
     return parsed_result
-#공시가 구하기
-def price(address):
-    result = parse_address(address)
-    print(result)
-    # 모든 시도에 대한 GCS 파일 경로 매핑
-    gcs_urls = {
-        "서울특별시": "https://storage.googleapis.com/jipsin/storage/seoul.csv",
-        "부산광역시": "https://storage.googleapis.com/jipsin/storage/busan.csv",
-        "대구광역시": "https://storage.googleapis.com/jipsin/storage/daegu.csv",
-        "인천광역시": "https://storage.googleapis.com/jipsin/storage/incheon.csv",
-        "광주광역시": "https://storage.googleapis.com/jipsin/storage/gwangju.csv",
-        "대전광역시": "https://storage.googleapis.com/jipsin/storage/daejeon.csv",
-        "울산광역시": "https://storage.googleapis.com/jipsin/storage/ulsan.csv",
-        "세종특별자치시": "https://storage.googleapis.com/jipsin/storage/sejong.csv",
-        "경기도": "https://storage.googleapis.com/jipsin/storage/gyeonggi.csv",
-        "강원특별자치도": "https://storage.googleapis.com/jipsin/storage/gangwon.csv",
-        "충청북도": "https://storage.googleapis.com/jipsin/storage/chungbuk.csv",
-        "충청남도": "https://storage.googleapis.com/jipsin/storage/chungnam.csv",
-        "전라북도": "https://storage.googleapis.com/jipsin/storage/jeunbuk.csv",
-        "전라남도": "https://storage.googleapis.com/jipsin/storage/jeunnam.csv",
-        "경상북도": "https://storage.googleapis.com/jipsin/storage/gyeongbuk.csv",
-        "경상남도": "https://storage.googleapis.com/jipsin/storage/gyeongnam.csv",
-        "제주특별자치도": "https://storage.googleapis.com/jipsin/storage/jeju.csv",
-    }
-    gcs_url = gcs_urls.get(result["시도"], None)
-
-    if gcs_url:
-        df = pd.read_csv(gcs_url)
-    else:
+def _price_candidates_from_csv(result):
+    """공시가격 저장소에 해당 시도가 없을 때 GCS CSV를 직접 읽어 후보 행을 찾는 함수"""
+    gcs_url = PUBLIC_PRICE_CSV_URLS.get(result["시도"], None)
+    if not gcs_url:
         print("해당 시도에 대한 GCS 데이터 없음")
+        return []
+
+    print(f"⚠️ 공시가격 저장소에 {result['시도']} 데이터가 없어 CSV를 직접 읽습니다: {gcs_url}")
+    response = get_session("storage").get(gcs_url)
+    response.raise_for_status()
+    df = pd.read_csv(BytesIO(response.content))
+    keys = {column: df[column].map(price_store.normalize_key) for column in price_store.KEY_COLUMNS}
     cost = df[
-        (df['시도']==result["시도"]) &
-        (df['시군구']==result["시군구"]) &
-        (df['동리']==result["동리"]) &
-        (df["동명"]==result["동명"]) &
-        (df["호명"]==result["호명"])
+        (keys['시도']==result["시도"]) &
+        (keys['시군구']==result["시군구"]) &
+        (keys['동리']==result["동리"]) &
+        (keys["동명"]==result["동명"]) &
+        (keys["호명"]==result["호명"])
     ]
 
     if cost.empty:
         cost = df[
-            (df['시도']==result["시도"]) &
-            (df['시군구']==result["시군구"]) &
-            (df['동리']==result["동리"])
+            (keys['시도']==result["시도"]) &
+            (keys['시군구']==result["시군구"]) &
+            (keys['동리']==result["동리"])
         ]
-        
 
-    cost_records = cost.to_dict(orient='records')
+    return cost.to_dict(orient='records')
+
+#공시가 구하기
+def price(address):
+    result = parse_address(address)
+    print(result)
+
+    # 로컬 공시가격 저장소에서 조회 (가져오지 않은 시도는 CSV로 조회)
+    cost_records = price_store.lookup(result)
+    if cost_records is None:
+        cost_records = _price_candidates_from_csv(result)
 
-    # DataFame에서 직접 공시가격 확인 (GPT 호출 없이)
-    if not cost.empty:
-        # 결과가 1개만 있으면 바로 반환
-        if len(cost) == 1:
-            direct_price = cost.iloc[0]['공시가격']
-            return {"공시가격": direct_price, "method": "direct_match"}
+    # 후보에서 직접 공시가격 확인 (GPT 호출 없이)
+    # 결과가 1개만 있으면 바로 반환
+    if len(cost_records) == 1:
+        direct_price = cost_records[0]['공시가격']
+        return {"공시가격": direct_price, "method": "direct_match"}
     
     # GPT 분석 사용
     if len(cost_records) == 0:
@@ -261,18 +298,18 @@ def price(address):
         
         prompt_json = json.dumps(prompt, ensure_ascii=False, indent=2)
         try:
-            gpt_result = analyze_with_gpt(prompt_json)
+            gpt_result = analyze_with_gpt(prompt_json, site="price")
             
             if 'public_price' in gpt_result:
                 return {"공시가격": gpt_result['public_price'], "method": "gpt_analysis"}
             elif '공시가격' in gpt_result:
                 return {"공시가격": gpt_result['공시가격'], "method": "gpt_analysis"}
             else:
-                return {"공시가격": cost.iloc[0]['공시가격'], "method": "fallback_first_result"}
+                return {"공시가격": cost_records[0]['공시가격'], "method": "fallback_first_result"}
                 
         except Exception as e:
-            if not cost.empty:
-                return {"공시가격": cost.iloc[0]['공시가격'], "method": "fallback_after_error"}
+            if cost_records:
+                return {"공시가격": cost_records[0]['공시가격'], "method": "fallback_after_error"}
             return {"error": f"GPT API 오류: {str(e)}", "공시가격": "NA"}
 #좌표로 면적 찾기
 
@@ -356,6 +393,7 @@ def building(data):
                 address_list.append(address)
                 counter += 1
 
+    print(f"📊 주소 좌표 캐시: {geocode_cache.stats()}")
     json.dumps(result_dict, ensure_ascii=False, indent=2)
     prompt = {
         "task": "주소 유사도 분석 및 도로명 주소 추출",
@@ -365,7 +403,7 @@ def building(data):
     }
 
     prompt_json = json.dumps(prompt, ensure_ascii=False, indent=2)
-    result = analyze_with_gpt(prompt_json)
+    result = analyze_with_gpt(prompt_json, site="building")
     print(result)
     return result['result']
 #실행(수정사항 포함)
@@ -423,10 +461,62 @@ def find_keys_in_json(data):
 
     
     return result
+# solution별로 판단에 필요한 필드 (문서별). "보증금"은 보증금_1, 보증금_2 등 번호 붙은 필드도 포함
+SOLUTION_FIELDS = {
+    "solution_1": {
+        "contract": ["면적", "계약기간", "임대차기간", "임대일", "종료일", "특약사항", "특약", "관리비_정액", "관리비_비정액"],
+        "building_registry": ["위반건축물", "면적"],
+        "registry_document": ["신탁", "압류", "가처분", "가압류", "가등기"],
+    },
+    "solution_2": {
+        "contract": ["임대인"],
+        "building_registry": ["성명"],
+        "registry_document": ["소유자"],
+    },
+    "solution_3": {
+        "contract": ["보증금", "차임"],
+        "registry_document": ["채권최고액"],
+    },
+}
+
+def _field_matches(key, names):
+    """필드 이름이 names 중 하나이거나 번호가 붙은 형태(성명1, 소유자_2, (채권최고액_1))인지 확인"""
+    key = key.strip("()")
+    return any(re.fullmatch(rf"{re.escape(name)}(_?\d+)?", key) for name in names)
+
+def build_rule_payload(data, rule):
+    """
+    solution별 프롬프트에 넣을 데이터 생성
+    문서 > 페이지 > 필드 구조는 유지하고 해당 solution에 필요한 필드만 남긴 compact JSON
+
+    Args:
+        data (dict): 병합된 문서 데이터 (bounding box 제거된 상태)
+        rule (str): "solution_1", "solution_2", "solution_3"
+
+    Returns:
+        str: compact JSON 문자열
+    """
+    payload = {}
+    for section, names in SOLUTION_FIELDS[rule].items():
+        pages = {}
+        for page_key, page_data in data.get(section, {}).items():
+            if not isinstance(page_data, dict):
+                continue
+            fields = {key: value for key, value in page_data.items() if _field_matches(key, names)}
+            if fields:
+                pages[page_key] = fields
+        if pages:
+            payload[section] = pages
+
+    payload_json = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    print(f"📊 {rule} 입력 데이터: {len(str(data))}자 -> {len(payload_json)}자 (토큰 {count_tokens(payload_json)})")
+    return payload_json
+
 def solution_1(data): #등본, 건축물 대장 상 위험 매물, 면적, 계약기간, 임대차 기간, 특약 요약, 주소
+    payload = build_rule_payload(data, "solution_1")
 
     prompt = (f"""
-{data}에서 'contract'는 계약서, 'building_registry'는 건축물 대장, 'registry_document'는 등기부등본이다.
+{payload}에서 'contract'는 계약서, 'building_registry'는 건축물 대장, 'registry_document'는 등기부등본이다.
 
 다음 항목들을 분석하여 문제가 있으면 각 항목별로 notice와 solution을 추가해주세요:
 
@@ -477,13 +567,14 @@ def solution_1(data): #등본, 건축물 대장 상 위험 매물, 면적, 계
 
 원본 데이터의 모든 구조를 유지하고, 필요한 필드에만 notice와 solution을 추가하는 방식으로 결과를 JSON 형태로 반환해주세요.
 """)
-    result = analyze_with_gpt(prompt)
+    result = analyze_with_gpt(prompt, site="solution_1")
 
     return result
 
 def solution_2(data): #사용자 이름
+    payload = build_rule_payload(data, "solution_2")
     prompt = (f"""
-{data}에서 'contract'는 계약서, 'building_registry'는 건축물 대장, 'registry_document'는 등기부등본이다.
+{payload}에서 'contract'는 계약서, 'building_registry'는 건축물 대장, 'registry_document'는 등기부등본이다.
 계약서에서 '임대인', 건축물대장에서 '성명', 등기부등본에서 '소유자'이 일치하는지 확인 할 것.
 성명, 소유자가 1명이 아닌 경우 공동명의로 판단한다.
 성명끼리는 같은 notice와 solution을 출력한다.
@@ -528,7 +619,7 @@ def solution_2(data): #사용자 이름
 
 원본 데이터의 모든 구조를 유지하고, 필요한 필드에만 notice와 solution을 추가하는 방식으로 결과를 JSON 형태로 반환해주세요.
 """)
-    result = analyze_with_gpt(prompt)
+    result = analyze_with_gpt(prompt, site="solution_2")
 
     return result
 
@@ -536,9 +627,11 @@ def solution_2(data): #사용자 이름
 def solution_3(data, cost): #보증금, 근저당권, 공시가
     # 이전 코드에서 문자열 연결과 중첩 따옴표가 혼합되어 있어 오류 발생 가능성 높음
     
+    payload = build_rule_payload(data, "solution_3")
+
     # 단일 f-string으로 수정하여 일관성 유지
     prompt = (f"""
-{data}에서 'contract'는 계약서, 'building_registry'는 건축물 대장, 'registry_document'는 등기부등본이다. {cost}는 공시가격이다.
+{payload}에서 'contract'는 계약서, 'building_registry'는 건축물 대장, 'registry_document'는 등기부등본이다. {cost}는 공시가격이다.
 """
 f"""
 다음 항목들을 분석하여 문제가 있으면 각 항목별로 notice와 solution을 추가해주세요:
@@ -592,7 +685,7 @@ f"""
 
 JSON 형식으로 응답해주세요.
 """)
-    result = analyze_with_gpt(prompt)
+    result = analyze_with_gpt(prompt, site="solution_3")
     return result
 
 def merge_analysis(sol_json, analysis_jsons):
@@ -659,8 +752,15 @@ def merge_analysis(sol_json, analysis_jsons):
     return sol_json
     
 
+# solution별 분석 항목 (실패 시 missing_analysis에 표시)
+SOLUTION_DESCRIPTIONS = {
+    "solution_1": "등본/건축물대장 위험 매물, 면적, 계약기간, 특약, 주소",
+    "solution_2": "임대인/소유자 이름 일치",
+    "solution_3": "보증금, 근저당권, 공시가격",
+}
+
 # 엔드포인트와 통합을 위한 분석 함수
-def analyze_contract_data(merged_data, res_1, cost):
+def analyze_contract_data(merged_data, res_1, cost, progress=None):
     """
     계약서 데이터를 분석하는 통합 함수 - request() 함수와 유사한 구조로 구현
     
@@ -668,6 +768,7 @@ def analyze_contract_data(merged_data, res_1, cost):
         merged_data (dict): 병합된 문서 데이터
         res_1 (str/list): 주소 일치 여부 결과
         cost (int/str): 공시가격
+        progress (AnalysisProgress): solution별 완료 이벤트를 받을 객체 (선택)
         
     Returns:
         dict: 분석 결과
@@ -736,20 +837,45 @@ def analyze_contract_data(merged_data, res_1, cost):
                                 subsection[key]["solution"] = "주소 확인이 필요합니다."
                                 print(f"{section}.{subsection_key}.{key}에 불일치 notice 추가 완료")
         
-        # 세 가지 분석 실행
-        print("solution_1 분석 시작...")
-        result_1 = solution_1(data)
-        
-        print("solution_2 분석 시작...")
-        result_2 = solution_2(data)
-        print("📌 AI 분석 결과:", result_2)
+        # 세 가지 분석을 동시에 실행 (서로 독립적인 GPT 요청)
+        print("solution_1, solution_2, solution_3 분석 시작...")
+        solutions = [
+            ("solution_1", lambda: solution_1(data)),
+            ("solution_2", lambda: solution_2(data)),
+            ("solution_3", lambda: solution_3(data, cost)),
+        ]
 
-        print("solution_3 분석 시작...")
-        result_3 = solution_3(data, cost)
+        def run_solution(solution):
+            name, func = solution
+            with span(f"solution.{name}"):
+                result = func()
+            if progress is not None:
+                progress.event("solution_done", {"solution": name, "result": result})
+            return result
+
+        outcomes = run_concurrently(run_solution, solutions, len(solutions), timeout=SOLUTION_TIMEOUT)
+
+        # 실패한 분석은 빼고 나머지만 병합
+        results = []
+        missing = []
+        for (name, _), (result, error) in zip(solutions, outcomes):
+            if error is None and isinstance(result, dict) and "error" not in result:
+                results.append(result)
+                continue
+            reason = str(error) if error is not None else str(result.get("error") if isinstance(result, dict) else result)
+            print(f"⚠️ {name} 분석 실패 (나머지 결과만 병합): {reason}")
+            missing.append({
+                "analysis": name,
+                "description": SOLUTION_DESCRIPTIONS[name],
+                "error": reason
+            })
+        print("📌 AI 분석 결과:", results)
         
         print("분석 결과 병합 중...")
         # 결과 병합
-        merged_result = merge_analysis(data, [result_1, result_2, result_3])
+        merged_result = merge_analysis(data, results)
+        if missing:
+            merged_result["missing_analysis"] = missing
         
         return merged_result
         
@@ -826,10 +952,15 @@ def clean_boundboxing_json(input_json):
     
     # 각 최상위 키에 대해 처리
     for top_key, top_value in input_json.items():
+        # 문서 섹션이 아닌 값(missing_analysis 등)은 건너뛰기
+        if not isinstance(top_value, dict):
+            continue
         result[top_key] = {}
         
         # 각 섹션(페이지) 처리
         for section_key, section_value in top_value.items():
+            if not isinstance(section_value, dict):
+                continue
             result[top_key][section_key] = {}
             
             # 각 항목 처리
@@ -920,7 +1051,10 @@ def summary_result(analysis_data):
   }
 }
 """
-    response = client.chat.completions.create(
+    text = chat_completion(
+        client,
+        "summary",
+        cache_if=is_json,
         model=MODEL,
         messages=[
             {"role": "user", "content": f"다음 JSON 데이터를 분석해 주세요:\n\n```json\n{analysis_data}\n```\n\n이 데이터에서 'notice'와 'solution' 정보를 기반으로 계약의 주요 문제점과 해결책을 요약해주세요."},
@@ -929,7 +1063,7 @@ def summary_result(analysis_data):
         response_format={"type": "json_object"},
         max_tokens=3000
     )
-    return json.loads(response.choices[0].message.content.strip())
+    return json.loads(text.strip())
 
 def generate_and_save_summary(analysis_result, user_id, contract_id):
     """
@@ -1,16 +1,15 @@
 import openai
 import os
 import base64
-import pandas as pd
-import requests
 import json
-import uuid
-import time
 import re
-from io import BytesIO
-from PIL import Image
 from dotenv import load_dotenv
-from firebase_api.utils import save_ocr_result_to_firestore
+from .utils import run_concurrently
+from .image_store import ImageStore
+from .ocr_cache import cached_ocr
+from .ocr_client import recognize
+from .gpt import chat_completion, is_json
+from .ocr_serializer import serialize_words
 
 # 환경 변수 로드
 load_dotenv()
@@ -20,52 +19,11 @@ secret_key = os.getenv("OCR_SECRET_KEY")
 api_url = os.getenv("OCR_API_URL")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL = "gpt-4o" # 일단 클로드가 버전 바꾸라해서 바꾸는데 나중에 문제생기면 4-o로
+# 페이지별 OCR + GPT 분석 동시 실행 수 (1이면 순차 실행)
+PAGE_MAX_WORKERS = int(os.getenv("OCR_PAGE_MAX_WORKERS", "3"))
 
 client = openai.OpenAI(api_key=OPENAI_API_KEY)
 
-def building_first_ocr(secret_key, api_url, image_data):
-    """이미지 데이터에서 OCR 실행"""
-    request_json = {
-        'images': [{'format': 'jpg', 'name': 'demo'}],
-        'requestId': str(uuid.uuid4()),
-        'version': 'V2',
-        'timestamp': int(round(time.time() * 1000))
-    }
-    #이미지 처리
-    image = Image.open(BytesIO(image_data))
-    output_buffer = BytesIO()
-    image.save(output_buffer, format='JPEG', quality=95)
-    output_buffer.seek(0)
-    jpeg_data = output_buffer.getvalue()
-
-    payload = {'message': json.dumps(request_json).encode('UTF-8')}
-    files = [('file', ('image.jpg', image_data, 'image/jpeg'))]
-    headers = {'X-OCR-SECRET': secret_key}
-
-    response = requests.post(api_url, headers=headers, data=payload, files=files)
-
-    if response.status_code == 200:
-        ocr_results = response.json()
-# 응답 구조 확인
-
-        all_data = []
-        for image_result in ocr_results.get('images', []):
-            for field in image_result.get('fields', []):
-                text = field['inferText']
-                bounding_box = field['boundingPoly']['vertices']
-                x1, y1 = int(bounding_box[0]['x']), int(bounding_box[0]['y'])
-                x2, y2 = int(bounding_box[2]['x']), int(bounding_box[2]['y'])
-                all_data.append({
-                    "Text": text,
-                    "x1": x1, "y1": y1,
-                    "x2": x2, "y2": y2
-                })
-        df = pd.DataFrame(all_data)
-        return df
-    else:
-        print(f"OCR Error Response: {response.text}")
-        raise ValueError(f"❌ OCR 요청 실패: {response.status_code} - {response.text}")
-
 def fix_json_format(text: str) -> str:
     text = text.replace("```json", "").replace("```", "").strip()
     text = re.sub(r'(\d{1,3}),(\d{3})', r'\1\2', text)
@@ -83,141 +41,163 @@ def save_json(text: str, output_file: str) -> str:
     except json.JSONDecodeError as e:
         return f"❌ JSON 변환 실패: {e}"
 
-def building_keyword_ocr(image_urls, doc_type, user_id, contract_id):
-    """Firebase URL에서 건축물대장 OCR 처리"""
-    all_results = {}
-    
-    for image_url in image_urls:
+def process_building_page(image_url, image_store):
+    """
+    건축물대장 한 페이지의 다운로드 → OCR → GPT 분석 처리
 
-        
-        page_number = int(re.search(r'page(\d+)\.jpg', image_url).group(1))
-        
+    Returns:
+        tuple: (페이지 번호, 분석 결과). 실패 시 None
+    """
+    page_number = int(re.search(r'page(\d+)\.jpg', image_url).group(1))
+
+    # URL에서 이미지 다운로드 (분석 단위 저장소에서 공유)
+    image_data = image_store.get_bytes(image_url)
+    if image_data is None:
+        return None
     
-        # URL에서 이미지 다운로드
-        response = requests.get(image_url)
-        if response.status_code != 200:
-            continue
-            
-        image_data = response.content
-        
-        # 1차 OCR 실행
-        try:
-            df = building_first_ocr(secret_key=secret_key, api_url=api_url, image_data=image_data)
-            if df.empty:
-                continue
-        except Exception as e:
-            print(f"OCR 처리 중 오류 발생: {e}")
-            continue
-
-        # 2차 ocr GPT 분석
-        base64_image = base64.b64encode(image_data).decode("utf-8")
-        df_json = json.dumps(df.to_dict(orient="records"), ensure_ascii=False)
+    # 1차 OCR 실행 (요청 실패는 응답 코드와 함께 예외로 기록)
+    try:
+        df = cached_ocr(image_data, "building", lambda: recognize(image_data, secret_key, api_url, raise_on_error=True))
+        if df.empty:
+            return None
+    except Exception as e:
+        print(f"OCR 처리 중 오류 발생: {e}")
+        return None
+
+    # 2차 ocr GPT 분석
+    base64_image = base64.b64encode(image_data).decode("utf-8")
+    # 프롬프트용 텍스트 변환 (한 줄에 단어 하나, Text|x1|y1|x2|y2)
+    df_text = serialize_words(df)
+    
+    # 같은 요청은 캐시된 응답 사용
+    text = chat_completion(
+        client,
+        "building_extract",
+        cache_if=lambda text: is_json(fix_json_format(text)),
+        model=MODEL,
+        messages=[
+            {"role": "user", "content": "출력은 요청 정보만 {'key': 'value'} 형태의 딕셔너리로 출력해줘"},
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": (
+                        f"다음은 OCR 분석을 위한 데이터입니다.\n\n"
+                        f"✅ **OCR 데이터 (df, 각 줄은 Text|x1|y1|x2|y2 형식이며 첫 줄은 컬럼 이름):**\n{df_text}\n\n"
+                        f"💡 **목표:**\n"
+                        f"주어진 문서에서 다음 정보를 정확하게 추출하세요, 반드시 key값으로 추출해야 합니다.:\n"
+                        f"1. **건축물대장**\n"
+                        f"2. **대지위치**\n"
+                        f"3. **도로명주소**(대지 위치 같은 y좌표를 갖는다,  [시/도] [시/군/구] [도로명] [건물번호]의 구조로 이루어진다.)\n"
+                        f"4. **위반건축물** (건축물대장 옆에 있으며, OCR 데이터에서 없으면 'NA'로 처리하며, 좌표값은 {json.dumps({'x1': 0, 'y1': 0, 'x2': 0, 'y2': 0})} 으로 설정)\n"
+                        f"5. **소유자의 성명** (각각 독립적인 키로 반환하되, **여러 개일 경우 성명1, 성명2 등으로 추가 key를 생성한다, 다른 key값은 하나만 존재합니다.**)\n"
+                        f"6. **구조** (소유자의 **성명** 옆에 위치, 예: 철근콘크리트구조)\n"
+                        f"7. **면적** (소유자의 **성명** 옆에 위치, 예: 88.8)\n\n"
+                        f"8. **발급일자** (예: yyyy년mm월dd일)\n\n"
+
+                        f"📌 **출력 규칙:**\n"
+                        f"- 반드시 `{{'key': 'value'}}` 형태의 **JSON 형식**으로 출력하세요.\n"
+                        f"- OCR 데이터에서 **각 정보(성명, 주소)의 바운딩 박스(`bounding_box`)를 각각 포함**해야 합니다.\n"
+                        f"- 값이 존재하지 않는 경우 `'text': 'NA'`를 반환하세요.\n\n"
+
+                        f"🔹 **출력 형식 예시:**\n"
+                        f"```json\n"
+                        f"{{\n"
+                        f"  \"건축물대장\": {{\n"
+                        f"    \"text\": \"집합건축물대장(전유부,갑)\",\n"
+                        f"    \"bounding_box\": {{ \"x1\": 1192, \"y1\": 258, \"x2\": 1700, \"y2\": 280 }}\n"
+                        f"  }},\n"
+                        f"  \"대지위치\": {{\n"
+                        f"    \"text\": \"서울특별시 서대문구 창천동\",\n"
+                        f"    \"bounding_box\": {{ \"x1\": 273, \"y1\": 134, \"x2\": 394, \"y2\": 147 }}\n"
+                        f"  }},\n"
+                        f"  \"도로명주소\": {{\n"
+                        f"    \"text\": \"경기도 하남시 미사강변한강로\",\n"
+                        f"    \"bounding_box\": {{ \"x1\": 273, \"y1\": 134, \"x2\": 394, \"y2\": 147 }}\n"
+                        f"  }},\n"
+                        f"  \"위반건축물\": {{\n"
+                        f"    \"text\": \"NA\",\n"
+                        f"    \"bounding_box\": {json.dumps({'x1': 0, 'y1': 0, 'x2': 0, 'y2': 0})}\n"
+                        f"  }},\n"
+                        f"  \"성명\": {{\n"
+                        f"    \"text\": \"김나연\",\n"
+                        f"    \"bounding_box\": {{ \"x1\": 528, \"y1\": 252, \"x2\": 561, \"y2\": 267 }}\n"
+                        f"  }},\n"
+                        f"  \"주소\": {{\n"
+                        f"    \"text\": \"서울특별시 강남구 테헤란로 123\",\n" 
+                        f"    \"bounding_box\": {{ \"x1\": 500, \"y1\": 400, \"x2\": 750, \"y2\": 430 }}\n"
+                        f"  }},\n"
+                        f"  \"구조\": {{\n"
+                        f"    \"text\": \"철근콘크리트구조3\",\n"
+                        f"    \"bounding_box\": {{ \"x1\": 500, \"y1\": 500, \"x2\": 750, \"y2\": 530 }}\n"
+                        f"  }},\n"
+                        f"  \"면적\": {{\n"
+                        f"    \"text\": \"88.8\",\n"
+                        f"    \"bounding_box\": {{ \"x1\": 500, \"y1\": 600, \"x2\": 750, \"y2\": 630 }}\n"
+                        f"  }}\n"
+                        f"  \"발급일자\": {{\n"
+                        f"    \"text\": \"2025년 2월 11일\",\n"
+                        f"    \"bounding_box\": {{ \"x1\": 500, \"y1\": 600, \"x2\": 750, \"y2\": 630 }}\n"
+                        f"  }}\n"
+                        f"}}\n"
+                        f"```\n\n"
+
+                        f"⚠️ **주의사항:**\n"
+                        f"- **도로명주소의 좌표는 반드시 대지위치와 동일한 y좌표를 가져야 한다.**\n"
+                        f"- **주소가 여러 줄로 나올 경우 하나의 키로 합쳐서 반환해야 한다.**\n"
+                        f"- **도로명주소가 존재하지 않을 경우, 'NA'로 반환**\n"
+                        f"- **'구조'와 '면적'은 반드시 소유자의 성명과 같은 행에서만 추출한다.** 이 명령은 반드시 지킨다. \n"
+                        f"- 면적i로 면적이 여러개일 경우 (예: 면적1, 면적2) i값이 가장 작은 면적만 추출한다.\n"
+                        f"- **발급일자는 'YYYY년 MM월 DD일' 형식으로 반환한다.**\n"
+                        f"- **임대차기간은 날짜별로 개별적인 bounding_box를 가져야 한다.**\n"
+                        f"- JSON 형식을 반드시 준수하세요.\n"
+                        f"- 'bounding box'는 'text'에 해당하는 내용의 ocr 좌표를 모두 포함해야 합니다.\n"
+                        f"- 양식은 모두 통일 되어야 합니다.\n"
+                        f"- 추가적인 설명 없이 JSON 형태만 출력하세요."
+                    )
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}
+                    }
+                ]
+            }
+        ],
+        max_tokens=1000
+    )
+
+    try:
+        json_data = json.loads(fix_json_format(text))
+        print(f"✅ 페이지 {page_number} OCR 처리 완료")
+        return page_number, json_data
         
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "user", "content": "출력은 요청 정보만 {'key': 'value'} 형태의 딕셔너리로 출력해줘"},
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": (
-                            f"다음은 OCR 분석을 위한 데이터입니다.\n\n"
-                            f"✅ **OCR 데이터 (df_json):**\n{json.dumps(df_json, ensure_ascii=False)}\n\n"
-                            f"💡 **목표:**\n"
-                            f"주어진 문서에서 다음 정보를 정확하게 추출하세요, 반드시 key값으로 추출해야 합니다.:\n"
-                            f"1. **건축물대장**\n"
-                            f"2. **대지위치**\n"
-                            f"3. **도로명주소**(대지 위치 같은 y좌표를 갖는다,  [시/도] [시/군/구] [도로명] [건물번호]의 구조로 이루어진다.)\n"
-                            f"4. **위반건축물** (건축물대장 옆에 있으며, OCR 데이터에서 없으면 'NA'로 처리하며, 좌표값은 {json.dumps({'x1': 0, 'y1': 0, 'x2': 0, 'y2': 0})} 으로 설정)\n"
-                            f"5. **소유자의 성명** (각각 독립적인 키로 반환하되, **여러 개일 경우 성명1, 성명2 등으로 추가 key를 생성한다, 다른 key값은 하나만 존재합니다.**)\n"
-                            f"6. **구조** (소유자의 **성명** 옆에 위치, 예: 철근콘크리트구조)\n"
-                            f"7. **면적** (소유자의 **성명** 옆에 위치, 예: 88.8)\n\n"
-                            f"8. **발급일자** (예: yyyy년mm월dd일)\n\n"
-
-                            f"📌 **출력 규칙:**\n"
-                            f"- 반드시 `{{'key': 'value'}}` 형태의 **JSON 형식**으로 출력하세요.\n"
-                            f"- OCR 데이터에서 **각 정보(성명, 주소)의 바운딩 박스(`bounding_box`)를 각각 포함**해야 합니다.\n"
-                            f"- 값이 존재하지 않는 경우 `'text': 'NA'`를 반환하세요.\n\n"
-
-                            f"🔹 **출력 형식 예시:**\n"
-                            f"```json\n"
-                            f"{{\n"
-                            f"  \"건축물대장\": {{\n"
-                            f"    \"text\": \"집합건축물대장(전유부,갑)\",\n"
-                            f"    \"bounding_box\": {{ \"x1\": 1192, \"y1\": 258, \"x2\": 1700, \"y2\": 280 }}\n"
-                            f"  }},\n"
-                            f"  \"대지위치\": {{\n"
-                            f"    \"text\": \"서울특별시 서대문구 창천동\",\n"
-                            f"    \"bounding_box\": {{ \"x1\": 273, \"y1\": 134, \"x2\": 394, \"y2\": 147 }}\n"
-                            f"  }},\n"
-                            f"  \"도로명주소\": {{\n"
-                            f"    \"text\": \"경기도 하남시 미사강변한강로\",\n"
-                            f"    \"bounding_box\": {{ \"x1\": 273, \"y1\": 134, \"x2\": 394, \"y2\": 147 }}\n"
-                            f"  }},\n"
-                            f"  \"위반건축물\": {{\n"
-                            f"    \"text\": \"NA\",\n"
-                            f"    \"bounding_box\": {json.dumps({'x1': 0, 'y1': 0, 'x2': 0, 'y2': 0})}\n"
-                            f"  }},\n"
-                            f"  \"성명\": {{\n"
-                            f"    \"text\": \"김나연\",\n"
-                            f"    \"bounding_box\": {{ \"x1\": 528, \"y1\": 252, \"x2\": 561, \"y2\": 267 }}\n"
-                            f"  }},\n"
-                            f"  \"주소\": {{\n"
-                            f"    \"text\": \"서울특별시 강남구 테헤란로 123\",\n" 
-                            f"    \"bounding_box\": {{ \"x1\": 500, \"y1\": 400, \"x2\": 750, \"y2\": 430 }}\n"
-                            f"  }},\n"
-                            f"  \"구조\": {{\n"
-                            f"    \"text\": \"철근콘크리트구조3\",\n"
-                            f"    \"bounding_box\": {{ \"x1\": 500, \"y1\": 500, \"x2\": 750, \"y2\": 530 }}\n"
-                            f"  }},\n"
-                            f"  \"면적\": {{\n"
-                            f"    \"text\": \"88.8\",\n"
-                            f"    \"bounding_box\": {{ \"x1\": 500, \"y1\": 600, \"x2\": 750, \"y2\": 630 }}\n"
-                            f"  }}\n"
-                            f"  \"발급일자\": {{\n"
-                            f"    \"text\": \"2025년 2월 11일\",\n"
-                            f"    \"bounding_box\": {{ \"x1\": 500, \"y1\": 600, \"x2\": 750, \"y2\": 630 }}\n"
-                            f"  }}\n"
-                            f"}}\n"
-                            f"```\n\n"
-
-                            f"⚠️ **주의사항:**\n"
-                            f"- **도로명주소의 좌표는 반드시 대지위치와 동일한 y좌표를 가져야 한다.**\n"
-                            f"- **주소가 여러 줄로 나올 경우 하나의 키로 합쳐서 반환해야 한다.**\n"
-                            f"- **도로명주소가 존재하지 않을 경우, 'NA'로 반환**\n"
-                            f"- **'구조'와 '면적'은 반드시 소유자의 성명과 같은 행에서만 추출한다.** 이 명령은 반드시 지킨다. \n"
-                            f"- 면적i로 면적이 여러개일 경우 (예: 면적1, 면적2) i값이 가장 작은 면적만 추출한다.\n"
-                            f"- **발급일자는 'YYYY년 MM월 DD일' 형식으로 반환한다.**\n"
-                            f"- **임대차기간은 날짜별로 개별적인 bounding_box를 가져야 한다.**\n"
-                            f"- JSON 형식을 반드시 준수하세요.\n"
-                            f"- 'bounding box'는 'text'에 해당하는 내용의 ocr 좌표를 모두 포함해야 합니다.\n"
-                            f"- 양식은 모두 통일 되어야 합니다.\n"
-                            f"- 추가적인 설명 없이 JSON 형태만 출력하세요."
-                        )
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}
-                        }
-                    ]
-                }
-            ],
-            max_tokens=1000
-        )
-
-        text = response.choices[0].message.content
-        try:
-            json_data = json.loads(fix_json_format(text))
-            
-            
+    except json.JSONDecodeError as e:
+        print(f"JSON 파싱 오류: {e}")
+        return None
+
+def building_keyword_ocr(image_urls, doc_type, user_id, contract_id, image_store=None, progress=None):
+    """
+    Firebase URL에서 건축물대장 OCR 처리
+    (image_store: 분석 단위로 공유하는 ImageStore, 없으면 새로 생성 / progress: 페이지별 추출 완료 이벤트를 받을 객체)
+    """
+    all_results = {}
+    image_store = image_store or ImageStore()
+
+    def process_page(image_url):
+        page_result = process_building_page(image_url, image_store)
+        if page_result and progress is not None:
+            progress.event("page_extracted", {"document_type": doc_type, "page": page_result[0], "result": page_result[1]})
+        return page_result
+
+    # 페이지별 처리를 동시에 실행하고 입력 순서대로 결과 취합
+    page_outcomes = run_concurrently(process_page, image_urls, PAGE_MAX_WORKERS)
+    for page_result, page_error in page_outcomes:
+        if page_error is not None:
+            raise page_error
+        if page_result:
+            page_number, json_data = page_result
             all_results[f"page{page_number}"] = json_data
-            print(f"✅ 페이지 {page_number} OCR 처리 완료")
-            
-        except json.JSONDecodeError as e:
-            print(f"JSON 파싱 오류: {e}")
-            continue
 
     return all_results if all_results else None
 
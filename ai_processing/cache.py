@@ -0,0 +1,256 @@
+# 외부 API 응답 캐시 (메모리 LRU + TTL, 선택적으로 SQLite 영구 저장)
+# ai_analysis2.py 등(외부 API 호출) -> cache.py(캐시 조회/저장)
+#
+# 메모리 캐시는 워커 프로세스 안에서만 공유되고, SQLite 캐시를 함께 쓰면
+# 워커가 재시작되거나 다른 gunicorn 워커에서 조회해도 캐시가 유지된다.
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 캐시에 값이 없음을 나타내는 값 (None도 캐시할 수 있도록 별도 객체 사용)
+MISS = object()
+
+# SQLite 캐시에서 만료된 행을 지우는 주기(초)
+PURGE_INTERVAL = 3600
+
+# 이름별로 만들어진 캐시 (통계 조회용)
+_caches = {}
+
+
+class MemoryCache:
+    """LRU 방식으로 오래 안 쓴 항목부터 지우고, 항목마다 만료 시간을 두는 메모리 캐시"""
+
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISS
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return MISS
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache:
+    """SQLite 파일에 JSON으로 저장하는 영구 캐시 (namespace별로 키를 구분)"""
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache_entries (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        expires_at REAL,
+        PRIMARY KEY (namespace, key)
+    );
+    """
+
+    def __init__(self, path, namespace, ttl=None, purge_interval=PURGE_INTERVAL):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._purge_lock = threading.Lock()
+        self._last_purge = None
+
+    def _conn(self):
+        # 연결은 스레드마다 하나를 만들어 재사용
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self._SCHEMA)
+            self._local.conn = conn
+            self._purge_if_due(conn)
+        return conn
+
+    def _purge_if_due(self, conn):
+        # 처음 열 때와 purge_interval마다 만료된 행을 지워 파일이 계속 커지지 않게 함
+        now = time.time()
+        with self._purge_lock:
+            if self._last_purge is not None and now - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = now
+        try:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND expires_at < ?", (self.namespace, now)
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️ 만료 캐시 삭제 실패 ({self.namespace}): {e}")
+
+    def get(self, key, with_expiry=False):
+        """
+        캐시 조회
+
+        Args:
+            key (str): 캐시 키
+            with_expiry (bool): True이면 (값, 만료 시각) 반환. 만료 시각이 없으면 None
+
+        Returns:
+            저장된 값 (with_expiry이면 튜플), 없거나 만료되었으면 MISS
+        """
+        try:
+            row = self._conn().execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ 캐시 조회 실패 ({self.namespace}): {e}")
+            return MISS
+        if row is None:
+            return MISS
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            return MISS
+        value = json.loads(value)
+        return (value, expires_at) if with_expiry else value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value, ensure_ascii=False), expires_at)
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️ 캐시 저장 실패 ({self.namespace}): {e}")
+            return
+        self._purge_if_due(self._conn())
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+
+class TieredCache:
+    """메모리 캐시를 먼저 보고, 없으면 영구 캐시를 보는 2단계 캐시 (적중/미적중 통계 포함)"""
+
+    def __init__(self, name, memory, persistent=None):
+        self.name = name
+        self.memory = memory
+        self.persistent = persistent
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "memory_hits": 0, "persistent_hits": 0, "misses": 0, "load_seconds": 0.0}
+
+    def _count(self, field, amount=1):
+        with self._lock:
+            self._stats[field] += amount
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not MISS:
+            self._count("hits")
+            self._count("memory_hits")
+            return value
+
+        if self.persistent is not None:
+            entry = self.persistent.get(key, with_expiry=True)
+            if entry is not MISS:
+                # 영구 캐시에서 찾은 값은 남은 만료 시간만큼만 메모리에도 올려 둠 (ttl=0이면 만료 없음)
+                value, expires_at = entry
+                ttl = 0 if expires_at is None else max(expires_at - time.time(), 0.001)
+                self.memory.set(key, value, ttl)
+                self._count("hits")
+                self._count("persistent_hits")
+                return value
+
+        self._count("misses")
+        return MISS
+
+    def set(self, key, value, ttl=None):
+        self.memory.set(key, value, ttl)
+        if self.persistent is not None:
+            self.persistent.set(key, value, ttl)
+
+    def get_or_load(self, key, loader):
+        """
+        캐시에 있으면 바로 반환하고, 없으면 loader를 실행해 결과를 저장하는 함수
+
+        Args:
+            key (str): 캐시 키
+            loader (callable): () -> (값, ttl). ttl이 False이면 저장하지 않음 (예: API 오류)
+
+        Returns:
+            캐시된 값 또는 loader가 반환한 값
+        """
+        value = self.get(key)
+        if value is not MISS:
+            return value
+
+        start = time.time()
+        value, ttl = loader()
+        self._count("load_seconds", time.time() - start)
+
+        if ttl is not False:
+            self.set(key, value, ttl)
+        return value
+
+    def clear(self):
+        self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear()
+
+    def stats(self):
+        """
+        적중/미적중 통계 반환
+
+        Returns:
+            dict: hits, misses, 적중률, 미적중 1건당 평균 조회 시간, 캐시로 절약한 추정 시간
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        total = stats["hits"] + stats["misses"]
+        avg_load = stats["load_seconds"] / stats["misses"] if stats["misses"] else 0.0
+        stats["hit_rate"] = round(stats["hits"] / total, 3) if total else 0.0
+        stats["avg_load_seconds"] = round(avg_load, 4)
+        stats["saved_seconds"] = round(stats["hits"] * avg_load, 3)
+        stats["load_seconds"] = round(stats["load_seconds"], 3)
+        return stats
+
+
+def create_cache(name, max_size=1024, ttl=None, db_path=None):
+    """
+    이름별 캐시 생성 (db_path가 있으면 SQLite 영구 캐시를 함께 사용)
+
+    Args:
+        name (str): 캐시 이름 (SQLite namespace로도 사용)
+        max_size (int): 메모리 캐시 최대 항목 수
+        ttl (float): 기본 만료 시간(초). None이면 만료 없음
+        db_path (str): SQLite 파일 경로 (선택)
+
+    Returns:
+        TieredCache: 생성된 캐시
+    """
+    persistent = SQLiteCache(db_path, name, ttl) if db_path else None
+    cache = TieredCache(name, MemoryCache(max_size, ttl), persistent)
+    _caches[name] = cache
+    return cache
+
+
+def cache_stats():
+    """모든 캐시의 통계를 이름별로 반환"""
+    return {name: cache.stats() for name, cache in _caches.items()}
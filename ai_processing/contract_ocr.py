@@ -1,19 +1,16 @@
-import time
-import pandas as pd
-import cv2
 import json
-from PIL import Image
-import requests
-import uuid
-import time
 import openai
 import re
-import base64
-import numpy as np
 import os
-from io import BytesIO
 from dotenv import load_dotenv
-from firebase_api.utils import save_ocr_result_to_firestore
+from .utils import run_concurrently
+from .image_store import ImageStore
+from .ocr_cache import cached_ocr
+from .ocr_client import recognize
+from .gpt import chat_completion, is_json
+from .ocr_serializer import serialize_for_prompt
+from .template_matcher import match_template, split_by_confidence
+from .template_registry import get_template
 
 
 # 환경 변수 로드
@@ -24,150 +21,19 @@ secret_key = os.getenv("OCR_SECRET_KEY")
 api_url = os.getenv("OCR_API_URL")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL = "gpt-4o" 
+# 페이지별 OCR + GPT 분석 동시 실행 수 (1이면 순차 실행)
+PAGE_MAX_WORKERS = int(os.getenv("OCR_PAGE_MAX_WORKERS", "3"))
 
 client = openai.OpenAI(api_key=OPENAI_API_KEY)
 
 def base_xy(i):
-    if i==1:
-        rows = [
-            ['주택임대차표준계약서',396,119,838,173],
-            ['임대인', 127, 193, 198, 221],
-            ['(임대인)', 198, 193, 410, 221],
-            ['임차인', 445, 193, 510, 221],
-            ['(임차인)', 510, 193, 725, 221],
-            ['소재지', 94, 291, 186, 319],
-            ['(소재지)', 333, 289, 1203, 321],
-            ['[임차주택의 표시]',70,244,302,282],
-            ['토지',101,321,182,357],
-            ['(토지)', 330,322,681,356],
-            ['건물',103,357,183,388],
-            ['(건물)',103,357,183,388],
-            ['면적',712,322,764,355],
-            ['(면적)',803,322,1179,358],
-            ['계약기간',240,521,330,546],
-            ['(계약기간)',336,518,620,548],
-            ['보증금_1',633,523,697,547],
-            ['(보증금_1)',691,520,861,548],
-            ['차임_1', 878,521,927,547],
-            ['(차임_1)',925,516,1113,549],
-            ['계약내용',74,734,206,769],
-            ['보증금_2',93,824,182,865],
-            ['(보증금_2)',220,826,966,863],
-            ['계약금',95,866,178,906],
-            ['(계약금)',220,865,646,904],
-            ['중도금',93,908,177,946],
-            ['(중도금)', 217,907,1004,946],
-            ['잔금',92,947,177,984],
-            ['(잔금)',218,945,1012,984],
-            ['차임(월세)',86,987,182,1028],
-            ['(차임_2)',220,989,607,1023],
-            ['입금계좌',722,990,809,1022],
-            ['(입금계좌)', 806,995,1140,1021],
-            ['(관리비_정액)',220,1032,1034,1068],
-            ['(관리비_비정액)',216,1254,1038,1286],
-            ['(임대일)',877,1344,1145,1378],
-            ['(종료일)',553,1369,923,1408],
-            ['수리필요시설',90,1479,254,1512],
-            ['(수리할내용)',460,1473,1127,1512],
-            ['(수리완료시기)',504,1514,841,1551],
-        ]
-    elif i==2:
-        rows = [
-        ['임대인부담',73,215,225,263],
-        ['임차인부담',75,269,226,310],
-        ['(임대인부담)',228,214,1202,264],
-        ['(임차인부담)',228,264,1200,312],
-        ['(중개보수)', 378,1044,814,1080],
-        ['(교부일)', 378,1156,766,1192],
-        ['특약사항',56,1234,1188,1658],
-        ]
-    else:
-        rows = [
-        ['특약',46,28,1196,166],
-        ['(계약일)',510,236,1184,274],
-        ['임대인_주소', 98,288,250,334],
-        ['(임대인_주소)',254,290,1064,338],
-        ['임대인_주민등록번호',110,338,242,386],
-        ['(임대인_주민등록번호)',256,336,564,388],
-        ['임대인_전화',560,334,692,386],
-        ['(임대인_전화)',690,338,854,388],
-        ['(임대인_성명)',930,340,1066,390],
-        ['임대인_성명', 860,342,926,380],
-        ['임대인_대리인_주소',258,390,326,434],
-        ['임대인_대리인_주소', 330,392,562,438],
-        ['임대인_대리인_주민등록번호',564,388,690,438],
-        ['(임대인_대리인_주민등록번호)',694,390,858,438],
-        ['임대인_대리인_성명',862,392,922,434],
-        ['(임대인_대리인_성명)',932,390,1064,438],
-        ['임차인_주소',110,442,246,488],
-        ['(임차인_주소)',254,290+154,1064,338+154],
-        ['임차인_주민등록번호',110,338+154,242,386+154],
-        ['(임차인_주민등록번호)',256,336+154,564,388+154],
-        ['임차인_전화',560,334+154,692,386+154],
-        ['(임차인_전화)',690,338+154,854,388+154],
-        ['(임차인_성명)',930,340+154,1066,390+154],
-        ['임차인_성명', 860,342+154,926,380+154],
-        ['임차인_대리인_주소',258,390+154,326,434+154],
-        ['임차인_대리인_주소', 330,392+154,562,438+154],
-        ['임차인_대리인_주민등록번호',564,388+154,690,438+154],
-        ['(임차인_대리인_주민등록번호)',694,390+154,858,438+154],
-        ['임차인_대리인_성명',862,392+154,922,434+154],
-        ['(임차인_대리인_성명)',932,390+154,1064,438+154],
-        ['사무소소재지_1',110,600,242,642],
-        ['(사무소소재지_1)',256,596,562,644],
-        ['사무소명칭_1',122,644,236,686],
-        ['(사무소명칭_1)',254,642,562,692],
-        ['사무소소재지_2',586,594,712,642],
-        ['(사무소소재지_2)',740,596,1176,646],
-        ['사무소명칭_2',594,642,710,690],
-        ['(사무소명칭_2)',740,642,1180,696],
-            ]
-    xy = pd.DataFrame(columns=['Text', 'x1', 'y1', 'x2', 'y2'])
-    xy = pd.concat([xy, pd.DataFrame(rows, columns=xy.columns)], ignore_index=True)
-    return xy
+    """
+    계약서 페이지 번호에 맞는 양식 템플릿 (3페이지 이후는 3페이지 양식)
 
-def cre_ocr(image, secret_key, api_url):
-    """OCR 추출 함수"""
-    # target_size = (1240, 1753) #1229
-    # image_1 = cv2.resize(image, target_size, interpolation=cv2.INTER_AREA)
-    
-    request_json = {
-        'images': [{'format': 'jpg', 'name': 'demo'}],
-        'requestId': str(uuid.uuid4()),
-        'version': 'V2',
-        'timestamp': int(round(time.time() * 1000))
-    }
-    
-    # 이미지 처리
-    _, img_encoded = cv2.imencode('.jpg', image)
-    files = [('file', ('image.jpg', img_encoded.tobytes(), 'image/jpeg'))]
-    
-    payload = {'message': json.dumps(request_json).encode('UTF-8')}
-    headers = {'X-OCR-SECRET': secret_key}
-    
-    response = requests.request("POST", api_url, headers=headers, data=payload, files=files)
-    
-    if response.status_code == 200:
-        ocr_results = response.json()
-        all_data = []
-        
-        for image_result in ocr_results['images']:
-            for field in image_result['fields']:
-                text = field['inferText']
-                bounding_box = field['boundingPoly']['vertices']
-                x1, y1 = int(bounding_box[0]['x']), int(bounding_box[0]['y'])
-                x2, y2 = int(bounding_box[2]['x']), int(bounding_box[2]['y'])
-                
-                all_data.append({
-                    "Text": text,
-                    "x1": x1, "y1": y1,
-                    "x2": x2, "y2": y2
-                })
-        
-        df = pd.DataFrame(all_data) 
-        return df
-    
-    return None
+    Returns:
+        FormTemplate: template_data/contract_page{n}.json을 컴파일한 템플릿
+    """
+    return get_template(f"contract_page{i if i in (1, 2) else 3}")
 
 def fix_json_format(text: str) -> str:
     """JSON 형식 오류 수정 함수"""
@@ -206,182 +72,244 @@ def ttj(text: str, output_file: str) -> str:
         print("📌 오류 발생 JSON 내용:\n", text)
         return f"❌ JSON 변환 실패: {e}"
 
-def contract_keyword_ocr(image_urls, doc_type, user_id, contract_id):
-    """Firebase URL에서 계약서 OCR 처리"""
-    all_results = {}
-    
-    
-    for image_url in image_urls:
-        try:
-            # URL에서 페이지 번호 추출 부분 수정
-            page_number = int(re.search(r'page(\d+)\.jpg', image_url).group(1))
-            
-            # URL에서 이미지 다운로드
-            response = requests.get(image_url)
-            if response.status_code != 200:
-                print(f"❌ 이미지 다운로드 실패: {image_url}")
-                continue
-            
-            # 이미지 데이터 변환
-            image_data = response.content
-            nparr = np.frombuffer(image_data, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            # OCR 처리
-            df = cre_ocr(image, secret_key, api_url)
-            if df.empty:
-                print(f"❌ OCR 처리 실패 (페이지 {page_number})")
-                continue
-                
-            # 페이지 번호에 맞는 base_xy 매핑 가져오기
-            xy = base_xy(page_number)
-            # JSON 변환
-            xy_json = xy.to_json(orient="records", force_ascii=False)
-            df_json = df.to_json(orient="records", force_ascii=False)
+# 템플릿 매칭 결과를 그대로 쓰려면 만족해야 하는 형식 (GPT 프롬프트의 출력 형식과 동일)
+_DATE = r"^\d{4}년 \d{2}월 \d{2}일$"
+_AMOUNT = r"^[\d,]+원$"
+_NAME = r"^[가-힣]{2,5}$"
+_ADDRESS = r"^(서울|부산|대구|인천|광주|대전|울산|세종|경기|강원|충청|충북|충남|전라|전북|전남|경상|경북|경남|제주)\S*\s"
+CONTRACT_FIELD_FORMATS = {
+    "임대인": _NAME, "임차인": _NAME, "성명": _NAME,
+    "소재지": _ADDRESS,
+    "면적": r"^[\d.]+\s*(m2|㎡)$",
+    "계약기간": r"^\d{4}-\d{2}-\d{2} ~ \d{4}-\d{2}-\d{2}$",
+    "보증금_1": _AMOUNT, "보증금_2": _AMOUNT, "계약금": _AMOUNT, "중도금": _AMOUNT,
+    "잔금": r"^[\d,]+원 \(\d{4}-\d{2}-\d{2}에 지불\)$",
+    "차임_1": r"^[\d,]+원 \(\d{1,2}일\)$", "차임_2": r"^[\d,]+원 \(\d{1,2}일\)$",
+    "입금계좌": r"^[\d-]+$",
+    "관리비_정액": r"^\(정액인 경우\) [\d,]+원$", "관리비_비정액": r"^\(정액이 아닌 경우\) [\d,]+원$",
+    "임대일": _DATE, "종료일": _DATE, "계약일": r"^\d{4}년 \d{1,2}월 \d{1,2}일$",
+    "교부일": r"^\d{4}-\d{2}-\d{2}$", "수리완료시기": r"^\d{4}-\d{2}-\d{2}$",
+    "임대인_주소": _ADDRESS, "임차인_주소": _ADDRESS,
+    "임대인_주민등록번호": r"^\d{6}-\d{7}$", "임차인_주민등록번호": r"^\d{6}-\d{7}$",
+    "임대인_전화": r"^01\d-\d{3,4}-\d{4}$", "임차인_전화": r"^01\d-\d{3,4}-\d{4}$",
+}
+# 괄호 없이 영역 전체가 값인 템플릿 항목
+_REGION_FIELDS = {"특약사항", "특약"}
+
+def template_fields(target_texts, xy):
+    """추출 대상 필드별로 대응하는 템플릿 항목 이름 (값 영역 '(필드)' 우선)"""
+    names = xy.names
+    fields = {}
+    for key in target_texts:
+        if f"({key})" in names:
+            fields[key] = f"({key})"
+        elif key in _REGION_FIELDS and key in names:
+            fields[key] = key
+    return fields
+
+def process_contract_page(image_url, image_store):
+    """
+    계약서 한 페이지의 다운로드 → OCR → GPT 분석 처리
+
+    Returns:
+        tuple: (페이지 번호, 분석 결과). 실패 시 None
+    """
+    try:
+        # URL에서 페이지 번호 추출 부분 수정
+        page_number = int(re.search(r'page(\d+)\.jpg', image_url).group(1))
+        
+        # URL에서 이미지 다운로드 (분석 단위 저장소에서 공유)
+        image_data = image_store.get_bytes(image_url)
+        if image_data is None:
+            print(f"❌ 이미지 다운로드 실패: {image_url}")
+            return None
+        
+        # OCR 처리 (같은 이미지는 캐시된 결과 사용, 원본 바이트를 그대로 업로드)
+        df = cached_ocr(image_data, "contract", lambda: recognize(image_data, secret_key, api_url))
+        if df is None or df.empty:
+            print(f"❌ OCR 처리 실패 (페이지 {page_number})")
+            return None
             
+        # 페이지 번호에 맞는 base_xy 매핑 가져오기
+        xy = base_xy(page_number)
+        # 프롬프트용 텍스트 변환 (한 줄에 단어 하나, Text|x1|y1|x2|y2)
+        df_text, xy_text = serialize_for_prompt(df, xy)
         
-            # target_texts 설정 (페이지별)
-            if page_number == 1:
-                target_texts = {
-                    "임대인": "사람 이름 (예: 홍길동)",
-                    "임차인": "사람 이름 (예: 김철수)",
-                    "소재지": "도로명 주소 (예: 서울특별시 강남구 테헤란로 123)",
-                    "토지":"종류 (예: 대)",
-                    "건물":"종류 (예: 철근콘크리트구조)",
-                    "임차할부분":"호수 (예: 제 1층 101호)",
-                    "면적":"면적 (예: 88.8m2)",
-                    "계약기간": "YYYY-MM-DD ~ YYYY-MM-DD (예: 2025-01-01 ~ 2026-01-01)",
-                    "보증금_1": "###원 (예: 10,000,000원)",
-                    "보증금_2": "###원 (예: 10,000,000원)",
-                    "계약금": "###원 (예: 3,000,000원)",
-                    "잔금": "###원 (YYYY-MM-DD에 지불) (예: 7,000,000원 (2025-06-01에 지불))",
-                    "차임_1": "###원 (DD일) (예: 500,000원 (10일))",
-                    "차임_2": "###원 (DD일) (예: 600,000원 (15일))",
-                    "입금계좌": "계좌번호 형식 (예: 123-45-67890)",
-                    "관리비_정액":"(정액인 경우) ###원 (예: (정액인 경우) 10,000원)",
-                    "관리비_비정액":"(정액이 아닌 경우) ###원 (예: (정액이 아닌 경우) ###원)",
-                    "중도금": "###원 (예: 2,000,000원)",
-                    "임대일": "YYYY년 MM월 DD일 (예: 2025년 02월 01일)",
-                    "종료일": "YYYY년 MM월 DD일 (예: 2026년 01월 01일)",
-                    "수리할내용": "텍스트 (예: 보일러 수리 필요)",
-                    "수리완료시기": "YYYY-MM-DD (예: 2025-03-01)"
-                }
-            elif page_number == 2:
-                target_texts = {
-                    "임대인부담":"텍스트",
-                    "임차인부담":"텍스트",
-                    "중개보수":"거래가액의 00%인 ###,###원",
-                    "교부일":"YYYY-MM-DD",
-                    "특약사항":"텍스트"
-                }
-            else:
-                target_texts = {
-                    "특약": "텍스트 (예: 본 계약의 임차인은 계약 종료 시 임대인의 요구에 따라 원상복구를 수행하며, 이에 대한 모든 비용을 부담한다. 또한, 원상복구 범위는 임대인이 단독으로 결정하며, 이에 대한 이의를 제기할 수 없다)",
-                    "계약일": "yyyy년 mm월 dd일",
-                    "임대인_주소": "도로명 주소 (예: 서울특별시 강남구 테헤란로 123)",
-                    "임대인_주민등록번호": "000000-0000000",
-                    "임대인_전화": "010-0000-0000",
-                    "성명": "###",
-                    "임대인_대리인_주소": "도로명 주소 (예: 서울특별시 강남구 테헤란로 123)",
-                    "임대인_대리인_주민등록번호": "000000-0000000",
-                    "임대인_대리인_성명": "###",        
-                    "임차인_주소": "도로명 주소 (예: 서울특별시 강남구 테헤란로 123)",
-                    "임차인_주민등록번호": "000000-0000000",
-                    "임차인_전화": "010-0000-0000",
-                    "임차인_성명": "###",
-                    "임차인_대리인_주소": "도로명 주소 (예: 서울특별시 강남구 테헤란로 123)",
-                    "임차인_대리인_주민등록번호": "000000-0000000",
-                    "임차인_대리인_성명": "###",
-                    "사무소소재지_1": "텍스트",
-                    "사무소소재지_2": "도로명 주소 (예: 서울특별시 강남구 테헤란로 123)",
-                    "사무소명칭_1": "텍스트",
-                    "사무소명칭_2": "텍스트"
-                }
+    
+        # target_texts 설정 (페이지별)
+        if page_number == 1:
+            target_texts = {
+                "임대인": "사람 이름 (예: 홍길동)",
+                "임차인": "사람 이름 (예: 김철수)",
+                "소재지": "도로명 주소 (예: 서울특별시 강남구 테헤란로 123)",
+                "토지":"종류 (예: 대)",
+                "건물":"종류 (예: 철근콘크리트구조)",
+                "임차할부분":"호수 (예: 제 1층 101호)",
+                "면적":"면적 (예: 88.8m2)",
+                "계약기간": "YYYY-MM-DD ~ YYYY-MM-DD (예: 2025-01-01 ~ 2026-01-01)",
+                "보증금_1": "###원 (예: 10,000,000원)",
+                "보증금_2": "###원 (예: 10,000,000원)",
+                "계약금": "###원 (예: 3,000,000원)",
+                "잔금": "###원 (YYYY-MM-DD에 지불) (예: 7,000,000원 (2025-06-01에 지불))",
+                "차임_1": "###원 (DD일) (예: 500,000원 (10일))",
+                "차임_2": "###원 (DD일) (예: 600,000원 (15일))",
+                "입금계좌": "계좌번호 형식 (예: 123-45-67890)",
+                "관리비_정액":"(정액인 경우) ###원 (예: (정액인 경우) 10,000원)",
+                "관리비_비정액":"(정액이 아닌 경우) ###원 (예: (정액이 아닌 경우) ###원)",
+                "중도금": "###원 (예: 2,000,000원)",
+                "임대일": "YYYY년 MM월 DD일 (예: 2025년 02월 01일)",
+                "종료일": "YYYY년 MM월 DD일 (예: 2026년 01월 01일)",
+                "수리할내용": "텍스트 (예: 보일러 수리 필요)",
+                "수리완료시기": "YYYY-MM-DD (예: 2025-03-01)"
+            }
+        elif page_number == 2:
+            target_texts = {
+                "임대인부담":"텍스트",
+                "임차인부담":"텍스트",
+                "중개보수":"거래가액의 00%인 ###,###원",
+                "교부일":"YYYY-MM-DD",
+                "특약사항":"텍스트"
+            }
+        else:
+            target_texts = {
+                "특약": "텍스트 (예: 본 계약의 임차인은 계약 종료 시 임대인의 요구에 따라 원상복구를 수행하며, 이에 대한 모든 비용을 부담한다. 또한, 원상복구 범위는 임대인이 단독으로 결정하며, 이에 대한 이의를 제기할 수 없다)",
+                "계약일": "yyyy년 mm월 dd일",
+                "임대인_주소": "도로명 주소 (예: 서울특별시 강남구 테헤란로 123)",
+                "임대인_주민등록번호": "000000-0000000",
+                "임대인_전화": "010-0000-0000",
+                "성명": "###",
+                "임대인_대리인_주소": "도로명 주소 (예: 서울특별시 강남구 테헤란로 123)",
+                "임대인_대리인_주민등록번호": "000000-0000000",
+                "임대인_대리인_성명": "###",        
+                "임차인_주소": "도로명 주소 (예: 서울특별시 강남구 테헤란로 123)",
+                "임차인_주민등록번호": "000000-0000000",
+                "임차인_전화": "010-0000-0000",
+                "임차인_성명": "###",
+                "임차인_대리인_주소": "도로명 주소 (예: 서울특별시 강남구 테헤란로 123)",
+                "임차인_대리인_주민등록번호": "000000-0000000",
+                "임차인_대리인_성명": "###",
+                "사무소소재지_1": "텍스트",
+                "사무소소재지_2": "도로명 주소 (예: 서울특별시 강남구 테헤란로 123)",
+                "사무소명칭_1": "텍스트",
+                "사무소명칭_2": "텍스트"
+            }
 
+        # 템플릿 위치로 신뢰도 높게 추출된 필드는 GPT 없이 사용하고 나머지만 GPT로 추출
+        matches = match_template(df, xy, template_fields(target_texts, xy), CONTRACT_FIELD_FORMATS)
+        confident, _ = split_by_confidence(matches)
+        target_texts = {key: value for key, value in target_texts.items() if key not in confident}
+        if not target_texts:
+            print(f"✅ 페이지 {page_number} 템플릿 매칭으로 처리 완료 (GPT 생략)")
+            return page_number, confident
+        print(f"📊 페이지 {page_number} 템플릿 매칭 {len(confident)}개, GPT 추출 {len(target_texts)}개")
+
+        # GPT 분석 요청 (같은 요청은 캐시된 응답 사용)
+        text = chat_completion(
+            client,
+            "contract_extract",
+            cache_if=lambda text: is_json(fix_json_format(text)),
+            model=MODEL,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text":  (
+                        f"다음은 OCR 분석을 위한 데이터입니다.\n\n"
+                        f" **데이터 형식:** 각 줄은 Text|x1|y1|x2|y2 형식이며 첫 줄은 컬럼 이름\n\n"
+                        f" **위치 데이터 (xy):**\n{xy_text}\n\n"
+                        f" **내용 데이터 (df):**\n{df_text}\n\n"
+                        f" **작업 목표:**\n"
+                        f"- `xy` 데이터의 위치 정보(좌표)를 활용하여 `df` 데이터와 매칭\n"
+                        f"- 각 바운딩 박스 안에 포함된 `df` 데이터를 분석하여 최적의 좌표로 조정\n"
+                        f"- 겹치는 단어들을 묶어 최종 바운딩 박스를 생성\n"
+                        f"- 내용이 없으면 'NA'로 표시\n\n"
+                        f" **각 항목의 출력 형식:**\n"
+                        + "\n".join([f"- **{key}**: {value}" for key, value in target_texts.items()]) +
+                        f"\n\n **결과 형식:**\n"
+                        f"- JSON 형식으로 반환 (각 항목의 바운딩 박스 포함)\n"
+                        f"- **출력 데이터가 지정된 형식과 다를 경우 자동으로 변환하여 반환**\n\n"
+                        f" **반환 예시:**\n"
+                        f"{{\n"
+                        f"  \"임대인\": {{\"text\": \"홍길동\", \"bounding_box\": {{\"x1\": 100, \"y1\": 200, \"x2\": 300, \"y2\": 250}}}},\n"
+                        f"  \"임차인\": {{\"text\": \"김철수\", \"bounding_box\": {{\"x1\": 120, \"y1\": 220, \"x2\": 320, \"y2\": 270}}}},\n"
+                        f"  \"소재지\": {{\"text\": \"서울특별시 강남구 테헤란로 123\", \"bounding_box\": {{\"x1\": 140, \"y1\": 240, \"x2\": 340, \"y2\": 290}}}},\n"
+                        f"  \"계약기간\": {{\"text\": \"2025-01-01 ~ 2026-01-01\", \"bounding_box\": {{\"x1\": 150, \"y1\": 250, \"x2\": 350, \"y2\": 300}}}},\n"
+                        f"  \"보증금_1\": {{\"text\": \"10,000,000원\", \"bounding_box\": {{\"x1\": 160, \"y1\": 260, \"x2\": 360, \"y2\": 310}}}},\n"
+                        f"  \"입금계좌\": {{\"text\": \"123-45-67890\", \"bounding_box\": {{\"x1\": 170, \"y1\": 270, \"x2\": 370, \"y2\": 320}}}}\n"
+                        f"}}\n\n"
+                        f" **주의사항:**\n"
+                        f"- 모든 좌표는 df를 기준으로 출력한다."
+                        f"- df를 항상 우선시한다."
+                        f"- x1은 항상 df를 참고한다."
+                        f"- '임대일', '종료일'은 y좌표가 관리비_정액의 y좌표보다 크다."
+                        f"-  보증금은 '보증금_1', '보증금_2'가 반드시 존재한다."
+                        f"- '특약사항'은 페이지 2의 가장 중요한 정보로, 반드시 좌표 내의 모든 텍스트를 정확히 포함해야 한다.\n"
+                        f"- '특약사항'은 페이지 하단 전체를 포함하며, 페이지의 끝까지 모든 text를 포함한다.\n"
+                        f"- '특약사항'을 추출할 때는 해당 영역 내의 모든 df 'Text'를 결합하여 출력한다.\n"
+                        f"- '특약사항'의 경우 페이지 하단에 있는 모든 내용을 빠짐없이 포함해야 한다.\n"
+                        f"- '특약사항'의 바운딩 박스는 페이지 하단까지 충분히 크게 설정한다 (y2값을 충분히 크게).\n"
+                        f"- '특약사항'은 특히 이미지에 보이는 점선 박스 내의 모든 내용을 포함해야 한다.\n"
+                        # f"- '특약사항'은 반드시 페이지의 마지막 text까지 해당한다."
+                        # f"- '특약사항'은 반드시 좌표에 해당하는 모든 df 'text' 를 출력한다."
+                        # f"- '특약사항'은 반드시 해당하는 df에 해당하는 x2중 가장 큰 값을 사용한다."
+                        f"- '특약'은 반드시'계약일'보다 y2가 작다(위에 있다)."
+                        f"- '특약'은 페이지 3의 가장 중요한 정보 중 하나로, 반드시 좌표 내의 모든 텍스트를 정확히 포함해야 한다.\n"
+                        f"- '특약'을 추출할 때는 해당 영역 내의 모든 df 'Text'를 결합하여 출력한다.\n"
+                        f"- '특약'은 특히 이미지에 보이는 점선 박스 내의 모든 내용을 포함해야 한다.\n"
+                        f"- '관리비_정액','관리비_정액'은 ###원이 아닌 경우 NA로 처리한다."
+                        f"- `xy` 데이터의 바운딩 박스를 그대로 사용하지 말고, `df` 데이터와 가장 적합한 위치로 조정\n"
+                        f"- 내용이 없을 경우 `NA`로 반환, text 내용이 없는 경우 좌표를 0, 0, 0, 0으로 해줘.\n"
+                        f"- '차임_2' 의 금액은 최소 10만원이다."
+                        f"- JSON 형식이 정확하도록 반환할 것!\n"
+                        f"- JSON 형식 이외의 어떤 알림, 내용은 첨가하지 말것!\n"
+                        f"- 반환 내용 외의 경고, 알림은 반환하지 말것\n"
+                        f" '아래는 제공된 `xy` 및 `df` 데이터를 사용하여 각 항목을 분석한 결과입니다'와 같은 알림은 절대 금지\n"
+                        f" OpenAI 응답내용금지\n"
+                        )
+                        }
+                    ]
+                }
+            ],
+            max_tokens=3000
+        )
+        
+        try:
+            # 결과 저장
+            json_data = json.loads(fix_json_format(text))
+            json_data.update(confident)
+            print(f"✅ 페이지 {page_number} 처리 완료")
+            return page_number, json_data
             
-            # GPT 분석 요청
-            response = client.chat.completions.create(
-                model=MODEL,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text":  (
-                            f"다음은 OCR 분석을 위한 데이터입니다.\n\n"
-                            f" **위치 데이터 (xy):**\n{xy_json}\n\n"
-                            f" **내용 데이터 (df):**\n{df_json}\n\n"
-                            f" **작업 목표:**\n"
-                            f"- `xy` 데이터의 위치 정보(좌표)를 활용하여 `df` 데이터와 매칭\n"
-                            f"- 각 바운딩 박스 안에 포함된 `df` 데이터를 분석하여 최적의 좌표로 조정\n"
-                            f"- 겹치는 단어들을 묶어 최종 바운딩 박스를 생성\n"
-                            f"- 내용이 없으면 'NA'로 표시\n\n"
-                            f" **각 항목의 출력 형식:**\n"
-                            + "\n".join([f"- **{key}**: {value}" for key, value in target_texts.items()]) +
-                            f"\n\n **결과 형식:**\n"
-                            f"- JSON 형식으로 반환 (각 항목의 바운딩 박스 포함)\n"
-                            f"- **출력 데이터가 지정된 형식과 다를 경우 자동으로 변환하여 반환**\n\n"
-                            f" **반환 예시:**\n"
-                            f"{{\n"
-                            f"  \"임대인\": {{\"text\": \"홍길동\", \"bounding_box\": {{\"x1\": 100, \"y1\": 200, \"x2\": 300, \"y2\": 250}}}},\n"
-                            f"  \"임차인\": {{\"text\": \"김철수\", \"bounding_box\": {{\"x1\": 120, \"y1\": 220, \"x2\": 320, \"y2\": 270}}}},\n"
-                            f"  \"소재지\": {{\"text\": \"서울특별시 강남구 테헤란로 123\", \"bounding_box\": {{\"x1\": 140, \"y1\": 240, \"x2\": 340, \"y2\": 290}}}},\n"
-                            f"  \"계약기간\": {{\"text\": \"2025-01-01 ~ 2026-01-01\", \"bounding_box\": {{\"x1\": 150, \"y1\": 250, \"x2\": 350, \"y2\": 300}}}},\n"
-                            f"  \"보증금_1\": {{\"text\": \"10,000,000원\", \"bounding_box\": {{\"x1\": 160, \"y1\": 260, \"x2\": 360, \"y2\": 310}}}},\n"
-                            f"  \"입금계좌\": {{\"text\": \"123-45-67890\", \"bounding_box\": {{\"x1\": 170, \"y1\": 270, \"x2\": 370, \"y2\": 320}}}}\n"
-                            f"}}\n\n"
-                            f" **주의사항:**\n"
-                            f"- 모든 좌표는 df를 기준으로 출력한다."
-                            f"- df를 항상 우선시한다."
-                            f"- x1은 항상 {df_json}을 참고한다."
-                            f"- '임대일', '종료일'은 y좌표가 관리비_정액의 y좌표보다 크다."
-                            f"-  보증금은 '보증금_1', '보증금_2'가 반드시 존재한다."
-                            f"- '특약사항'은 페이지 2의 가장 중요한 정보로, 반드시 좌표 내의 모든 텍스트를 정확히 포함해야 한다.\n"
-                            f"- '특약사항'은 페이지 하단 전체를 포함하며, 페이지의 끝까지 모든 text를 포함한다.\n"
-                            f"- '특약사항'을 추출할 때는 해당 영역 내의 모든 {df_json} 'text'를 결합하여 출력한다.\n"
-                            f"- '특약사항'의 경우 페이지 하단에 있는 모든 내용을 빠짐없이 포함해야 한다.\n"
-                            f"- '특약사항'의 바운딩 박스는 페이지 하단까지 충분히 크게 설정한다 (y2값을 충분히 크게).\n"
-                            f"- '특약사항'은 특히 이미지에 보이는 점선 박스 내의 모든 내용을 포함해야 한다.\n"
-                            # f"- '특약사항'은 반드시 페이지의 마지막 text까지 해당한다."
-                            # f"- '특약사항'은 반드시 좌표에 해당하는 모든 {df_json} 'text' 를 출력한다."
-                            # f"- '특약사항'은 반드시 해당하는 df에 해당하는 x2중 가장 큰 값을 사용한다."
-                            f"- '특약'은 반드시'계약일'보다 y2가 작다(위에 있다)."
-                            f"- '특약'은 페이지 3의 가장 중요한 정보 중 하나로, 반드시 좌표 내의 모든 텍스트를 정확히 포함해야 한다.\n"
-                            f"- '특약'을 추출할 때는 해당 영역 내의 모든 {df_json} 'text'를 결합하여 출력한다.\n"
-                            f"- '특약'은 특히 이미지에 보이는 점선 박스 내의 모든 내용을 포함해야 한다.\n"
-                            f"- '관리비_정액','관리비_정액'은 ###원이 아닌 경우 NA로 처리한다."
-                            f"- `xy` 데이터의 바운딩 박스를 그대로 사용하지 말고, `df` 데이터와 가장 적합한 위치로 조정\n"
-                            f"- 내용이 없을 경우 `NA`로 반환, text 내용이 없는 경우 좌표를 0, 0, 0, 0으로 해줘.\n"
-                            f"- '차임_2' 의 금액은 최소 10만원이다."
-                            f"- JSON 형식이 정확하도록 반환할 것!\n"
-                            f"- JSON 형식 이외의 어떤 알림, 내용은 첨가하지 말것!\n"
-                            f"- 반환 내용 외의 경고, 알림은 반환하지 말것\n"
-                            f" '아래는 제공된 `xy` 및 `df` 데이터를 사용하여 각 항목을 분석한 결과입니다'와 같은 알림은 절대 금지\n"
-                            f" OpenAI 응답내용금지\n"
-                            )
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=3000
-            )
-            
-            text = response.choices[0].message.content
-            
-            try:
-                # 결과 저장
-                json_data = json.loads(fix_json_format(text))
-                all_results[f"page{page_number}"] = json_data
-                print(f"✅ 페이지 {page_number} 처리 완료")
-                
-            except Exception as e:
-                print(f"❌ JSON 처리 실패 (페이지 {page_number}): {e}")
-                continue
-                
         except Exception as e:
-            print(f"❌ 처리 중 오류 발생: {e}")
-            continue
+            print(f"❌ JSON 처리 실패 (페이지 {page_number}): {e}")
+            return None
+            
+    except Exception as e:
+        print(f"❌ 처리 중 오류 발생: {e}")
+        return None
+
+def contract_keyword_ocr(image_urls, doc_type, user_id, contract_id, image_store=None, progress=None):
+    """
+    Firebase URL에서 계약서 OCR 처리
+    (image_store: 분석 단위로 공유하는 ImageStore, 없으면 새로 생성 / progress: 페이지별 추출 완료 이벤트를 받을 객체)
+    """
+    all_results = {}
+    image_store = image_store or ImageStore()
+
+    def process_page(image_url):
+        page_result = process_contract_page(image_url, image_store)
+        if page_result and progress is not None:
+            progress.event("page_extracted", {"document_type": doc_type, "page": page_result[0], "result": page_result[1]})
+        return page_result
+
+    # 페이지별 처리를 동시에 실행하고 입력 순서대로 결과 취합
+    page_outcomes = run_concurrently(process_page, image_urls, PAGE_MAX_WORKERS)
+    for page_result, _ in page_outcomes:
+        if page_result:
+            page_number, json_data = page_result
+            all_results[f"page{page_number}"] = json_data
 
     if all_results:
         all_results = edit_period(all_results)
@@ -0,0 +1,96 @@
+# 분석 작업 진행 이벤트 스트림 (Server-Sent Events)
+# views.py(analysis_events, ASGI) -> events.py(SSE 메시지 생성) -> jobs.py(이벤트 조회)
+#
+# 작업은 어느 워커 프로세스에서든 실행될 수 있으므로 작업 큐 SQLite 파일의 이벤트 테이블을
+# 짧은 주기로 조회해 새 이벤트만 전달한다. 이벤트 id를 SSE id로 보내므로 연결이 끊겨도
+# 브라우저가 Last-Event-ID로 다시 연결하면 이어서 받을 수 있다.
+#
+# 이벤트 종류 (event 필드)
+#   stage: 단계 시작 (fetch_documents, ocr, save_ocr, ai_analysis, summary ...)
+#   ocr_done, page_extracted, geocoding_done, price_done, solution_done: 중간 결과
+#   result: 작업 종료 (status, http_status, result). 이후 스트림 종료
+
+import asyncio
+import json
+import os
+import time
+from .jobs import get_job, get_job_events
+
+SSE_POLL_INTERVAL = float(os.getenv("SSE_POLL_INTERVAL", "0.5"))  # 이벤트 조회 주기(초)
+SSE_HEARTBEAT_SECONDS = 15  # 이벤트가 없을 때 연결 유지용 주석을 보내는 주기(초)
+SSE_MAX_SECONDS = float(os.getenv("SSE_MAX_SECONDS", "1800"))  # 스트림 최대 유지 시간(초)
+
+FINISHED_STATUSES = ("completed", "failed")
+
+
+def format_sse(event, data, event_id=None):
+    """
+    SSE 메시지 한 건을 문자열로 변환
+
+    Args:
+        event (str): 이벤트 이름
+        data: JSON으로 보낼 데이터
+        event_id (int): 이벤트 ID (재연결 시 Last-Event-ID로 돌아옴)
+
+    Returns:
+        str: "id: ...\\nevent: ...\\ndata: ...\\n\\n" 형식 문자열
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    # JSON은 한 줄로 직렬화되므로 data 줄 하나로 충분
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream_job_events(job_id, last_event_id=0):
+    """
+    작업 이벤트를 SSE 메시지로 내보내는 비동기 제너레이터
+
+    Args:
+        job_id (str): 작업 ID
+        last_event_id (int): 이미 받은 마지막 이벤트 ID (이후 이벤트부터 전송)
+
+    Yields:
+        str: SSE 메시지
+    """
+    started = time.monotonic()
+    last_sent = started
+    yield "retry: 3000\n\n"
+
+    while True:
+        job = await asyncio.to_thread(get_job_events, job_id, last_event_id)
+        if job is None:
+            yield format_sse("error", {"message": "작업을 찾을 수 없습니다"})
+            return
+
+        status, events = job
+        for event in events:
+            last_event_id = event["id"]
+            if event["kind"] == "stage":
+                payload = {"stage": event["name"], "at": event["at"]}
+                yield format_sse("stage", payload, event["id"])
+            else:
+                payload = {"at": event["at"], **(event["data"] or {})}
+                yield format_sse(event["name"], payload, event["id"])
+            last_sent = time.monotonic()
+
+        if status in FINISHED_STATUSES:
+            final = await asyncio.to_thread(get_job, job_id)
+            yield format_sse("result", {
+                "status": final["status"],
+                "http_status": final["http_status"],
+                "result": final["result"],
+            })
+            return
+
+        now = time.monotonic()
+        if now - started > SSE_MAX_SECONDS:
+            yield format_sse("timeout", {"message": "스트림 유지 시간이 지났습니다. 상태 조회 API를 사용하세요."})
+            return
+        if now - last_sent > SSE_HEARTBEAT_SECONDS:
+            yield ": keep-alive\n\n"
+            last_sent = now
+
+        await asyncio.sleep(SSE_POLL_INTERVAL)
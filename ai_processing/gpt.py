@@ -0,0 +1,122 @@
+# GPT 호출 공통 함수 (요청 내용 해시 기반 응답 캐시)
+# *_ocr.py, ai_analysis2.py(GPT 호출) -> gpt.py(캐시 조회 후 OpenAI 호출)
+#
+# 모델, 메시지(OCR 데이터, 템플릿, 이미지 포함), 파라미터가 모두 같은 요청은
+# 이전 응답을 그대로 돌려주므로 바뀌지 않은 문서를 다시 분석할 때 토큰을 쓰지 않는다.
+# 호출마다 "gpt.{호출 위치}" 스팬에 소요 시간과 응답의 usage(prompt/completion 토큰)를 기록한다.
+
+import hashlib
+import json
+import os
+from django.conf import settings
+from .cache import create_cache
+from .tracing import add_counts, span
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken이 없으면 글자 수로 토큰 수를 추정
+    tiktoken = None
+
+GPT_CACHE_ENABLED = os.getenv("GPT_CACHE_ENABLED", "true").lower() == "true"
+GPT_CACHE_SIZE = int(os.getenv("GPT_CACHE_SIZE", "512"))
+GPT_CACHE_TTL = float(os.getenv("GPT_CACHE_TTL", str(7 * 24 * 3600)))
+# 영구 캐시 파일 (기본은 메모리 캐시만 사용, 예: GPT_CACHE_DB=gpt_cache.sqlite3 이면 BASE_DIR 아래 파일에 저장)
+# 만료된 행은 SQLiteCache가 열 때와 주기적으로 지운다.
+GPT_CACHE_DB = os.getenv("GPT_CACHE_DB", "")
+if GPT_CACHE_DB:
+    GPT_CACHE_DB = os.path.join(settings.BASE_DIR, GPT_CACHE_DB)
+# 캐시를 사용하지 않을 호출 위치 (쉼표로 구분, 예: "summary,solution")
+GPT_CACHE_OPT_OUT = {site.strip() for site in os.getenv("GPT_CACHE_OPT_OUT", "").split(",") if site.strip()}
+
+gpt_cache = create_cache("gpt", max_size=GPT_CACHE_SIZE, ttl=GPT_CACHE_TTL, db_path=GPT_CACHE_DB or None)
+
+
+def request_key(request):
+    """요청 전체(모델, 메시지, 파라미터)를 정렬된 JSON으로 만들어 sha256 해시"""
+    payload = json.dumps(request, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def count_tokens(text, model="gpt-4o"):
+    """
+    텍스트의 토큰 수 계산 (tiktoken이 없으면 추정치)
+
+    Returns:
+        int: 토큰 수
+    """
+    if tiktoken is not None:
+        try:
+            return len(tiktoken.encoding_for_model(model).encode(text))
+        except KeyError:
+            return len(tiktoken.get_encoding("o200k_base").encode(text))
+    # 한글은 대략 1글자 1토큰, 영문/숫자/기호는 약 4글자 1토큰
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+def count_message_tokens(messages, model="gpt-4o"):
+    """메시지 목록의 텍스트 토큰 수 합계 (이미지는 제외)"""
+    total = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            total += count_tokens(content, model)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    total += count_tokens(part["text"], model)
+    return total
+
+
+def is_json(text):
+    """응답이 JSON으로 파싱되는지 확인 (파싱 안 되는 응답은 캐시하지 않기 위해 사용)"""
+    try:
+        json.loads(text.replace("```json", "").replace("```", "").strip())
+        return True
+    except (ValueError, AttributeError):
+        return False
+
+
+def chat_completion(client, site, use_cache=True, cache_if=None, **request):
+    """
+    client.chat.completions.create 호출 후 응답 텍스트 반환 (같은 요청은 캐시된 응답 사용)
+
+    Args:
+        client: OpenAI 클라이언트
+        site (str): 호출 위치 이름 (GPT_CACHE_OPT_OUT 및 로그에 사용)
+        use_cache (bool): False면 캐시를 조회하지도 저장하지도 않음
+        cache_if (callable): text -> bool. False를 반환하는 응답은 저장하지 않음
+        **request: chat.completions.create 인자 (model, messages, max_tokens 등)
+
+    Returns:
+        str: 응답 메시지 내용
+    """
+    def call():
+        prompt_tokens = count_message_tokens(request.get("messages", []), request.get("model", "gpt-4o"))
+        print(f"📊 GPT 입력 토큰 ({site}): {prompt_tokens}")
+        response = client.chat.completions.create(**request)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            add_counts(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+        text = response.choices[0].message.content
+        if cache_if is not None and not cache_if(text):
+            print(f"⚠️ GPT 응답 형식 오류로 캐시하지 않음 ({site})")
+            return text, False
+        return text, None
+
+    with span(f"gpt.{site}", site=site, model=request.get("model")) as current:
+        if not use_cache or not GPT_CACHE_ENABLED or site in GPT_CACHE_OPT_OUT:
+            return call()[0]
+
+        key = request_key(request)
+        loaded = []
+
+        def load():
+            loaded.append(True)
+            return call()
+
+        text = gpt_cache.get_or_load(key, load)
+        current.set(cached=not loaded)
+        if not loaded:
+            print(f"✅ GPT 캐시 사용 ({site}, {key[:12]})")
+        return text
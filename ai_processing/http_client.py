@@ -0,0 +1,116 @@
+# 외부 HTTP 호출용 공용 세션 (연결 재사용 + 타임아웃 + 재시도)
+# *_ocr.py, ai_analysis2.py, image_store.py(외부 호출) -> http_client.py(업스트림별 세션)
+#
+# 업스트림(ocr / geocoding / storage)마다 세션을 하나씩 두고 호스트별 연결 풀을 재사용해
+# 호출마다 TCP/TLS 연결을 새로 맺지 않도록 한다. 모든 요청에 기본 타임아웃을 적용해
+# 응답 없는 외부 서버 때문에 gunicorn 워커가 멈춰 있지 않도록 한다.
+# 요청마다 스팬(tracing.py)을 남겨 업스트림별 소요 시간과 송수신 바이트를 기록한다.
+#
+# 환경 변수 (NAME은 OCR, GEOCODING, STORAGE)
+#   HTTP_{NAME}_CONNECT_TIMEOUT, HTTP_{NAME}_READ_TIMEOUT: 타임아웃(초)
+#   HTTP_{NAME}_RETRIES, HTTP_{NAME}_BACKOFF: 재시도 횟수, 재시도 간격 계수
+#   HTTP_POOL_MAXSIZE: 호스트별 최대 연결 수
+
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .tracing import span
+
+# 업스트림별 기본 설정 (연결 타임아웃, 읽기 타임아웃, 재시도 횟수, backoff 계수, 재시도할 메서드,
+# 연결 이후 실패(읽기 오류, 5xx/429 응답)도 재시도할지 여부)
+UPSTREAM_DEFAULTS = {
+    # Clova OCR: 인식에 시간이 걸리므로 읽기 타임아웃을 길게.
+    # 과금되고 멱등하지 않은 POST라 요청이 전달되지 않은 연결 실패만 재시도 (중복 과금 방지)
+    "ocr": {"connect": 5, "read": 60, "retries": 2, "backoff": 1.0, "methods": ["POST"], "retry_after_send": False},
+    "geocoding": {"connect": 3, "read": 10, "retries": 3, "backoff": 0.3, "methods": ["GET"], "retry_after_send": True},
+    # Firebase Storage / GCS 이미지, CSV 다운로드
+    "storage": {"connect": 5, "read": 30, "retries": 3, "backoff": 0.3, "methods": ["GET", "HEAD"], "retry_after_send": True},
+}
+# 업스트림별 스팬 이름 (지표의 stage 라벨)
+SPAN_NAMES = {"ocr": "clova_ocr", "geocoding": "geocoding_api", "storage": "image_download"}
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+# 설정 이름 -> 환경 변수 접미사
+_ENV_SUFFIXES = {"connect": "CONNECT_TIMEOUT", "read": "READ_TIMEOUT", "retries": "RETRIES", "backoff": "BACKOFF"}
+
+
+def _setting(upstream, name, cast):
+    value = os.getenv(f"HTTP_{upstream.upper()}_{_ENV_SUFFIXES[name]}")
+    return cast(value) if value else UPSTREAM_DEFAULTS[upstream][name]
+
+
+def _body_size(body):
+    if isinstance(body, (bytes, str)):
+        return len(body)
+    return 0
+
+
+class TimeoutSession(requests.Session):
+    """timeout을 지정하지 않은 요청에 기본 타임아웃을 적용하고 요청마다 스팬을 남기는 세션"""
+
+    def __init__(self, timeout, span_name="http"):
+        super().__init__()
+        self.default_timeout = timeout
+        self.span_name = span_name
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.default_timeout)
+        with span(self.span_name, method=method) as current:
+            response = super().request(method, url, **kwargs)
+            current.set(status=response.status_code)
+            # stream=True 요청은 호출한 쪽이 본문을 일부만 읽을 수 있으므로 수신 바이트는 기록하지 않음
+            received = 0 if kwargs.get("stream") else len(response.content)
+            current.add(bytes_out=_body_size(response.request.body), bytes_in=received)
+            return response
+
+
+def _create_session(upstream):
+    retries = _setting(upstream, "retries", int)
+    retry_after_send = UPSTREAM_DEFAULTS[upstream]["retry_after_send"]
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries if retry_after_send else 0,
+        status=retries if retry_after_send else 0,
+        backoff_factor=_setting(upstream, "backoff", float),
+        status_forcelist=RETRY_STATUS_CODES if retry_after_send else (),
+        allowed_methods=UPSTREAM_DEFAULTS[upstream]["methods"],
+        # 재시도 후에도 실패하면 예외 대신 마지막 응답을 돌려줘 기존처럼 status_code로 처리
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+
+    session = TimeoutSession(
+        (_setting(upstream, "connect", float), _setting(upstream, "read", float)),
+        span_name=SPAN_NAMES.get(upstream, upstream)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(upstream):
+    """
+    업스트림별 공용 세션 반환 (처음 요청 시 생성)
+
+    Args:
+        upstream (str): "ocr", "geocoding", "storage" 중 하나
+
+    Returns:
+        requests.Session: 연결 풀, 타임아웃, 재시도가 설정된 세션
+    """
+    session = _sessions.get(upstream)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(upstream)
+            if session is None:
+                session = _create_session(upstream)
+                _sessions[upstream] = session
+    return session
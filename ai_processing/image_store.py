@@ -0,0 +1,192 @@
+# 분석 1회 동안 사용하는 페이지 이미지 저장소
+# OCR, 이미지 크기 조회, 바운딩 박스 시각화가 같은 이미지를 여러 번 다운로드하지 않도록
+# 파이프라인 시작 시 하나 만들어 각 단계에 전달한다.
+
+import os
+import struct
+import threading
+from io import BytesIO
+from PIL import Image
+from .http_client import get_session
+
+# 크기 조회 시 헤더를 찾기 위해 읽을 최대 바이트 수 (EXIF 등 앞부분 세그먼트 포함)
+PROBE_MAX_BYTES = int(os.getenv("IMAGE_PROBE_MAX_BYTES", str(256 * 1024)))
+PROBE_CHUNK_SIZE = 16 * 1024
+SIZE_CACHE_MAX = 1024  # URL별 크기 캐시 최대 개수
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# 크기 정보를 담고 있는 JPEG SOF 마커 (DHT, JPG, DAC 제외)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# 길이 필드가 없는 JPEG 마커
+_JPEG_STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+
+_size_cache = {}
+_size_cache_lock = threading.Lock()
+
+
+def parse_image_size(data):
+    """
+    JPEG/PNG 앞부분 바이트에서 이미지 크기를 읽는 함수
+
+    Args:
+        data (bytes): 이미지 앞부분 (전체일 필요 없음)
+
+    Returns:
+        tuple: (width, height). 헤더가 아직 다 들어오지 않았거나 지원하지 않는 형식이면 None
+    """
+    # PNG: 시그니처(8) + IHDR 길이(4) + 타입(4) + 너비(4) + 높이(4)
+    if data.startswith(_PNG_SIGNATURE):
+        if len(data) < 24 or data[12:16] != b"IHDR":
+            return None
+        return struct.unpack(">II", data[16:24])
+
+    # JPEG: SOI 이후 세그먼트를 건너뛰며 SOF 마커를 찾음
+    if not data.startswith(b"\xff\xd8"):
+        return None
+
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:  # 채움 바이트
+            offset += 1
+            continue
+        if marker in _JPEG_STANDALONE_MARKERS:
+            offset += 2
+            continue
+        if marker == 0xD9:  # EOI
+            return None
+
+        segment_length = struct.unpack(">H", data[offset + 2:offset + 4])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            if offset + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + segment_length
+
+    return None
+
+
+def _cache_size(url, size):
+    with _size_cache_lock:
+        if len(_size_cache) >= SIZE_CACHE_MAX:
+            _size_cache.pop(next(iter(_size_cache)))
+        _size_cache[url] = size
+
+
+def probe_image_size(url):
+    """
+    이미지 전체를 받지 않고 헤더 부분만 읽어 크기를 확인하는 함수
+
+    Range 요청으로 앞부분만 요청하고, 서버가 Range를 무시하더라도 스트리밍으로 읽다가
+    크기를 찾는 즉시 연결을 끊는다. 결과는 URL별로 캐시한다.
+
+    Args:
+        url (str): 이미지 URL
+
+    Returns:
+        tuple: (width, height). 실패 시 None
+    """
+    if url in _size_cache:
+        return _size_cache[url]
+
+    headers = {"Range": f"bytes=0-{PROBE_MAX_BYTES - 1}"}
+    with get_session("storage").get(url, headers=headers, stream=True) as response:
+        if response.status_code not in (200, 206):
+            print(f"❌ 이미지 헤더 요청 실패 (상태 코드: {response.status_code}): {url}")
+            return None
+
+        data = b""
+        for chunk in response.iter_content(chunk_size=PROBE_CHUNK_SIZE):
+            data += chunk
+            size = parse_image_size(data)
+            if size:
+                _cache_size(url, size)
+                return size
+            if len(data) >= PROBE_MAX_BYTES:
+                break
+
+    print(f"⚠️ 이미지 헤더에서 크기를 찾지 못했습니다: {url}")
+    return None
+
+
+class ImageStore:
+    """URL별 이미지 바이트와 크기(width, height)를 메모리에 보관하는 저장소"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        self._data = {}
+        self._sizes = {}
+
+    def _url_lock(self, url):
+        with self._lock:
+            if url not in self._url_locks:
+                self._url_locks[url] = threading.Lock()
+            return self._url_locks[url]
+
+    def get_bytes(self, url):
+        """
+        이미지 원본 바이트 반환 (처음 요청 시에만 다운로드)
+
+        Args:
+            url (str): 이미지 URL
+
+        Returns:
+            bytes: 이미지 데이터. 다운로드 실패 시 None
+        """
+        if url in self._data:
+            return self._data[url]
+
+        # 같은 URL을 여러 스레드가 동시에 요청해도 한 번만 다운로드
+        with self._url_lock(url):
+            if url in self._data:
+                return self._data[url]
+
+            response = get_session("storage").get(url)
+            if response.status_code != 200:
+                print(f"❌ 이미지 다운로드 실패 (상태 코드: {response.status_code}): {url}")
+                return None
+
+            self._data[url] = response.content
+            return self._data[url]
+
+    def get_image(self, url):
+        """
+        PIL 이미지 반환 (호출할 때마다 새 객체이므로 그림을 그려도 저장소에는 영향 없음)
+
+        Returns:
+            PIL.Image: 이미지. 다운로드 실패 시 None
+        """
+        data = self.get_bytes(url)
+        if data is None:
+            return None
+        return Image.open(BytesIO(data))
+
+    def get_size(self, url):
+        """
+        이미지 크기 반환 (헤더만 읽고 픽셀은 디코딩하지 않음)
+
+        이미 받은 이미지는 저장된 바이트에서, 아직 받지 않은 이미지는
+        전체를 다운로드하지 않고 헤더만 요청해서 읽는다.
+
+        Returns:
+            tuple: (width, height). 실패 시 None
+        """
+        if url in self._sizes:
+            return self._sizes[url]
+
+        data = self._data.get(url)
+        if data is None:
+            size = probe_image_size(url)
+        else:
+            size = parse_image_size(data)
+            if size is None:
+                with Image.open(BytesIO(data)) as img:
+                    size = img.size
+
+        if size:
+            self._sizes[url] = size
+        return size
@@ -0,0 +1,407 @@
+# SQLite 기반 분석 작업 큐
+# views.py(작업 등록/조회) -> jobs.py(큐 + 워커 스레드) -> pipeline.py(분석 실행)
+#
+# 작업 상태: queued → running → completed / failed
+# 이벤트: 단계 시작(kind='stage')과 단계 안의 세부 결과(kind='event', 예: 문서별 OCR 완료)를
+#         analysis_job_events에 순서대로 기록하고 events.py가 SSE로 전달한다.
+# 외부 브로커 없이 각 gunicorn 워커 프로세스가 워커 스레드를 띄워 같은 SQLite 파일에서 작업을 가져간다.
+# 워커 스레드는 프로세스 시작 시(jibsinpj/asgi.py) 시작하므로 재시작 전에 남은 작업도 바로 이어서 처리한다.
+#
+# 작업을 가져간 워커는 worker(호스트:pid:스레드)를 기록하고 실행 중에 heartbeat_at을 주기적으로 갱신한다.
+# heartbeat가 JOB_STALE_SECONDS 넘게 끊긴 작업만 종료된 워커의 작업으로 보고 다시 큐에 넣으며,
+# 결과 저장은 작업을 아직 가지고 있는 워커만 할 수 있다 (같은 작업이 두 번 실행되어 결과를 덮어쓰지 않도록).
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from django.conf import settings
+from firebase_api.utils import update_analysis_status
+from .pipeline import AnalysisProgress, run_ai_analysis
+
+JOB_DB_PATH = os.getenv("ANALYSIS_JOB_DB", os.path.join(settings.BASE_DIR, "analysis_jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "2"))  # 프로세스당 워커 스레드 수
+JOB_POLL_INTERVAL = float(os.getenv("ANALYSIS_JOB_POLL_INTERVAL", "2"))  # 다른 프로세스가 넣은 작업 확인 주기(초)
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("ANALYSIS_JOB_HEARTBEAT_INTERVAL", "15"))  # 실행 중인 작업의 heartbeat 갱신 주기(초)
+JOB_STALE_SECONDS = float(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "120"))  # heartbeat가 이 시간 넘게 없으면 다시 큐에 넣음(초)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    job_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    contract_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    http_status INTEGER,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    worker TEXT,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status ON analysis_jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS analysis_job_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'stage',
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_job_events_job ON analysis_job_events (job_id, id);
+"""
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+_workers_lock = threading.Lock()
+_workers_pid = None
+_wakeup = threading.Event()
+
+
+def _connect():
+    """SQLite 연결 생성 (스레드마다 새 연결 사용)"""
+    global _schema_ready
+    conn = sqlite3.connect(JOB_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if not _schema_ready:
+        # 워커 스레드와 요청 스레드가 동시에 처음 연결해도 마이그레이션은 한 번만 실행
+        with _schema_lock:
+            if not _schema_ready:
+                _migrate(conn)
+                _schema_ready = True
+    return conn
+
+
+def _migrate(conn):
+    """테이블 생성 및 이전 버전 DB 파일에 없는 컬럼 추가"""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    # 이전 버전에서 만든 DB 파일에는 이벤트 컬럼이 없으므로 추가
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(analysis_job_events)")}
+    if "kind" not in columns:
+        conn.execute("ALTER TABLE analysis_job_events ADD COLUMN kind TEXT NOT NULL DEFAULT 'stage'")
+    if "data" not in columns:
+        conn.execute("ALTER TABLE analysis_job_events ADD COLUMN data TEXT")
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(analysis_jobs)")}
+    if "worker" not in columns:
+        conn.execute("ALTER TABLE analysis_jobs ADD COLUMN worker TEXT")
+    if "heartbeat_at" not in columns:
+        conn.execute("ALTER TABLE analysis_jobs ADD COLUMN heartbeat_at REAL")
+
+
+def _add_event(conn, job_id, stage, now, kind="stage", data=None):
+    conn.execute(
+        "INSERT INTO analysis_job_events (job_id, stage, created_at, kind, data) VALUES (?, ?, ?, ?, ?)",
+        (job_id, stage, now, kind, json.dumps(data, ensure_ascii=False, default=str) if data is not None else None)
+    )
+
+
+class JobProgress(AnalysisProgress):
+    """작업 큐에 단계별 진행 상황을 기록하는 AnalysisProgress 구현"""
+
+    def __init__(self, job_id, user_id, contract_id):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.contract_id = contract_id
+
+    def stage(self, name):
+        now = time.time()
+        conn = _connect()
+        try:
+            conn.execute(
+                "UPDATE analysis_jobs SET stage = ?, updated_at = ? WHERE job_id = ?",
+                (name, now, self.job_id)
+            )
+            _add_event(conn, self.job_id, name, now)
+        finally:
+            conn.close()
+        update_analysis_status(self.user_id, self.contract_id, "processing", stage=name)
+
+    def event(self, name, data=None):
+        now = time.time()
+        conn = _connect()
+        try:
+            # 세부 이벤트도 진행 중 표시로 updated_at 갱신 (작업 소유 확인은 heartbeat_at)
+            conn.execute("UPDATE analysis_jobs SET updated_at = ? WHERE job_id = ?", (now, self.job_id))
+            _add_event(conn, self.job_id, name, now, kind="event", data=data)
+        finally:
+            conn.close()
+
+
+def enqueue_analysis(user_id, contract_id):
+    """
+    분석 작업을 큐에 등록하는 함수
+
+    같은 계약에 대해 대기 중이거나 실행 중인 작업이 있으면 새로 만들지 않고 기존 작업을 반환한다.
+
+    Args:
+        user_id (str): 사용자 ID
+        contract_id (str): 계약 ID
+
+    Returns:
+        str: 작업 ID
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT job_id FROM analysis_jobs WHERE user_id = ? AND contract_id = ? "
+            "AND status IN ('queued', 'running') ORDER BY created_at DESC LIMIT 1",
+            (user_id, contract_id)
+        ).fetchone()
+        if row:
+            conn.execute("COMMIT")
+            print(f"⚠️ 이미 진행 중인 분석 작업이 있습니다: {row['job_id']}")
+            return row["job_id"]
+
+        job_id = uuid.uuid4().hex
+        conn.execute(
+            "INSERT INTO analysis_jobs (job_id, user_id, contract_id, status, stage, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', 'queued', ?, ?)",
+            (job_id, user_id, contract_id, now, now)
+        )
+        _add_event(conn, job_id, "queued", now)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    update_analysis_status(user_id, contract_id, "processing", stage="queued")
+    print(f"✅ 분석 작업 등록: {job_id} ({user_id}/{contract_id})")
+
+    # 보통은 프로세스 시작 시 이미 시작되어 있음 (asgi.py를 거치지 않는 실행 환경 대비)
+    start_workers()
+    _wakeup.set()
+    return job_id
+
+
+def get_job(job_id):
+    """
+    작업 상태와 단계별 진행 이력을 조회하는 함수
+
+    Args:
+        job_id (str): 작업 ID
+
+    Returns:
+        dict: 작업 정보. 없으면 None
+    """
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM analysis_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        events = conn.execute(
+            "SELECT stage, created_at FROM analysis_job_events WHERE job_id = ? AND kind = 'stage' ORDER BY id",
+            (job_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    return {
+        "job_id": row["job_id"],
+        "user_id": row["user_id"],
+        "contract_id": row["contract_id"],
+        "status": row["status"],
+        "stage": row["stage"],
+        "stages": [
+            {"stage": event["stage"], "at": event["created_at"]}
+            for event in events
+        ],
+        "http_status": row["http_status"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+
+def get_job_events(job_id, after_id=0):
+    """
+    작업 상태와 after_id 이후에 기록된 이벤트를 조회하는 함수 (SSE 스트림에서 주기적으로 호출)
+
+    Args:
+        job_id (str): 작업 ID
+        after_id (int): 마지막으로 받은 이벤트 ID
+
+    Returns:
+        tuple: (작업 상태, 이벤트 리스트). 작업이 없으면 None
+    """
+    conn = _connect()
+    try:
+        # 상태와 이벤트를 같은 시점 기준으로 읽음
+        conn.execute("BEGIN")
+        row = conn.execute("SELECT status FROM analysis_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if not row:
+            conn.execute("COMMIT")
+            return None
+        events = conn.execute(
+            "SELECT id, stage, kind, data, created_at FROM analysis_job_events "
+            "WHERE job_id = ? AND id > ? ORDER BY id",
+            (job_id, after_id)
+        ).fetchall()
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+    return row["status"], [
+        {
+            "id": event["id"],
+            "kind": event["kind"],
+            "name": event["stage"],
+            "data": json.loads(event["data"]) if event["data"] else None,
+            "at": event["created_at"],
+        }
+        for event in events
+    ]
+
+
+def _worker_id():
+    """현재 워커 스레드 식별자 (호스트:pid:스레드 이름)"""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+
+def _requeue_stale_jobs(conn):
+    """heartbeat가 JOB_STALE_SECONDS 넘게 끊긴 running 작업(종료된 워커의 작업)을 다시 대기 상태로 돌림"""
+    now = time.time()
+    # heartbeat_at이 없는 작업은 이전 버전에서 시작한 작업이므로 updated_at 기준
+    cursor = conn.execute(
+        "UPDATE analysis_jobs SET status = 'queued', worker = NULL, heartbeat_at = NULL, updated_at = ? "
+        "WHERE status = 'running' AND COALESCE(heartbeat_at, updated_at) < ?",
+        (now, now - JOB_STALE_SECONDS)
+    )
+    if cursor.rowcount:
+        print(f"⚠️ 중단된 분석 작업 {cursor.rowcount}건을 다시 큐에 넣었습니다.")
+
+
+def _claim_next_job(worker):
+    """대기 중인 작업 하나를 running 상태로 가져옴 (worker를 작업 소유자로 기록)"""
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _requeue_stale_jobs(conn)
+        row = conn.execute(
+            "SELECT job_id, user_id, contract_id FROM analysis_jobs "
+            "WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row:
+            now = time.time()
+            conn.execute(
+                "UPDATE analysis_jobs SET status = 'running', worker = ?, heartbeat_at = ?, updated_at = ? "
+                "WHERE job_id = ?",
+                (worker, now, now, row["job_id"])
+            )
+        conn.execute("COMMIT")
+        return dict(row) if row else None
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _heartbeat(job_id, worker, stop):
+    """작업이 끝날 때까지 JOB_HEARTBEAT_INTERVAL마다 heartbeat_at 갱신 (단계가 오래 걸려도 작업을 빼앗기지 않도록)"""
+    while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+        try:
+            conn = _connect()
+            try:
+                conn.execute(
+                    "UPDATE analysis_jobs SET heartbeat_at = ? WHERE job_id = ? AND status = 'running' AND worker = ?",
+                    (time.time(), job_id, worker)
+                )
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"⚠️ 분석 작업 heartbeat 갱신 실패: {job_id} - {e}")
+
+
+def _finish_job(job_id, worker, http_status, result):
+    """
+    작업 결과 저장 (작업을 아직 가지고 있는 경우에만)
+
+    Returns:
+        bool: 저장 여부. 다른 워커가 다시 가져간 작업이면 False
+    """
+    now = time.time()
+    status = "completed" if http_status == 200 else "failed"
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.execute(
+            "UPDATE analysis_jobs SET status = ?, stage = ?, http_status = ?, result = ?, updated_at = ?, "
+            "heartbeat_at = NULL WHERE job_id = ? AND status = 'running' AND worker = ?",
+            (status, status, http_status, json.dumps(result, ensure_ascii=False, default=str), now, job_id, worker)
+        )
+        if cursor.rowcount:
+            _add_event(conn, job_id, status, now)
+        conn.execute("COMMIT")
+        return bool(cursor.rowcount)
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _worker_loop():
+    worker = _worker_id()
+    while True:
+        try:
+            job = _claim_next_job(worker)
+        except Exception as e:
+            print(f"❌ 분석 작업 조회 실패: {e}")
+            job = None
+
+        if not job:
+            _wakeup.wait(JOB_POLL_INTERVAL)
+            _wakeup.clear()
+            continue
+
+        job_id = job["job_id"]
+        print(f"🚀 분석 작업 시작: {job_id}")
+        stop_heartbeat = threading.Event()
+        threading.Thread(
+            target=_heartbeat, args=(job_id, worker, stop_heartbeat), name=f"{worker}-heartbeat", daemon=True
+        ).start()
+        try:
+            progress = JobProgress(job_id, job["user_id"], job["contract_id"])
+            http_status, result = run_ai_analysis(job["user_id"], job["contract_id"], progress=progress)
+        except Exception as e:
+            traceback.print_exc()
+            http_status, result = 500, {
+                'success': False,
+                'message': f'분석 처리 중 오류가 발생했습니다: {str(e)}'
+            }
+        finally:
+            stop_heartbeat.set()
+
+        try:
+            if _finish_job(job_id, worker, http_status, result):
+                print(f"✅ 분석 작업 종료: {job_id} (status={http_status})")
+            else:
+                print(f"⚠️ 다른 워커가 가져간 작업이므로 결과를 저장하지 않습니다: {job_id}")
+        except Exception as e:
+            print(f"❌ 분석 작업 결과 저장 실패: {job_id} - {e}")
+
+
+def start_workers():
+    """
+    현재 프로세스에서 워커 스레드를 시작 (프로세스당 한 번, fork 후에는 다시 시작)
+
+    jibsinpj/asgi.py에서 프로세스 시작 시 호출해 재시작 전에 남은 queued 작업을 바로 처리한다.
+    """
+    global _workers_pid
+    with _workers_lock:
+        if _workers_pid == os.getpid():
+            return
+        for i in range(JOB_WORKERS):
+            thread = threading.Thread(target=_worker_loop, name=f"analysis-worker-{i}", daemon=True)
+            thread.start()
+        _workers_pid = os.getpid()
+        print(f"✅ 분석 워커 {JOB_WORKERS}개 시작 (pid={_workers_pid})")
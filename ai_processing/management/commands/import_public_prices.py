@@ -0,0 +1,36 @@
+# 공시가격 CSV를 로컬 저장소(SQLite)로 가져오는 명령
+# 사용 예:
+#   python manage.py import_public_prices                       # 모든 시도 GCS CSV
+#   python manage.py import_public_prices --sido 서울특별시 경기도  # 일부 시도만
+#   python manage.py import_public_prices ./data/seoul.csv      # 로컬 CSV
+
+from django.core.management.base import BaseCommand, CommandError
+from ai_processing import price_store
+
+
+class Command(BaseCommand):
+    help = "공시가격 CSV를 로컬 공시가격 저장소로 가져옵니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("sources", nargs="*", help="CSV 경로 또는 URL (생략 시 시도별 GCS CSV)")
+        parser.add_argument("--sido", nargs="+", help="GCS에서 가져올 시도 (sources 생략 시)")
+        parser.add_argument("--encoding", default="utf-8", help="CSV 인코딩")
+
+    def handle(self, *args, **options):
+        sources = options["sources"]
+        if not sources:
+            sido_list = options["sido"] or list(price_store.PUBLIC_PRICE_CSV_URLS)
+            unknown = [sido for sido in sido_list if sido not in price_store.PUBLIC_PRICE_CSV_URLS]
+            if unknown:
+                raise CommandError(f"알 수 없는 시도: {unknown}")
+            sources = [price_store.PUBLIC_PRICE_CSV_URLS[sido] for sido in sido_list]
+
+        self.stdout.write(f"저장소: {price_store.PRICE_DB_PATH}")
+        for source in sources:
+            self.stdout.write(f"가져오는 중: {source}")
+            try:
+                counts = price_store.import_csv(source, encoding=options["encoding"])
+            except Exception as e:
+                raise CommandError(f"❌ {source} 가져오기 실패: {e}")
+            for sido, row_count in counts.items():
+                self.stdout.write(self.style.SUCCESS(f"✅ {sido}: {row_count}건"))
@@ -0,0 +1,212 @@
+# 단계별 소요 시간 / 전송량 / GPT 토큰 지표 (Prometheus 텍스트 형식으로 노출)
+# tracing.py(스팬 종료 시 기록) -> metrics.py(SQLite에 누적) -> views.py(metrics 엔드포인트)
+#
+# gunicorn 워커 프로세스와 작업 큐 워커 스레드가 모두 같은 값을 누적해야
+# 어느 워커가 /metrics 요청을 받아도 전체 값이 보이므로 작업 큐처럼 SQLite 파일 하나에 저장한다.
+# 분석 1회의 지표는 끝날 때 한 트랜잭션으로 모아서 쓴다.
+# trace 밖의 스팬(개별 HTTP 호출 등)은 프로세스 메모리에 모아 두었다가 METRICS_FLUSH_SIZE건이 쌓이거나
+# METRICS_FLUSH_INTERVAL초가 지난 뒤의 다음 기록, 다음 trace 저장, /metrics 조회, 프로세스 종료 시에 한 번에 쓴다.
+#
+# 지표
+#   jibsin_stage_duration_seconds{stage}: 단계(스팬)별 소요 시간 히스토그램
+#   jibsin_stage_bytes_total{stage, direction}: 단계별 송신(out)/수신(in) 바이트
+#   jibsin_gpt_tokens_total{site, kind}: GPT 호출 위치별 prompt/completion 토큰
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+
+METRICS_DB_PATH = os.getenv("METRICS_DB", os.path.join(settings.BASE_DIR, "metrics.sqlite3"))
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "10"))  # 모아 둔 관측값을 쓰는 최대 간격(초)
+METRICS_FLUSH_SIZE = int(os.getenv("METRICS_FLUSH_SIZE", "200"))  # 이만큼 쌓이면 바로 씀
+
+# 히스토그램 버킷 상한(초). 캐시 적중(수 ms)부터 전체 분석(30~90초)까지 포함
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 300)
+
+# 지표 이름 -> (종류, 설명)
+METRICS = {
+    "jibsin_stage_duration_seconds": ("histogram", "분석 단계별 소요 시간(초)"),
+    "jibsin_stage_bytes_total": ("counter", "분석 단계별 송수신 바이트"),
+    "jibsin_gpt_tokens_total": ("counter", "GPT 호출 위치별 토큰 수"),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metric_values (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels, field)
+);
+"""
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+_pending_lock = threading.Lock()
+_pending = []
+_last_flush = time.monotonic()
+
+
+def _connect():
+    global _schema_ready
+    conn = sqlite3.connect(METRICS_DB_PATH, timeout=30, isolation_level=None)
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _schema_ready = True
+    return conn
+
+
+def _label_key(labels):
+    return json.dumps(labels, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def histogram(name, labels, value):
+    """히스토그램 관측값 한 건 (record에 넘길 형태)"""
+    return ("histogram", name, labels, value)
+
+
+def counter(name, labels, amount):
+    """카운터 증가분 한 건 (record에 넘길 형태)"""
+    return ("counter", name, labels, amount)
+
+
+def _rows(observation):
+    kind, name, labels, value = observation
+    key = _label_key(labels)
+    if kind == "counter":
+        yield name, key, "total", value
+        return
+    # 누적 버킷: 값 이상인 버킷 상한마다 1씩 증가
+    for bound in DURATION_BUCKETS:
+        if value <= bound:
+            yield name, key, f"le:{bound}", 1
+    yield name, key, "le:+Inf", 1
+    yield name, key, "sum", value
+    yield name, key, "count", 1
+
+
+def _take_pending():
+    """모아 둔 관측값을 꺼내고 비움"""
+    global _last_flush
+    with _pending_lock:
+        observations = list(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    return observations
+
+
+def _write(observations):
+    """관측값들을 (지표, 라벨, 필드)별로 합쳐 한 트랜잭션으로 누적 저장"""
+    totals = defaultdict(float)
+    for observation in observations:
+        for name, key, field, value in _rows(observation):
+            totals[(name, key, field)] += value
+    if not totals:
+        return
+
+    try:
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO metric_values (name, labels, field, value) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (name, labels, field) DO UPDATE SET value = value + excluded.value",
+                [(*key, value) for key, value in totals.items()]
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        # 지표 저장 실패가 분석을 실패시키지 않도록 로그만 남김
+        print(f"⚠️ 지표 저장 실패: {e}")
+
+
+def record(observations, buffered=False):
+    """
+    관측값들을 누적 저장
+
+    Args:
+        observations (list): histogram() / counter()로 만든 관측값 리스트
+        buffered (bool): True이면 바로 쓰지 않고 모아 두었다가 flush 시점에 한 번에 씀 (trace 밖의 스팬)
+    """
+    if not METRICS_ENABLED or not observations:
+        return
+
+    if buffered:
+        with _pending_lock:
+            _pending.extend(observations)
+            due = len(_pending) >= METRICS_FLUSH_SIZE or time.monotonic() - _last_flush >= METRICS_FLUSH_INTERVAL
+        if due:
+            flush()
+        return
+
+    # 모아 둔 관측값도 같은 트랜잭션으로 씀
+    _write(_take_pending() + list(observations))
+
+
+def flush():
+    """모아 둔 관측값을 저장"""
+    if METRICS_ENABLED:
+        _write(_take_pending())
+
+
+atexit.register(flush)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render():
+    """
+    누적된 지표를 Prometheus 텍스트 형식으로 변환
+
+    Returns:
+        str: /metrics 응답 본문
+    """
+    values = {}
+    if METRICS_ENABLED:
+        flush()
+        conn = _connect()
+        try:
+            for name, labels, field, value in conn.execute("SELECT name, labels, field, value FROM metric_values"):
+                values.setdefault(name, {}).setdefault(labels, {})[field] = value
+        finally:
+            conn.close()
+
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for label_key, fields in sorted(values.get(name, {}).items()):
+            labels = json.loads(label_key)
+            if kind == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(fields.get('total', 0))}")
+                continue
+            # 관측값이 없었던 버킷도 0으로 모두 출력
+            for bound in [str(bound) for bound in DURATION_BUCKETS] + ["+Inf"]:
+                count = fields.get(f"le:{bound}", 0)
+                lines.append(f"{name}_bucket{_format_labels(labels, {'le': bound})} {_format_value(count)}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(fields.get('sum', 0))}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_format_value(fields.get('count', 0))}")
+    return "\n".join(lines) + "\n"
@@ -1,135 +1,59 @@
-import time
 import pandas as pd
 import cv2
-import json
-import requests
-import uuid
-import os
-import tempfile
+import numpy as np
 from dotenv import load_dotenv
+from .http_client import get_session
+from .ocr_client import recognize
 
 #  환경 변수 로드
 load_dotenv()
 
-#  .env에서 환경 변수 가져오기
-OCR_SECRET_KEY = os.getenv("OCR_SECRET_KEY")
-OCR_API_URL = os.getenv("OCR_API_URL")
-
 MODEL = "gpt-4o"
 
-def download_image(image_url): # ocr을 수행하기 위해서는 local파일이 필요함!
+def download_image(image_url):
     """
-     이미지 URL에서 다운로드하여 임시 파일로 저장하는 함수
+     이미지 URL에서 원본 바이트를 다운로드하는 함수 (실패 시 None)
     """
-    response = requests.get(image_url, stream=True)
+    response = get_session("storage").get(image_url)
     if response.status_code != 200:
         print(f" 이미지 다운로드 실패: {image_url}")
         return None
-
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-    temp_file.write(response.content)
-    temp_file.flush()
-    temp_file.close()
-
-    return temp_file.name
+    return response.content
 
 def contract_ocr(image_url):
     """
      계약서 OCR 수행 함수 (이미지 URL을 받아서 OCR 처리)
     """
-    image_path = download_image(image_url) # 네이버 clova를 실행시키기 위해...
-    if not image_path:
+    image_data = download_image(image_url)
+    if not image_data:
         return pd.DataFrame()  # OCR 실패 시 빈 DataFrame 반환
 
-    image = cv2.imread(image_path)
+    image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
     if image is None:
         print(f" 계약서 이미지 로드 실패: {image_url}")
         return pd.DataFrame()
 
+    # 좌표를 1240x1753 기준으로 받기 위해 크기가 다를 때만 변환 후 업로드
     target_size = (1240, 1753)
-    image_resized = cv2.resize(image, target_size, interpolation=cv2.INTER_AREA)
-
-    request_json = {
-        'images': [{'format': 'jpg', 'name': 'contract'}],
-        'requestId': str(uuid.uuid4()),
-        'version': 'V2',
-        'timestamp': int(round(time.time() * 1000))
-    }
-    payload = {'message': json.dumps(request_json).encode('UTF-8')}
-    headers = {'X-OCR-SECRET': OCR_SECRET_KEY}
-
-    _, img_encoded = cv2.imencode('.jpg', image_resized)
-    files = [('file', ('contract.jpg', img_encoded.tobytes(), 'image/jpeg'))]
-
-    response = requests.post(OCR_API_URL, headers=headers, data=payload, files=files)
-
-    os.remove(image_path)  #  OCR 완료 후 임시 파일 삭제
-
-    if response.status_code == 200:
-        ocr_results = response.json()
-        all_data = []
-
-        for image_result in ocr_results['images']:
-            for field in image_result['fields']:
-                text = field['inferText']
-                bounding_box = field['boundingPoly']['vertices']
-                x1, y1 = int(bounding_box[0]['x']), int(bounding_box[0]['y'])
-                x2, y2 = int(bounding_box[2]['x']), int(bounding_box[2]['y'])
+    if (image.shape[1], image.shape[0]) != target_size:
+        image_resized = cv2.resize(image, target_size, interpolation=cv2.INTER_AREA)
+        _, img_encoded = cv2.imencode('.jpg', image_resized)
+        image_data = img_encoded.tobytes()
 
-                all_data.append({
-                    "Text": text,
-                    "x1": x1, "y1": y1,
-                    "x2": x2, "y2": y2
-                })
-
-        return pd.DataFrame(all_data) # OCR 성공 시 결과 반환
-
-    return pd.DataFrame()  # OCR 실패 시 빈 DataFrame 반환
+    df = recognize(image_data)
+    return df if df is not None else pd.DataFrame()  # OCR 실패 시 빈 DataFrame 반환
 
 def registry_ocr(image_url):
     """
      등기부등본 OCR 수행 함수 (이미지 URL을 받아서 OCR 처리)
     """
-    image_path = download_image(image_url) # clova를 실행시키기 위해서는 로컬파일 필요.
-    
-    if not image_path:
+    image_data = download_image(image_url)
+
+    if not image_data:
         print(f" 등기부등본 이미지 로드 실패: {image_url}")
         return pd.DataFrame()
 
-    request_json = {
-        'images': [{'format': 'jpg', 'name': 'ledger'}],
-        'requestId': str(uuid.uuid4()),
-        'version': 'V2',
-        'timestamp': int(round(time.time() * 1000))
-    }
-    payload = {'message': json.dumps(request_json).encode('UTF-8')}
-    files = [('file', open(image_path, 'rb'))]
-    headers = {'X-OCR-SECRET': OCR_SECRET_KEY}
-
-    response = requests.post(OCR_API_URL, headers=headers, data=payload, files=files)
-
-    os.remove(image_path)  #  OCR 완료 후 임시 파일 삭제
-
-    if response.status_code == 200:
-        ocr_results = response.json()
-        all_data = []
-
-        for image_result in ocr_results['images']:
-            for field in image_result['fields']:
-                text = field['inferText']
-                bounding_box = field['boundingPoly']['vertices']
-                x1, y1 = int(bounding_box[0]['x']), int(bounding_box[0]['y'])
-                x2, y2 = int(bounding_box[2]['x']), int(bounding_box[2]['y'])
-                all_data.append({
-                    "Text": text,
-                    "x1": x1, "y1": y1,
-                    "x2": x2, "y2": y2
-                })
-        first_registry_ocr_text = pd.DataFrame(all_data)
-        return first_registry_ocr_text # OCR 성공 시 결과 반환
-
-    print(f"OCR 실패: {response.status_code}, {response.text}")
-    return None # OCR 실패 시 None 반환
+    return recognize(image_data) # OCR 실패 시 None 반환
 
 
 #  4️⃣ OCR 실행 함수 (문서 유형별로 처리)
@@ -213,35 +137,8 @@ def building_ocr(image_path, doc_type):
     """
     네이버 Clova OCR을 사용하여 텍스트 및 바운딩 박스 좌표 추출
     """
-    request_json = {
-        'images': [{'format': 'jpg', 'name': doc_type}],
-        'requestId': str(uuid.uuid4()),
-        'version': 'V2',
-        'timestamp': int(round(time.time() * 1000))
-    }
-
     with open(image_path, "rb") as image_file:
         image_bytes = image_file.read()
 
-    payload = {'message': json.dumps(request_json).encode('UTF-8')}
-    files = [('file', ('image.jpg', image_bytes, 'image/jpeg'))]
-    headers = {'X-OCR-SECRET': OCR_SECRET_KEY}
-
-    response = requests.post(OCR_API_URL, headers=headers, data=payload, files=files)
-
-    if response.status_code == 200:
-        ocr_results = response.json()
-        all_data = []
-
-        for image_result in ocr_results.get('images', []):
-            for field in image_result.get('fields', []):
-                text = field['inferText']
-                bounding_box = field['boundingPoly']['vertices']
-                x1, y1 = int(bounding_box[0]['x']), int(bounding_box[0]['y'])
-                x2, y2 = int(bounding_box[2]['x']), int(bounding_box[2]['y'])
-                all_data.append({"Text": text, "x1": x1, "y1": y1, "x2": x2, "y2": y2})
-
-        return pd.DataFrame(all_data)
-
-    print(f" OCR 실패: {response.status_code}, {response.text}")
-    return pd.DataFrame()
\ No newline at end of file
+    df = recognize(image_bytes)
+    return df if df is not None else pd.DataFrame()
@@ -0,0 +1,98 @@
+# 이미지 해시 기반 OCR 결과 캐시 (로컬 디스크)
+# *_ocr.py(Clova OCR 호출) -> ocr_cache.py(캐시 조회/저장)
+#
+# 같은 이미지를 다시 분석할 때 Clova OCR을 다시 호출하지 않도록
+# 이미지 바이트의 해시 + OCR API 버전을 키로 단어 목록(Text, x1, y1, x2, y2)을 저장한다.
+# 문서를 하나만 고쳐 다시 제출하면 바뀐 페이지만 OCR 비용이 든다.
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import pandas as pd
+from django.conf import settings
+
+OCR_API_VERSION = "V2"
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", os.path.join(settings.BASE_DIR, "ocr_cache"))
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+
+COLUMNS = ["Text", "x1", "y1", "x2", "y2"]
+
+
+def ocr_cache_key(image_bytes, variant):
+    """
+    캐시 키 생성
+
+    Args:
+        image_bytes (bytes): 다운로드한 원본 이미지
+        variant (str): 문서 타입 구분 ("contract", "registry", "building")
+
+    Returns:
+        str: sha256 해시
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{OCR_API_VERSION}:{os.getenv('OCR_API_URL', '')}:{variant}:".encode("utf-8"))
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(OCR_CACHE_DIR, key[:2], f"{key}.json.gz")
+
+
+def load_ocr_result(key):
+    """캐시된 OCR 결과를 DataFrame으로 반환 (없으면 None)"""
+    path = _cache_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        return pd.DataFrame(data, columns=COLUMNS)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ OCR 캐시 읽기 실패 ({key}): {e}")
+        return None
+
+
+def save_ocr_result(key, df):
+    """OCR 결과를 컬럼별 리스트 형태(JSON + gzip)로 저장"""
+    path = _cache_path(key)
+    data = {column: df[column].tolist() for column in COLUMNS}
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 다른 워커가 읽는 중에도 깨진 파일이 보이지 않도록 임시 파일에 쓴 뒤 교체
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ OCR 캐시 저장 실패 ({key}): {e}")
+
+
+def cached_ocr(image_bytes, variant, run_ocr):
+    """
+    캐시에 있으면 저장된 OCR 결과를, 없으면 run_ocr 실행 결과를 반환하는 함수
+
+    Args:
+        image_bytes (bytes): 다운로드한 원본 이미지
+        variant (str): 문서 타입 구분 ("contract", "registry", "building")
+        run_ocr (callable): () -> DataFrame. 실제 Clova OCR 호출
+
+    Returns:
+        DataFrame: OCR 단어 목록. OCR 실패 시 run_ocr의 반환값 그대로
+    """
+    if not OCR_CACHE_ENABLED or image_bytes is None:
+        return run_ocr()
+
+    key = ocr_cache_key(image_bytes, variant)
+    df = load_ocr_result(key)
+    if df is not None:
+        print(f"✅ OCR 캐시 사용 ({variant}, {key[:12]})")
+        return df
+
+    df = run_ocr()
+    # 실패했거나 글자가 없는 결과는 일시적인 오류일 수 있으므로 저장하지 않음
+    if df is not None and not df.empty:
+        save_ocr_result(key, df)
+    return df
@@ -0,0 +1,312 @@
+# Clova OCR 공용 클라이언트 (업로드 준비 + 요청 + 응답 파싱 + 여러 페이지 묶음 요청)
+# contract_ocr.py, registry_ocr.py, building_ocr.py, ocr.py(페이지 OCR) -> ocr_client.py(Clova OCR 호출) -> http_client.py(ocr 세션)
+#
+# 다운로드한 원본 바이트가 Clova가 그대로 받을 수 있는 JPEG/PNG이면 디코딩/재인코딩 없이 업로드한다.
+# 다른 형식(WebP, BMP, GIF 등)이거나 업로드 크기 제한을 넘을 때만 PIL로 열어 JPEG로 변환한다.
+# 재인코딩을 하지 않으므로 페이지마다 디코딩 CPU와 픽셀 버퍼 메모리가 들지 않고 JPEG 재압축 손실도 없다.
+#
+# 응답의 fields는 단어 dict를 만들지 않고 바로 NumPy 배열(글자, (단어 수, 4) 좌표)로 변환한다.
+#
+# 묶음 요청: OCR_MAX_IMAGES_PER_REQUEST가 2 이상이면 여러 스레드에서 거의 동시에 들어온
+# recognize() 호출을 OCR_BATCH_WAIT_MS 동안 모아 한 요청(images 여러 장)으로 보낸다.
+# 문서 모듈은 페이지를 각자 동시에 처리하므로 호출 코드를 바꾸지 않아도 같은 문서의 페이지가 한 요청으로 묶인다.
+# General OCR 도메인은 요청당 이미지 1장만 받으므로 기본값은 1(묶지 않음)이다.
+#
+# 환경 변수
+#   OCR_MAX_IMAGES_PER_REQUEST: 요청당 최대 이미지 수 (기본 1)
+#   OCR_BATCH_WAIT_MS: 묶음 요청을 보내기 전 다른 페이지를 기다리는 시간 (기본 30ms)
+#   OCR_MAX_UPLOAD_BYTES: 이보다 큰 이미지는 JPEG로 다시 인코딩 (기본 20MB)
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from io import BytesIO
+import numpy as np
+import pandas as pd
+from PIL import Image
+from .http_client import get_session
+from .utils import run_concurrently
+
+OCR_SECRET_KEY = os.getenv("OCR_SECRET_KEY")
+OCR_API_URL = os.getenv("OCR_API_URL")
+OCR_MAX_IMAGES_PER_REQUEST = max(int(os.getenv("OCR_MAX_IMAGES_PER_REQUEST", "1")), 1)
+OCR_BATCH_WAIT = int(os.getenv("OCR_BATCH_WAIT_MS", "30")) / 1000
+# 이보다 큰 이미지는 JPEG로 다시 인코딩해서 업로드 (Clova 파일 크기 제한 대응)
+OCR_MAX_UPLOAD_BYTES = int(os.getenv("OCR_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_JPEG_QUALITY = 95  # 변환이 필요할 때의 JPEG 품질
+
+COLUMNS = ["Text", "x1", "y1", "x2", "y2"]
+
+# 형식 -> (파일 시그니처, Content-Type)
+UPLOAD_FORMATS = {
+    "jpg": (b"\xff\xd8\xff", "image/jpeg"),
+    "png": (b"\x89PNG\r\n\x1a\n", "image/png"),
+}
+
+class OcrRequestError(ValueError):
+    """Clova OCR 요청이 200이 아닌 응답으로 실패했을 때의 예외 (status_code에 응답 코드)"""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"❌ OCR 요청 실패: {status_code} - {text}")
+        self.status_code = status_code
+
+
+def detect_format(data):
+    """
+    이미지 바이트의 형식 확인
+
+    Returns:
+        str: "jpg" 또는 "png". 그대로 업로드할 수 없는 형식이면 None
+    """
+    for image_format, (signature, _) in UPLOAD_FORMATS.items():
+        if data.startswith(signature):
+            return image_format
+    return None
+
+
+def prepare_upload(image_bytes):
+    """
+    업로드할 바이트와 형식 (그대로 보낼 수 있으면 원본 바이트 객체를 그대로 반환)
+
+    Args:
+        image_bytes (bytes): 다운로드한 원본 이미지
+
+    Returns:
+        tuple: (업로드 바이트, "jpg" 또는 "png")
+    """
+    image_format = detect_format(image_bytes)
+    if image_format and len(image_bytes) <= OCR_MAX_UPLOAD_BYTES:
+        return image_bytes, image_format
+
+    # 변환이 필요한 경우에만 디코딩
+    with Image.open(BytesIO(image_bytes)) as image:
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", quality=UPLOAD_JPEG_QUALITY)
+    reason = "크기 제한 초과" if image_format else "지원하지 않는 형식"
+    print(f"⚠️ OCR 업로드용 JPEG 변환 ({reason}, {len(image_bytes)} → {buffer.tell()} bytes)")
+    return buffer.getvalue(), "jpg"
+
+
+
+
+def parse_fields(fields):
+    """
+    Clova 응답 이미지 한 장의 fields를 NumPy 배열로 변환
+
+    Args:
+        fields (list): images[i]["fields"]
+
+    Returns:
+        tuple: (글자 배열, (단어 수, 4) 정수 좌표 배열 [x1, y1, x2, y2]). 꼭짓점 0번이 좌상단, 2번이 우하단
+    """
+    texts = np.array([field["inferText"] for field in fields], dtype=object)
+    coords = np.fromiter(
+        (
+            vertex[axis]
+            for field in fields
+            for vertex in field["boundingPoly"]["vertices"][0:3:2]
+            for axis in ("x", "y")
+        ),
+        dtype=float, count=len(fields) * 4,
+    )
+    # int()와 같이 소수점 아래를 버림
+    return texts, coords.reshape(-1, 4).astype(np.int64)
+
+
+def to_frame(texts, boxes):
+    """글자 배열과 좌표 배열을 단어 목록 DataFrame(Text, x1, y1, x2, y2)으로 변환"""
+    return pd.DataFrame({
+        "Text": texts,
+        "x1": boxes[:, 0], "y1": boxes[:, 1],
+        "x2": boxes[:, 2], "y2": boxes[:, 3],
+    }, columns=COLUMNS)
+
+
+def parse_images(ocr_results, names):
+    """
+    Clova 응답을 요청한 이미지 순서대로 단어 목록 DataFrame으로 변환
+
+    Args:
+        ocr_results (dict): Clova 응답 JSON
+        names (list): 요청 메시지에 넣은 이미지 이름 (순서대로)
+
+    Returns:
+        list: 이미지별 DataFrame. 응답에 해당 이미지가 없으면 None
+    """
+    images = ocr_results.get("images", [])
+    if all("name" in image for image in images):
+        by_name = {image["name"]: image for image in images}
+        images = [by_name.get(name) for name in names]
+    else:
+        # 이름이 없는 응답은 순서로 대응
+        images = (images + [None] * len(names))[:len(names)]
+    return [None if image is None else to_frame(*parse_fields(image.get("fields", []))) for image in images]
+
+
+def _post(uploads, secret_key=None, api_url=None):
+    """
+    업로드 준비가 끝난 이미지들을 한 요청으로 보내고 이미지별 결과를 반환
+
+    Args:
+        uploads (list): prepare_upload() 결과 (바이트, 형식) 리스트
+
+    Returns:
+        list: 이미지별 DataFrame
+
+    Raises:
+        OcrRequestError: 응답 코드가 200이 아닐 때
+    """
+    names = [f"page{i}" for i in range(len(uploads))]
+    request_json = {
+        'images': [{'format': image_format, 'name': name} for name, (_, image_format) in zip(names, uploads)],
+        'requestId': str(uuid.uuid4()),
+        'version': 'V2',
+        'timestamp': int(round(time.time() * 1000))
+    }
+    payload = {'message': json.dumps(request_json).encode('UTF-8')}
+    files = [
+        ('file', (f'{name}.{image_format}', data, UPLOAD_FORMATS[image_format][1]))
+        for name, (data, image_format) in zip(names, uploads)
+    ]
+    headers = {'X-OCR-SECRET': secret_key or OCR_SECRET_KEY}
+
+    response = get_session("ocr").post(api_url or OCR_API_URL, headers=headers, data=payload, files=files)
+    if response.status_code != 200:
+        print(f"❌ OCR 요청 실패 ({len(uploads)}장): {response.status_code} - {response.text[:500]}")
+        raise OcrRequestError(response.status_code, response.text[:500])
+    return parse_images(response.json(), names)
+
+
+class _Batch:
+    def __init__(self):
+        self.uploads = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class OcrBatcher:
+    """
+    여러 스레드의 단일 이미지 요청을 모아 묶음 요청으로 보내는 객체
+
+    먼저 들어온 호출이 대표로 wait초(또는 max_images장이 찰 때)까지 기다린 뒤 요청을 보내고,
+    같은 묶음의 다른 호출은 대표의 응답에서 자기 결과를 받는다.
+
+    Args:
+        max_images (int): 요청당 최대 이미지 수
+        wait (float): 대표 호출이 다른 페이지를 기다리는 시간(초)
+    """
+
+    def __init__(self, max_images, wait):
+        self.max_images = max_images
+        self.wait = wait
+        self._open = {}  # (secret_key, api_url) -> 아직 이미지를 받는 묶음
+        self._lock = threading.Lock()
+
+    def submit(self, upload, secret_key=None, api_url=None):
+        """
+        이미지 한 장을 묶음에 넣고 결과를 기다림
+
+        Returns:
+            DataFrame: 단어 목록
+
+        Raises:
+            OcrRequestError: 묶음 요청이 실패했을 때 (같은 묶음의 모든 호출에 전달)
+        """
+        key = (secret_key, api_url)
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch()
+            index = len(batch.uploads)
+            batch.uploads.append(upload)
+            if len(batch.uploads) >= self.max_images:
+                del self._open[key]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.wait)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+            try:
+                batch.results = _post(batch.uploads, secret_key, api_url)
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+
+_batcher = OcrBatcher(OCR_MAX_IMAGES_PER_REQUEST, OCR_BATCH_WAIT)
+
+
+def recognize(image_bytes, secret_key=None, api_url=None, raise_on_error=False):
+    """
+    이미지 한 장을 Clova OCR로 인식 (묶음 요청이 켜져 있으면 동시에 들어온 다른 페이지와 함께 요청)
+
+    Args:
+        image_bytes (bytes): 다운로드한 원본 이미지 (JPEG/PNG면 그대로 업로드)
+        secret_key (str): OCR 시크릿 키 (없으면 OCR_SECRET_KEY)
+        api_url (str): OCR API 주소 (없으면 OCR_API_URL)
+        raise_on_error (bool): True이면 요청 실패 시 None 대신 OcrRequestError 발생
+
+    Returns:
+        DataFrame: 단어 목록 (Text, x1, y1, x2, y2). 요청 실패 시 None
+    """
+    upload = prepare_upload(image_bytes)
+    try:
+        if _batcher.max_images <= 1:
+            return _post([upload], secret_key, api_url)[0]
+        return _batcher.submit(upload, secret_key, api_url)
+    except OcrRequestError:
+        if raise_on_error:
+            raise
+        return None
+
+
+def recognize_many(images, secret_key=None, api_url=None):
+    """
+    여러 이미지를 OCR_MAX_IMAGES_PER_REQUEST장씩 나눠 인식 (나눈 요청은 동시에 보냄)
+
+    Args:
+        images (list): 이미지 바이트 리스트
+
+    Returns:
+        list: 입력 순서대로 DataFrame. 요청 실패한 이미지는 None
+    """
+    uploads = [prepare_upload(image_bytes) for image_bytes in images]
+    size = OCR_MAX_IMAGES_PER_REQUEST
+    chunks = [uploads[i:i + size] for i in range(0, len(uploads), size)]
+    outcomes = run_concurrently(lambda chunk: _post(chunk, secret_key, api_url), chunks, len(chunks))
+
+    results = []
+    for chunk, (frames, error) in zip(chunks, outcomes):
+        if isinstance(error, OcrRequestError):
+            frames = [None] * len(chunk)
+        elif error is not None:
+            raise error
+        results.extend(frames)
+    return results
+
+
+async def arecognize(image_bytes, secret_key=None, api_url=None, raise_on_error=False):
+    """recognize()의 비동기 버전 (요청은 작업 스레드에서 실행, 현재 스팬 유지)"""
+    return await asyncio.to_thread(recognize, image_bytes, secret_key, api_url, raise_on_error)
+
+
+async def arecognize_many(images, secret_key=None, api_url=None):
+    """recognize_many()의 비동기 버전"""
+    return await asyncio.to_thread(recognize_many, images, secret_key, api_url)
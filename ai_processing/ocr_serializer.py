@@ -0,0 +1,85 @@
+# OCR 단어 목록 / 템플릿 좌표를 GPT 프롬프트용 텍스트로 변환
+# *_ocr.py(GPT 프롬프트 작성) -> ocr_serializer.py(직렬화, 공간 필터)
+#
+# to_json(orient="records")는 단어마다 "Text","x1","y1","x2","y2" 키 이름이 반복되어
+# 입력 토큰 대부분을 차지한다. 첫 줄에 컬럼 이름을 한 번만 쓰고 한 줄에 단어 하나씩
+# "텍스트|x1|y1|x2|y2" 형태로 보내면 좌표 정보는 그대로 두면서 토큰 수를 크게 줄일 수 있다.
+# 양식 템플릿은 template_registry.py에서 같은 형식으로 미리 직렬화해 둔 텍스트(prompt_text)를 사용한다.
+
+import os
+import numpy as np
+
+COLUMNS = ["Text", "x1", "y1", "x2", "y2"]
+SEPARATOR = "|"
+
+# 템플릿 박스에서 이 거리(px) 이상 떨어진 단어는 프롬프트에서 제외 (설정하지 않으면 필터 사용 안 함)
+_margin = os.getenv("OCR_SPATIAL_FILTER_MARGIN")
+SPATIAL_FILTER_MARGIN = float(_margin) if _margin else None
+
+
+def serialize_words(df):
+    """
+    OCR 단어 목록 DataFrame을 한 줄에 하나씩 "Text|x1|y1|x2|y2" 형태로 변환
+
+    Args:
+        df (DataFrame): Text, x1, y1, x2, y2 컬럼을 가진 데이터
+
+    Returns:
+        str: 첫 줄은 컬럼 이름, 이후 줄은 단어별 값
+    """
+    header = SEPARATOR.join(COLUMNS)
+    if df is None or df.empty:
+        return header
+
+    # 구분자, 줄바꿈이 텍스트에 있으면 형식이 깨지므로 치환
+    text = df["Text"].astype(str).str.replace(SEPARATOR, "/", regex=False).str.replace("\n", " ", regex=False)
+    lines = text
+    for column in COLUMNS[1:]:
+        lines = lines + SEPARATOR + df[column].round().astype(int).astype(str)
+    return header + "\n" + "\n".join(lines.tolist())
+
+
+def spatial_filter(df, template, margin=None):
+    """
+    템플릿의 어느 박스와도 가깝지 않은 OCR 단어를 제거
+
+    Args:
+        df (DataFrame): OCR 단어 목록
+        template (FormTemplate): 양식 템플릿 (base_xy 결과)
+        margin (float): 박스를 확장할 거리(px). None이면 SPATIAL_FILTER_MARGIN 사용, 둘 다 없으면 필터링하지 않음
+
+    Returns:
+        DataFrame: 필터링된 단어 목록
+    """
+    margin = SPATIAL_FILTER_MARGIN if margin is None else margin
+    if margin is None or df is None or df.empty or template is None or len(template) == 0:
+        return df
+
+    words = df[COLUMNS[1:]].to_numpy(dtype=float)
+    boxes = template.boxes
+
+    # (단어 수, 박스 수) 크기로 확장된 박스와 겹치는지 한 번에 계산
+    overlaps = (
+        (words[:, None, 0] <= boxes[None, :, 2] + margin) &
+        (words[:, None, 2] >= boxes[None, :, 0] - margin) &
+        (words[:, None, 1] <= boxes[None, :, 3] + margin) &
+        (words[:, None, 3] >= boxes[None, :, 1] - margin)
+    )
+    keep = np.any(overlaps, axis=1)
+    if not keep.all():
+        print(f"📊 공간 필터: OCR 단어 {len(df)}개 중 {int(keep.sum())}개 사용 (margin={margin})")
+    return df[keep].reset_index(drop=True)
+
+
+def serialize_for_prompt(df, template=None):
+    """
+    OCR 단어 목록과 템플릿을 프롬프트용 텍스트로 변환 (템플릿이 있으면 공간 필터 적용)
+
+    Returns:
+        tuple: (단어 목록 텍스트, 템플릿 텍스트). 템플릿이 없으면 템플릿 텍스트는 None
+    """
+    if template is not None:
+        df = spatial_filter(df, template)
+    words_text = serialize_words(df)
+    template_text = template.prompt_text if template is not None else None
+    return words_text, template_text
@@ -0,0 +1,262 @@
+# 통합 분석 파이프라인 (문서 URL 조회 → OCR → AI 분석)
+# views.py(api 엔드포인트) / jobs.py(백그라운드 작업) -> pipeline.py(분석 실행)
+
+import os
+import traceback
+from .registry_ocr import registry_keyword_ocr
+from .contract_ocr import contract_keyword_ocr
+from .building_ocr import building_keyword_ocr
+from firebase_api.utils import (
+    build_ocr_page_records,
+    get_classified_document_urls,
+    get_ocr_results,
+    save_analysis_result,
+    save_ocr_results_batch,
+    update_analysis_status
+)
+from .utils import run_concurrently
+from .tracing import span, trace
+from .cache import create_cache
+from .image_store import ImageStore
+from .ai_analysis2 import (analyze_contract_data, remove_bounding_boxes, restore_bounding_boxes, adjust_owner_count, building, price, generate_and_save_summary)
+
+# 문서 타입별 OCR 함수
+OCR_FUNCTIONS = {
+    "registry_document": registry_keyword_ocr,
+    "contract": contract_keyword_ocr,
+    "building_registry": building_keyword_ocr,
+}
+# 문서 타입별 OCR 동시 실행 수 (1이면 순차 실행)
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "3"))
+# 계약별 문서 URL 캐시 유지 시간(초). 분석 1회 안에서 같은 계약을 다시 조회할 때 Firestore를 거치지 않음
+DOCUMENT_URL_CACHE_TTL = float(os.getenv("DOCUMENT_URL_CACHE_TTL", "30"))
+
+document_url_cache = create_cache("document_urls", max_size=256, ttl=DOCUMENT_URL_CACHE_TTL)
+
+
+class AnalysisProgress:
+    """분석 진행 상황 보고 인터페이스 (기본 구현은 아무것도 하지 않음)"""
+
+    job_id = None  # 작업 큐에서 실행할 때의 작업 ID (trace ID로 사용)
+
+    def stage(self, name):
+        """분석 단계 시작을 알림"""
+        pass
+
+    def event(self, name, data=None):
+        """
+        단계 안의 세부 결과를 알림 (문서별 OCR 완료, 페이지별 추출 완료, 주소 확인, 공시가격, solution 완료)
+
+        Args:
+            name (str): 이벤트 이름
+            data (dict): 중간 결과 (JSON으로 변환 가능한 값)
+        """
+        pass
+
+
+def run_ai_analysis(user_id, contract_id, progress=None):
+    """
+    통합 분석 프로세스 실행
+    1. 문서 URL 가져오기
+    2. OCR 실행
+    3. AI 분석 실행
+
+    Args:
+        user_id (str): 사용자 ID
+        contract_id (str): 계약 ID
+        progress (AnalysisProgress): 단계별 진행 상황을 받을 객체 (선택)
+
+    Returns:
+        tuple: (HTTP 상태 코드, 응답 데이터)
+    """
+    progress = progress or AnalysisProgress()
+
+    # 분석 1회를 trace 하나로 기록 (종료 시 단계별 소요 시간/바이트/토큰 로그 + 지표)
+    with trace("analysis", trace_id=progress.job_id, user_id=user_id, contract_id=contract_id) as root:
+        http_status, body = _run_ai_analysis(user_id, contract_id, progress)
+        root.set(http_status=http_status)
+    return http_status, body
+
+
+def _run_ai_analysis(user_id, contract_id, progress):
+    try:
+        # 상태 업데이트: 분석 시작
+        update_analysis_status(user_id, contract_id, "processing")
+
+        # 1. 최신 문서 URL 가져오기
+        progress.stage("fetch_documents")
+        print("Fetching document URLs...")
+        with span("fetch_documents"):
+            document_urls = get_classified_document_urls(user_id, contract_id, cache=document_url_cache)
+        if document_urls is None:
+            print("Contract document not found")
+            update_analysis_status(user_id, contract_id, "failed")
+            return 404, {"error": "문서 URL을 찾을 수 없습니다"}
+        print(f"Found document URLs: {document_urls}")
+
+        # URL이 하나도 없는지 확인
+        if not any(urls for urls in document_urls.values()):
+            print("No document URLs found for any type")
+            update_analysis_status(user_id, contract_id, "failed")
+            return 404, {"error": "문서를 찾을 수 없습니다"}
+
+        # 2. 각 문서 타입별 OCR 실행
+        progress.stage("ocr")
+        # 페이지 이미지는 분석 1회에 한 번만 다운로드해 OCR, 크기 조회에서 공유
+        image_store = ImageStore()
+        ocr_results = {}
+        document_types = ["registry_document", "contract", "building_registry"]
+
+        target_types = []
+        for doc_type in document_types:
+            if doc_type not in document_urls or not document_urls[doc_type]:
+                print(f"Warning: {doc_type} URL not found")
+                continue
+            target_types.append(doc_type)
+
+        def run_document_ocr(doc_type):
+            with span(f"ocr.{doc_type}", pages=len(document_urls[doc_type])):
+                result = OCR_FUNCTIONS[doc_type](document_urls[doc_type], doc_type, user_id, contract_id, image_store, progress)
+            progress.event("ocr_done", {"document_type": doc_type, "result": result})
+            return result
+
+        # 문서 타입별 OCR 동시 실행 후 결과 취합
+        ocr_outcomes = run_concurrently(run_document_ocr, target_types, OCR_MAX_WORKERS)
+
+        progress.stage("save_ocr")
+        page_records = {}
+        for doc_type, (result, ocr_error) in zip(target_types, ocr_outcomes):
+            if ocr_error is not None:
+                print(f"OCR 처리 중 오류 발생 - {doc_type}: {str(ocr_error)}")
+                traceback.print_exception(type(ocr_error), ocr_error, ocr_error.__traceback__)
+                continue
+
+            print(f"OCR Result for {doc_type}: {result}")
+
+            if not result:
+                update_analysis_status(user_id, contract_id, "failed")
+                return 500, {"error": f"{doc_type} OCR 처리 실패"}
+
+            # 페이지별 저장 데이터 (아래에서 통합 결과와 함께 한 번에 저장)
+            page_records[doc_type] = build_ocr_page_records(user_id, doc_type, result, document_urls[doc_type])
+            ocr_results[doc_type] = result
+
+        # OCR 결과 저장 (페이지별 결과 + 통합 결과를 배치 한 번으로)
+        if ocr_results:
+            combined_result = {
+                "document_type": "combined",
+                "userId": user_id,
+                "results": ocr_results,
+                "analysisStatus": "completed"
+            }
+
+            with span("firestore.save_ocr"):
+                saved = save_ocr_results_batch(user_id, contract_id, page_records, combined_result)
+            if not saved:
+                update_analysis_status(user_id, contract_id, "failed")
+                return 500, {"error": "OCR 결과 저장 실패"}
+
+        # 3. AI 분석 실행
+        progress.stage("ai_analysis")
+        try:
+            # OCR 결과 가져오기 (이번에 OCR한 문서는 메모리 결과 사용, 없는 문서만 Firestore 조회)
+            with span("firestore.read_ocr"):
+                analysis_inputs = get_ocr_results(user_id, contract_id, document_types, known_results=ocr_results)
+
+            if not all(analysis_inputs.get(doc_type) for doc_type in document_types):
+                update_analysis_status(user_id, contract_id, "failed")
+                return 404, {
+                    'success': False,
+                    'message': 'OCR 결과를 찾을 수 없습니다.'
+                }
+
+
+            merged_data = {
+                "contract": analysis_inputs["contract"],
+                "building_registry": analysis_inputs["building_registry"],
+                "registry_document": analysis_inputs["registry_document"]
+            }
+            # 소유자 수 조정
+            merged_data = adjust_owner_count(
+            merged_data["building_registry"],
+            merged_data["registry_document"],
+            merged_data
+            )
+
+            # Bounding Box 제거 및 저장
+            bounding_boxes = remove_bounding_boxes(merged_data)
+
+            # 주소 일치 여부 확인 (새 building 함수로 변경)
+            with span("geocoding"):
+                try:
+                    res_1, used_keys = building(merged_data)
+                except ValueError:  # 기존 함수가 값만 반환하는 경우를 대비
+                    res_1 = building(merged_data)
+                    used_keys = []
+            progress.event("geocoding_done", {"address_match": res_1 != "nan", "address": res_1})
+
+            # 공시가격 조회
+            if res_1 != "nan":
+                try:
+                    with span("price_lookup"):
+                        res = price(res_1)
+                    cost = int(res['공시가격'])
+                except (ValueError, TypeError, KeyError):
+                    cost = 'nan'
+                    print("공시가격 조회 실패")
+            else:
+                cost = 'nan'
+                print("주소 불일치로 공시가격 조회 불가")
+            progress.event("price_done", {"공시가격": cost})
+
+            # AI 분석 실행
+            analysis_result = analyze_contract_data(merged_data, res_1, cost, progress=progress)
+
+            # 디버깅: 분석 결과 출력
+            print("📌 AI 분석 결과:", analysis_result)
+
+            # Bounding Box 복원
+            analysis_result = restore_bounding_boxes(analysis_result, bounding_boxes)
+
+            # AI 분석 결과 저장
+            with span("firestore.save_analysis"):
+                save_analysis_result(user_id, contract_id, analysis_result, image_urls=document_urls, image_store=image_store)
+
+            # 여기에 요약 생성 및 저장 로직 추가
+            progress.stage("summary")
+            try:
+                # 분석 결과 요약 생성 및 저장
+                with span("summary"):
+                    summary_result = generate_and_save_summary(analysis_result, user_id, contract_id)
+                print(f"✅ 계약 요약 생성 및 저장 완료: {user_id}/{contract_id}")
+            except Exception as summary_error:
+                print(f"⚠️ 요약 생성 중 오류 발생 (분석은 계속 진행됨): {str(summary_error)}")
+                traceback.print_exc()
+
+
+            # 분석 완료 상태 업데이트
+            update_analysis_status(user_id, contract_id, "completed")
+
+            return 200, {
+                'success': True,
+                'message': '문서 분석이 완료되었습니다.',
+                'data': analysis_result
+            }
+
+        except Exception as e:
+            print(f"AI 분석 중 오류 발생: {str(e)}")
+            update_analysis_status(user_id, contract_id, "failed")
+            return 500, {
+                'success': False,
+                'message': f'AI 분석 중 오류가 발생했습니다: {str(e)}'
+            }
+
+    except Exception as e:
+        print(f"전체 분석 과정 중 오류 발생: {str(e)}")
+        traceback.print_exc()
+        update_analysis_status(user_id, contract_id, "failed")
+
+        return 500, {
+            'success': False,
+            'message': f'분석 처리 중 오류가 발생했습니다: {str(e)}'
+        }
@@ -0,0 +1,194 @@
+# 공시가격 로컬 저장소 (SQLite)
+# import_public_prices 명령(최초 1회) -> price_store.py(저장/조회) -> ai_analysis2.price(공시가격 조회)
+#
+# 시도별 공시가격 CSV를 분석할 때마다 내려받지 않도록 미리 SQLite 파일로 변환해 두고
+# (시도, 시군구, 동리, 동명, 호명) 인덱스로 조회한다.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from django.conf import settings
+from .http_client import get_session
+
+PRICE_DB_PATH = os.getenv("PUBLIC_PRICE_DB", os.path.join(settings.BASE_DIR, "public_prices.sqlite3"))
+IMPORT_CHUNK_SIZE = 100000
+
+# 시도별 공시가격 CSV 경로 (GCS)
+PUBLIC_PRICE_CSV_URLS = {
+    "서울특별시": "https://storage.googleapis.com/jipsin/storage/seoul.csv",
+    "부산광역시": "https://storage.googleapis.com/jipsin/storage/busan.csv",
+    "대구광역시": "https://storage.googleapis.com/jipsin/storage/daegu.csv",
+    "인천광역시": "https://storage.googleapis.com/jipsin/storage/incheon.csv",
+    "광주광역시": "https://storage.googleapis.com/jipsin/storage/gwangju.csv",
+    "대전광역시": "https://storage.googleapis.com/jipsin/storage/daejeon.csv",
+    "울산광역시": "https://storage.googleapis.com/jipsin/storage/ulsan.csv",
+    "세종특별자치시": "https://storage.googleapis.com/jipsin/storage/sejong.csv",
+    "경기도": "https://storage.googleapis.com/jipsin/storage/gyeonggi.csv",
+    "강원특별자치도": "https://storage.googleapis.com/jipsin/storage/gangwon.csv",
+    "충청북도": "https://storage.googleapis.com/jipsin/storage/chungbuk.csv",
+    "충청남도": "https://storage.googleapis.com/jipsin/storage/chungnam.csv",
+    "전라북도": "https://storage.googleapis.com/jipsin/storage/jeunbuk.csv",
+    "전라남도": "https://storage.googleapis.com/jipsin/storage/jeunnam.csv",
+    "경상북도": "https://storage.googleapis.com/jipsin/storage/gyeongbuk.csv",
+    "경상남도": "https://storage.googleapis.com/jipsin/storage/gyeongnam.csv",
+    "제주특별자치도": "https://storage.googleapis.com/jipsin/storage/jeju.csv",
+}
+
+KEY_COLUMNS = ["시도", "시군구", "동리", "동명", "호명"]
+
+# (시도, 시군구, 동리) 조회는 아래 복합 인덱스의 앞부분을 그대로 사용한다.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS public_prices (
+    시도 TEXT,
+    시군구 TEXT,
+    동리 TEXT,
+    동명 TEXT,
+    호명 TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_public_prices_key ON public_prices (시도, 시군구, 동리, 동명, 호명);
+CREATE TABLE IF NOT EXISTS public_price_sources (
+    시도 TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    imported_at REAL NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def normalize_key(value):
+    """
+    CSV 값을 조회 키 문자열로 변환 (101, 101.0, "101" 모두 "101")
+
+    Returns:
+        str: 정규화된 키. 빈 값이면 None
+    """
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return None
+        if value.is_integer():
+            return str(int(value))
+    text = str(value).strip()
+    if text.endswith(".0") and text[:-2].isdigit():
+        text = text[:-2]
+    return text or None
+
+
+def _connect():
+    conn = sqlite3.connect(PRICE_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _reader():
+    """조회용 연결 (스레드마다 하나를 만들어 재사용)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _connect()
+        _local.conn = conn
+    return conn
+
+
+def import_csv(source, encoding="utf-8"):
+    """
+    공시가격 CSV를 저장소로 가져오는 함수
+
+    CSV에 포함된 시도의 기존 데이터는 모두 지우고 새로 저장한다.
+
+    Args:
+        source (str): CSV 경로 또는 URL
+        encoding (str): CSV 인코딩
+
+    Returns:
+        dict: 시도별 저장된 행 수
+    """
+    import pandas as pd
+
+    response = None
+    if source.startswith(("http://", "https://")):
+        # 큰 CSV도 메모리에 한 번에 올리지 않도록 스트리밍으로 읽음
+        response = get_session("storage").get(source, stream=True)
+        response.raise_for_status()
+        response.raw.decode_content = True
+
+    conn = _connect()
+    counts = {}
+    try:
+        with conn:
+            csv_source = response.raw if response is not None else source
+            for chunk in pd.read_csv(csv_source, encoding=encoding, chunksize=IMPORT_CHUNK_SIZE):
+                missing = [column for column in KEY_COLUMNS if column not in chunk.columns]
+                if missing:
+                    raise ValueError(f"CSV에 필요한 컬럼이 없습니다: {missing}")
+
+                rows = []
+                for record in chunk.to_dict(orient="records"):
+                    keys = [normalize_key(record[column]) for column in KEY_COLUMNS]
+                    sido = keys[0]
+                    if sido not in counts:
+                        conn.execute("DELETE FROM public_prices WHERE 시도 = ?", (sido,))
+                        counts[sido] = 0
+                    counts[sido] += 1
+                    rows.append((*keys, json.dumps(record, ensure_ascii=False, default=str)))
+
+                conn.executemany(
+                    "INSERT INTO public_prices (시도, 시군구, 동리, 동명, 호명, record) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+
+            for sido, row_count in counts.items():
+                conn.execute(
+                    "INSERT OR REPLACE INTO public_price_sources (시도, source, row_count, imported_at) VALUES (?, ?, ?, ?)",
+                    (sido, source, row_count, time.time())
+                )
+    finally:
+        conn.close()
+        if response is not None:
+            response.close()
+
+    return counts
+
+
+def lookup(parsed_address):
+    """
+    파싱된 주소로 공시가격 후보 행을 조회하는 함수
+    1. (시도, 시군구, 동리, 동명, 호명) 일치
+    2. 없으면 (시도, 시군구, 동리) 일치
+
+    Args:
+        parsed_address (dict): parse_address 결과
+
+    Returns:
+        list: 후보 행 리스트. 해당 시도를 아직 가져오지 않았으면 None
+    """
+    keys = [normalize_key(parsed_address.get(column)) for column in KEY_COLUMNS]
+
+    try:
+        conn = _reader()
+        imported = conn.execute(
+            "SELECT 1 FROM public_price_sources WHERE 시도 = ?", (keys[0],)
+        ).fetchone()
+        if not imported:
+            return None
+
+        rows = conn.execute(
+            "SELECT record FROM public_prices WHERE 시도 = ? AND 시군구 = ? AND 동리 = ? AND 동명 = ? AND 호명 = ?",
+            keys
+        ).fetchall()
+        if not rows:
+            rows = conn.execute(
+                "SELECT record FROM public_prices WHERE 시도 = ? AND 시군구 = ? AND 동리 = ?",
+                keys[:3]
+            ).fetchall()
+    except sqlite3.Error as e:
+        print(f"⚠️ 공시가격 저장소 조회 실패: {e}")
+        return None
+
+    return [json.loads(row["record"]) for row in rows]
@@ -1,19 +1,18 @@
-import time
+import bisect
 import pandas as pd
-import cv2
 import json
-from PIL import Image
-import requests
-import uuid
-import time
 import openai
 import re
-import base64
-import numpy as np
 import os
-from io import BytesIO
+from functools import lru_cache
 from dotenv import load_dotenv
-from firebase_api.utils import save_ocr_result_to_firestore
+from .image_store import ImageStore
+from .ocr_cache import cached_ocr
+from .ocr_client import recognize
+from .gpt import chat_completion, is_json
+from .ocr_serializer import serialize_for_prompt
+from .template_registry import FormTemplate, get_template
+from .utils import run_concurrently
 
 load_dotenv()
 
@@ -22,82 +21,90 @@ secret_key = os.getenv("OCR_SECRET_KEY")
 api_url = os.getenv("OCR_API_URL")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL = "gpt-4o" # 일단 클로드가 버전 바꾸라해서 바꾸는데 나중에 문제생기면 4-o로
+# base_xy 좌표가 기준으로 하는 양식 한 페이지 크기 (이 크기의 페이지를 세로로 이어 붙인 좌표)
+TEMPLATE_PAGE_SIZE = get_template("registry").page_size
+# true이면 예전처럼 전체 페이지를 이어 붙인 하나의 프롬프트로 요청 (기본은 페이지별 요청)
+REGISTRY_MERGED_PROMPT = os.getenv("REGISTRY_MERGED_PROMPT", "false").lower() == "true"
+# 페이지별 OCR + GPT 분석 동시 실행 수 (1이면 순차 실행)
+PAGE_MAX_WORKERS = int(os.getenv("OCR_PAGE_MAX_WORKERS", "3"))
 
 client = openai.OpenAI(api_key=OPENAI_API_KEY)
 #계약서원본양식
 def base_xy():
-    rows = [
-        ['등기사항전부증명서',348,112,934,162],
-        ['집합건물',520,166,766,216],
-        ['[집합건물] 건물주소',26,298,908,346],
-        ['[표제부](1동의 건물의 표시)',94,354,632,392],
-        ['표시번호',34,406,130,444],
-        ['접수',172,414,268,440],
-        ['소재지번, 건물 명칭 및 번호', 318,410,590,440],
-        ['([도로명주소])',312,456,580,642],
-        ['건물내역',668,410,808,446],
-        ['등기 원인 및 기타사항',904,404,1140,448],
-        ['열람일시',22,1620,456,1656],
-        ['(대지권이 목적인 토지의 표시)',408,2456,788,2496],
-        ['[표제부] (전유부분의 건물의 표시)',80,2672,684,2720],
-        ['표시번호',40,2740,130,2776],
-        ['접수',166,2732,280,2776],
-        ['건물번호',322,2732,480,2780],
-        ['(건물번호)',316,2784,490,2842],
-        ['건물내역',522,2742,694,2770],
-        ['(건물내역)',506,2790,706,2850],
-        ['등기원인 및 기타사항',806,2736,1064,2772],
-        ['[갑 구] (소유권에 관한 사항)',86,3842,654,3898],
-        ['순위번호',46,3908,134,3948], 
-        ['등기목적',170,3910,314,3944],
-        ['접수', 390,3904,490,3946],
-        ['등기원인',524,3906,668,3952],
-        ['관리자 및 기타사항', 824,3902,1030,3946], # 갑구는 있어야돼! ['(갑구)',38,3902,1156,4526],
-        ['소유자', 824,3902,1030,4462],
-        ['[을 구] (소유권 이외의 권리에 대한 사항)', 88,4562,796,4608],
-        ['순위번호',46,4628,134,4658],
-        ['등기목적',170,4628,314,4658],
-        ['접수', 390,4628,490,4658],
-        ['등기원인',524,4628,668,4658],
-        ['관리자 및 기타사항',824,4628,1030,4658],
-        ['(채권최고액)',718,4662,1156,4752],
-        ['이하여백',410,4952,689,4990]
-    ]
-    xy = pd.DataFrame(columns=['Text', 'x1', 'y1', 'x2', 'y2'])
-    xy = pd.concat([xy, pd.DataFrame(rows, columns=xy.columns)], ignore_index=True)
-    return xy
-
-def merge_images(image_urls):
-    """Firebase URL로부터 이미지를 다운로드하고 병합"""
-    target_size = (1240, 1755)  # 원하는 이미지 크기
-
-    # 이미지 불러와 크기 조정
-    images = []
-    for url in image_urls:
-        # URL에서 이미지 다운로드
-        response = requests.get(url)
-        if response.status_code == 200:
-            # 바이트 데이터를 이미지로 변환
-            image = Image.open(BytesIO(response.content))
-            # PIL Image를 OpenCV 형식으로 변환
-            opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-            # 크기 조정
-            resized_image = cv2.resize(opencv_image, target_size, interpolation=cv2.INTER_AREA)
-            # 다시 PIL Image로 변환
-            images.append(Image.fromarray(cv2.cvtColor(resized_image, cv2.COLOR_BGR2RGB)))
-    
-    # 이미지 병합
-    total_height = sum(img.height for img in images)
-    max_width = max(img.width for img in images)
-    merged_image = Image.new("RGB", (max_width, total_height))
-
-    # 이미지 붙이기
-    y_offset = 0
-    for img in images:
-        merged_image.paste(img, (0, y_offset))
-        y_offset += img.height
-    
-    return merged_image
+    """등기부등본 양식 템플릿 (template_data/registry.json, 페이지를 세로로 이어 붙인 좌표)"""
+    return get_template("registry")
+
+def page_index_of(y, page_starts):
+    """
+    y 좌표가 속한 페이지 인덱스 (0부터)
+
+    Args:
+        y (float): 이어 붙인 좌표계의 y 좌표
+        page_starts (list): 각 페이지 시작 y 좌표 (오름차순)
+
+    Returns:
+        int: 페이지 인덱스. 첫 페이지보다 위면 0
+    """
+    return max(bisect.bisect_right(page_starts, y) - 1, 0)
+
+@lru_cache(maxsize=1)
+def page_templates():
+    """
+    base_xy를 페이지별 템플릿으로 분리 (좌표는 페이지 크기 대비 0~1 상대 좌표)
+
+    Returns:
+        tuple: 페이지 순서대로 FormTemplate
+    """
+    xy = base_xy()
+    width, height = TEMPLATE_PAGE_SIZE
+    page_count = int(xy.boxes[:, 1].max() // height) + 1
+    page_starts = [i * height for i in range(page_count)]
+
+    pages = [([], []) for _ in range(page_count)]
+    for text, (x1, y1, x2, y2) in zip(xy.texts, xy.boxes):
+        i = page_index_of(y1, page_starts)
+        top = page_starts[i]
+        pages[i][0].append(text)
+        pages[i][1].append([x1 / width, (y1 - top) / height, x2 / width, (y2 - top) / height])
+    return tuple(
+        FormTemplate(f"registry_page{i + 1}", texts, boxes, xy.version)
+        for i, (texts, boxes) in enumerate(pages)
+    )
+
+@lru_cache(maxsize=64)
+def page_template(page_index, width, height):
+    """
+    페이지 크기에 맞춘 템플릿 (양식 페이지 수보다 뒤 페이지는 마지막 양식 페이지(갑구/을구)를 사용)
+
+    같은 (페이지, 크기)는 한 번 만든 템플릿을 재사용한다 (템플릿은 읽기 전용).
+
+    Args:
+        page_index (int): 페이지 인덱스 (0부터)
+        width (int): 페이지 이미지 너비
+        height (int): 페이지 이미지 높이
+
+    Returns:
+        FormTemplate: 페이지 좌표계의 템플릿
+    """
+    templates = page_templates()
+    return templates[min(page_index, len(templates) - 1)].scaled(width, height)
+
+def stacked_template(page_sizes):
+    """
+    실제 페이지 크기로 페이지별 템플릿을 세로로 이어 붙인 템플릿
+
+    Args:
+        page_sizes (list): 페이지 순서대로 (width, height)
+
+    Returns:
+        FormTemplate: 이어 붙인 좌표계의 템플릿
+    """
+    return _stacked_template(tuple((width, height) for width, height in page_sizes))
+
+@lru_cache(maxsize=64)
+def _stacked_template(page_sizes):
+    templates = [page_template(i, width, height) for i, (width, height) in enumerate(page_sizes)]
+    return FormTemplate.stack(templates, "registry_stacked")
 
 # def get_page_of_text(y_coordinate, page_count):
 #     """
@@ -115,93 +122,36 @@ def merge_images(image_urls):
     
 #     return 1  # 기본값으로 첫 페이지 반환
 
-def get_page_height(url):
-    """이미지 URL로부터 높이를 가져오는 함수"""
-    response = requests.get(url)
-    if response.status_code == 200:
-        image = Image.open(BytesIO(response.content))
-        return image.height
-    return 1755  # 기본 높이
-
 ## 함수 추가가
 def organize_by_pages(data, page_heights):
     """페이지별로 데이터를 구조화하고 좌표를 보정하는 함수"""
     
-    # 페이지 경계 계산
-    page_boundaries = []
+    # 페이지 시작 좌표 계산
+    page_starts = []
     current_height = 0
     for height in page_heights:
-        page_boundaries.append({
-            'start': current_height,
-            'end': current_height + height
-        })
+        page_starts.append(current_height)
         current_height += height
 
     # 결과를 저장할 딕셔너리 초기화
     result = {f"{i+1}페이지": {} for i in range(len(page_heights))}
-    
-    # 각 항목을 해당하는 페이지에 할당
+
+    # 각 항목을 해당하는 페이지에 할당 (y1로 페이지 이진 탐색)
     for key, value in data.items():
         if isinstance(value, dict) and "bounding_box" in value:
             y1 = value["bounding_box"]["y1"]
-            
-            # y1 값이 어느 페이지 범위에 속하는지 확인
-            for page_num, boundary in enumerate(page_boundaries):
-                if boundary['start'] <= y1 < boundary['end']:
-                    # 해당 페이지에 항목 추가
-                    page_key = f"{page_num+1}페이지"
-                    new_value = value.copy()
-                    # y 좌표 보정
-                    new_value["bounding_box"]["y1"] -= boundary['start']
-                    new_value["bounding_box"]["y2"] -= boundary['start']
-                    result[page_key][key] = new_value
-                    break
-    
-    return result
+            if not 0 <= y1 < current_height:
+                continue
 
-def cre_ocr(image):
-    """PIL Image 객체에 대해 OCR 실행"""
-    request_json = {
-        'images': [
-            {
-                'format': 'jpg',
-                'name': 'demo'
-            }
-        ],
-        'requestId': str(uuid.uuid4()),
-        'version': 'V2',
-        'timestamp': int(round(time.time() * 1000))
-    }
+            page_num = page_index_of(y1, page_starts)
+            new_value = value.copy()
+            new_value["bounding_box"] = dict(value["bounding_box"])
+            # y 좌표 보정
+            new_value["bounding_box"]["y1"] -= page_starts[page_num]
+            new_value["bounding_box"]["y2"] -= page_starts[page_num]
+            result[f"{page_num+1}페이지"][key] = new_value
 
-    # 이미지를 바이트 버퍼로 변환
-    buffer = BytesIO()
-    image.save(buffer, format="JPEG")
-    image_bytes = buffer.getvalue()
-
-    payload = {'message': json.dumps(request_json).encode('UTF-8')}
-    files = [('file', ('image.jpg', image_bytes, 'image/jpeg'))]
-    headers = {'X-OCR-SECRET': secret_key}
-
-    response = requests.post(api_url, headers=headers, data=payload, files=files)
-
-    if response.status_code == 200:
-        ocr_results = response.json()
-
-        all_data = []
-        for image_result in ocr_results['images']:
-            for field in image_result['fields']:
-                text = field['inferText']
-                bounding_box = field['boundingPoly']['vertices']
-                x1, y1 = int(bounding_box[0]['x']), int(bounding_box[0]['y'])
-                x2, y2 = int(bounding_box[2]['x']), int(bounding_box[2]['y'])
-                all_data.append({
-                    "Text": text,
-                    "x1": x1, "y1": y1,
-                    "x2": x2, "y2": y2
-                })
-        df = pd.DataFrame(all_data)
-        return df
-    return None
+    return result
 
 def fix_json_format(text: str) -> str:
     """JSON 형식 오류를 자동으로 수정하는 함수"""
@@ -261,41 +211,48 @@ def format_registry_json(text: str, output_file: str) -> str:
         print("📌 오류 발생 JSON 내용:\n", text)
         return f"❌ JSON 변환 실패: {e}"
 
-def registry_keyword_ocr(image_urls, doc_type, user_id, contract_id):
-    """메인 OCR 처리 함수"""
-
-    page_numbers = [int(re.search(r'page(\d+)', url).group(1)) for url in image_urls]
-    page_heights = []
+def ocr_registry_page(url, image_store):
+    """
+    등기부등본 페이지 하나 OCR (같은 이미지는 캐시된 결과 사용)
 
+    Returns:
+        dict: page_number, width, height, df(OCR 단어 목록, 페이지 좌표). 실패 시 None
+    """
+    image_data = image_store.get_bytes(url)
+    if image_data is None:
+        return None
+
+    # 크기는 헤더에서만 읽고, OCR에는 원본 바이트를 그대로 업로드
+    size = image_store.get_size(url)
+    if size is None:
+        return None
+
+    df = cached_ocr(image_data, "registry", lambda: recognize(image_data, secret_key, api_url))
+    if df is None:
+        return None
+
+    width, height = size
+    return {
+        "page_number": int(re.search(r'page(\d+)', url).group(1)),
+        "width": width,
+        "height": height,
+        "df": df,
+    }
 
-    
-    all_dfs = []
-    y = 0
-    
-    # 각 페이지별 OCR 수행 및 높이 정보 수집
-    for url in image_urls:
-        response = requests.get(url)
-        if response.status_code == 200:
-            image = Image.open(BytesIO(response.content))
-            page_heights.append(image.height)
-            
-            # 각 페이지별 OCR 수행
-            df = cre_ocr(image)
-            if df is not None:
-                df["y1"] += y
-                df["y2"] += y
-                all_dfs.append(df)
-                y += image.height
-    
-    merged_df = pd.concat(all_dfs, ignore_index=True)
+def request_registry_fields(df, xy, page_note=""):
+    """
+    OCR 단어 목록과 템플릿으로 GPT에 등기부등본 항목 추출 요청
 
-    xy = base_xy()
-    xy_json = xy.to_json(orient="records", force_ascii=False)
-    df_json = merged_df.to_json(orient="records", force_ascii=False)
+    Args:
+        df (DataFrame): OCR 단어 목록
+        xy (FormTemplate): df와 같은 좌표계의 템플릿
+        page_note (str): 페이지별 요청 시 프롬프트에 추가할 안내
 
-    # current_page = re.search(r'page(\d+)', image_urls[0]).group(1)
-    # page_number = int(current_page)  # str을 int로 변환
-    # page_count = len(image_urls)  # 전체 페이지 수
+    Returns:
+        dict: {항목: {"text", "bounding_box"}}
+    """
+    # 프롬프트용 텍스트 변환 (한 줄에 단어 하나, Text|x1|y1|x2|y2)
+    df_text, xy_text = serialize_for_prompt(df, xy)
 
     target_texts = {
             "종류": "등본 종류 (집합건물, 건물, 토지 중 하나)",
@@ -314,8 +271,11 @@ def registry_keyword_ocr(image_urls, doc_type, user_id, contract_id):
         }
     
     
-    # GPT 분석 요청
-    response = client.chat.completions.create(
+    # GPT 분석 요청 (같은 요청은 캐시된 응답 사용)
+    text = chat_completion(
+            client,
+            "registry_extract",
+            cache_if=lambda text: is_json(fix_json_format(text)),
             model=MODEL,
             messages=[
                 {
@@ -329,11 +289,13 @@ def registry_keyword_ocr(image_urls, doc_type, user_id, contract_id):
                         "type": "text",
                         "text": (
                            f"다음은 OCR 분석을 위한 데이터입니다.\n\n"
-                            f"**위치 데이터 (xy):**\n{xy_json}\n\n"
-                            f"**내용 데이터 (df):**\n{df_json}\n\n"
+                            f"**데이터 형식:** 각 줄은 Text|x1|y1|x2|y2 형식이며 첫 줄은 컬럼 이름\n\n"
+                            f"**위치 데이터 (xy):**\n{xy_text}\n\n"
+                            f"**내용 데이터 (df):**\n{df_text}\n\n"
                             f"**작업 목표:**\n"
+                            f"{page_note}"
                             f"- 내용이 없으면 'NA'로 표시\n\n"
-                            f"- `xy` 데이터의 위치 정보(좌표)를 활용하여 `df` 데이터와 매칭. {xy_json}의 위치는 참고만하고 항상 {df_json}을 따른다.\n"
+                            f"- `xy` 데이터의 위치 정보(좌표)를 활용하여 `df` 데이터와 매칭. `xy`의 위치는 참고만하고 항상 `df`를 따른다.\n"
                             f"- 'xy' 데이터의 바운딩 박스 크기는 'df'에 맞게 조정된다"
                             f" **각 항목의 출력 형식:**\n"
                             + "\n".join([f"- **{key}**: {value}" for key, value in target_texts.items()]) +
@@ -378,35 +340,141 @@ def registry_keyword_ocr(image_urls, doc_type, user_id, contract_id):
             temperature=0.2,
             top_p=1.0
         )
-        
-    text = response.choices[0].message.content.strip()
+
+    text = text.strip()
     data = json.loads(fix_json_format(text))
 
     # 불필요한 필드 제거
     data.pop("(소유권에 관한 사항)", None)
     data.pop("(소유권 이외의 권리에 대한 사항)", None)
+    return data
 
-    # 6. 페이지별 데이터 구조화
-    organized_data = organize_by_pages(data, page_heights)
-
-
-    # 7. 페이지 번호 형식 맞추기
-    page_structured_data = {}
-    for i, (old_key, value) in enumerate(organized_data.items()):
-        new_key = f"page{page_numbers[i]}"
-        page_structured_data[new_key] = value
+def _is_na(value):
+    return isinstance(value, dict) and str(value.get("text", "")).strip() == "NA"
 
-    # 8. 3페이지에서 잘못 인식된 갑구 제거
+def drop_misread_gapgu(page_structured_data):
+    """3페이지에서 잘못 인식된 (갑구) 항목 제거 (한 번에 요청할 때와 페이지별 요청 모두 적용)"""
     if "page3" in page_structured_data and "(갑구)" in page_structured_data["page3"]:
         page_structured_data["page3"].pop("(갑구)")
         print("⚠️ 3페이지에서 잘못 인식된 (갑구) 항목이 제거되었습니다.")
-    
-    # 9. 채권최고액 중 가장 번호가 큰 것만 남기기
+    return page_structured_data
+
+def extract_merged(pages):
+    """
+    전체 페이지를 세로로 이어 붙인 좌표로 한 번에 GPT 요청 후 페이지별로 나눔 (페이지 수가 적을 때)
+
+    Args:
+        pages (list): ocr_registry_page 결과 리스트
+
+    Returns:
+        dict: {"page{n}": {항목: 값}}
+    """
+    all_dfs = []
+    y = 0
+    for page in pages:
+        df = page["df"].copy()
+        df["y1"] += y
+        df["y2"] += y
+        all_dfs.append(df)
+        y += page["height"]
+
+    merged_df = pd.concat(all_dfs, ignore_index=True)
+    xy = stacked_template([(page["width"], page["height"]) for page in pages])
+    data = request_registry_fields(merged_df, xy)
+
+    # 페이지별 데이터 구조화
+    organized_data = organize_by_pages(data, [page["height"] for page in pages])
+
+    # 페이지 번호 형식 맞추기
+    page_structured_data = {}
+    for page, value in zip(pages, organized_data.values()):
+        page_structured_data[f"page{page['page_number']}"] = value
+
+    return drop_misread_gapgu(page_structured_data)
+
+def extract_by_page(pages, progress=None):
+    """
+    페이지마다 페이지 좌표계의 템플릿으로 GPT 요청 (페이지 수가 많을 때, 페이지별 동시 실행)
+
+    Args:
+        pages (list): ocr_registry_page 결과 리스트
+        progress (AnalysisProgress): 페이지별 추출 완료 이벤트를 받을 객체 (선택)
+
+    Returns:
+        dict: {"page{n}": {항목: 값}}
+    """
+    def request_page(item):
+        i, page = item
+        xy = page_template(i, page["width"], page["height"])
+        page_note = (
+            f"- 이 데이터는 등기부등본 전체 {len(pages)}페이지 중 {i+1}페이지만 포함한다. "
+            f"다른 페이지에 있을 항목은 'NA'로 표시\n"
+        )
+        data = request_registry_fields(page["df"], xy, page_note)
+        if progress is not None:
+            progress.event("page_extracted", {"document_type": "registry_document", "page": page["page_number"], "result": data})
+        return data
+
+    page_results = {}
+    outcomes = run_concurrently(request_page, list(enumerate(pages)), PAGE_MAX_WORKERS)
+    for page, (data, error) in zip(pages, outcomes):
+        if error is not None:
+            print(f"❌ 등기부등본 {page['page_number']}페이지 분석 실패: {error}")
+            continue
+        page_results[f"page{page['page_number']}"] = data
+
+    # NA 항목은 모든 페이지에서 NA인 경우에만 첫 페이지에 남김 (한 번에 요청할 때와 같은 결과 형식)
+    found = {key for data in page_results.values() for key, value in data.items() if not _is_na(value)}
+    result = {}
+    for i, (page_key, data) in enumerate(page_results.items()):
+        result[page_key] = {
+            key: value for key, value in data.items()
+            if not _is_na(value) or (i == 0 and key not in found)
+        }
+
+    # 채권최고액은 가장 마지막 등기가 있는 페이지의 것만 남김
+    mortgage_pages = [
+        page_key for page_key, data in result.items()
+        if any(key.startswith("(채권최고액") for key in data)
+    ]
+    for page_key in mortgage_pages[:-1]:
+        for key in [key for key in result[page_key] if key.startswith("(채권최고액")]:
+            del result[page_key][key]
+
+    return drop_misread_gapgu(result)
+
+def registry_keyword_ocr(image_urls, doc_type, user_id, contract_id, image_store=None, progress=None):
+    """
+    메인 OCR 처리 함수
+    (image_store: 분석 단위로 공유하는 ImageStore, 없으면 새로 생성 / progress: 페이지별 추출 완료 이벤트를 받을 객체)
+    """
+    image_store = image_store or ImageStore()
+
+    # 각 페이지별 OCR 수행 및 크기 정보 수집 (동시 실행, 입력 순서 유지)
+    outcomes = run_concurrently(
+        lambda url: ocr_registry_page(url, image_store),
+        image_urls,
+        PAGE_MAX_WORKERS
+    )
+    pages = [page for page, _ in outcomes if page]
+    if not pages:
+        print("❌ 등기부등본 OCR 결과가 없습니다.")
+        return None
+
+    # 기본은 페이지별 요청, REGISTRY_MERGED_PROMPT를 켠 경우에만 전체 페이지를 하나의 프롬프트로 요청
+    if REGISTRY_MERGED_PROMPT:
+        page_structured_data = extract_merged(pages)
+        if progress is not None:
+            for page_key, data in page_structured_data.items():
+                progress.event("page_extracted", {"document_type": doc_type, "page": int(page_key.replace("page", "")), "result": data})
+    else:
+        page_structured_data = extract_by_page(pages, progress)
+
+    # 채권최고액 중 가장 번호가 큰 것만 남기기
     page_structured_data = keep_latest_mortgage_amount(page_structured_data)
-    
+
     return page_structured_data
 
-    
 
 def keep_latest_mortgage_amount(data):
     """
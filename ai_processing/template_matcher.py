@@ -0,0 +1,221 @@
+# 고정 양식 템플릿(base_xy) 기반 OCR 단어 배정
+# contract_ocr.py(페이지 처리) -> template_matcher.py(템플릿 영역별 단어 배정) -> 신뢰도 낮은 필드만 GPT
+#
+# 1. 템플릿의 라벨(괄호 없는 항목, 예: '보증금_1')과 같은 글자의 OCR 단어를 찾아
+#    스캔 이미지의 위치/배율 차이를 보정한다.
+# 2. y좌표로 정렬된 단어 인덱스에서 각 값 영역(괄호 항목, 예: '(보증금_1)')과 겹치는 단어를 찾아
+#    중심점 포함 / 겹침 비율로 배정하고, 여러 단어는 하나의 바운딩 박스로 합친다.
+# 3. 필드마다 신뢰도를 계산해 기준 이상인 필드는 GPT 없이 바로 사용한다.
+#    위치 보정 신뢰도는 보정 후 라벨 위치 오차(중앙값)로 정하고, 빈 영역(NA)과
+#    출력 형식 검사가 없는 필드는 기준보다 낮게 두어 항상 GPT로 확인한다.
+
+import os
+import re
+import numpy as np
+
+# 이 값 이상인 필드만 GPT 없이 사용
+TEMPLATE_MATCH_THRESHOLD = float(os.getenv("TEMPLATE_MATCH_THRESHOLD", "0.8"))
+MIN_ANCHORS = 3  # 위치 보정에 필요한 최소 라벨 수 (이보다 적으면 전체 신뢰도를 낮춤)
+OVERLAP_MIN = 0.5  # 중심점이 밖에 있어도 단어 면적의 이 비율 이상 겹치면 배정
+ALIGN_TOLERANCE = 10  # 보정 후 라벨 위치 오차(px, 중앙값)가 이 이하이면 위치 보정 신뢰도 1
+ALIGN_MAX_ERROR = 40  # 오차가 이 이상이면 위치 보정 신뢰도 0 (사이는 선형)
+EMPTY_CONFIDENCE = 0.0  # 영역에 단어가 없을 때(NA)의 신뢰도 (보정이 어긋났을 수 있으므로 항상 GPT로 확인)
+UNVALIDATED_CONFIDENCE = 0.6  # 출력 형식 검사가 없는 필드의 최대 신뢰도 (TEMPLATE_MATCH_THRESHOLD보다 낮게)
+
+NA_BOX = {"x1": 0, "y1": 0, "x2": 0, "y2": 0}
+
+
+def _normalize_text(text):
+    return re.sub(r"\s+", "", str(text))
+
+
+class WordIndex:
+    """y1 기준으로 정렬된 OCR 단어 배열 (영역 조회 시 y 범위만 이진 탐색 후 검사)"""
+
+    def __init__(self, df):
+        order = np.argsort(df["y1"].to_numpy(), kind="stable")
+        self.texts = df["Text"].astype(str).to_numpy()[order]
+        self.boxes = df[["x1", "y1", "x2", "y2"]].to_numpy(dtype=float)[order]
+        heights = self.boxes[:, 3] - self.boxes[:, 1]
+        self.max_height = float(heights.max()) if len(heights) else 0.0
+
+    def __len__(self):
+        return len(self.texts)
+
+    def query(self, box):
+        """
+        영역과 겹치는 단어의 인덱스 반환
+
+        Args:
+            box (array): [x1, y1, x2, y2]
+
+        Returns:
+            ndarray: 겹치는 단어 인덱스
+        """
+        y1s = self.boxes[:, 1]
+        # y1이 (영역 y1 - 최대 단어 높이) ~ 영역 y2 사이인 단어만 후보
+        lo = np.searchsorted(y1s, box[1] - self.max_height, side="left")
+        hi = np.searchsorted(y1s, box[3], side="right")
+        candidates = self.boxes[lo:hi]
+        hit = (
+            (candidates[:, 0] < box[2]) & (candidates[:, 2] > box[0]) &
+            (candidates[:, 1] < box[3]) & (candidates[:, 3] > box[1])
+        )
+        return np.nonzero(hit)[0] + lo
+
+
+def _fit_axis(template_values, ocr_values):
+    """한 축의 배율/이동량 추정 (라벨이 넓게 퍼져 있으면 1차 회귀, 아니면 이동량만)"""
+    if len(template_values) >= 3 and np.ptp(template_values) > 200:
+        scale, offset = np.polyfit(template_values, ocr_values, 1)
+        if 0.8 <= scale <= 1.25:
+            return scale, offset
+    return 1.0, float(np.median(ocr_values - template_values))
+
+
+def align_template(index, template):
+    """
+    라벨 위치로 템플릿 좌표를 스캔 이미지 좌표로 보정
+
+    Returns:
+        tuple: (보정된 템플릿 박스 배열, 위치 보정 신뢰도 0~1, 라벨로 사용된 단어 인덱스 집합)
+            위치 보정 신뢰도 = 라벨 수 비율(MIN_ANCHORS 기준) x 보정 후 라벨 위치 오차 점수
+    """
+    boxes = template.boxes
+    if len(index) == 0:
+        return boxes, 0.0, set()
+
+    # 글자별 단어 인덱스 (라벨마다 전체 단어를 다시 훑지 않도록)
+    words_by_text = {}
+    for i, text in enumerate(index.texts):
+        words_by_text.setdefault(_normalize_text(text), []).append(i)
+    word_centers = np.column_stack([
+        (index.boxes[:, 0] + index.boxes[:, 2]) / 2,
+        (index.boxes[:, 1] + index.boxes[:, 3]) / 2,
+    ])
+
+    template_points, ocr_points, anchor_words = [], [], set()
+    for row, label in template.label_rows:
+        matches = words_by_text.get(label)
+        if not matches:
+            continue
+        box = boxes[row]
+        center = np.array([(box[0] + box[2]) / 2, (box[1] + box[3]) / 2])
+        # 같은 글자가 여러 개면 템플릿 위치에 가장 가까운 단어 사용
+        nearest = min(matches, key=lambda i: np.linalg.norm(word_centers[i] - center))
+        template_points.append(center)
+        ocr_points.append(word_centers[nearest])
+        anchor_words.add(nearest)
+
+    if not template_points:
+        return boxes, 0.0, set()
+
+    template_points = np.array(template_points)
+    ocr_points = np.array(ocr_points)
+    sx, dx = _fit_axis(template_points[:, 0], ocr_points[:, 0])
+    sy, dy = _fit_axis(template_points[:, 1], ocr_points[:, 1])
+
+    aligned = boxes.copy()
+    aligned[:, [0, 2]] = boxes[:, [0, 2]] * sx + dx
+    aligned[:, [1, 3]] = boxes[:, [1, 3]] * sy + dy
+
+    # 보정한 라벨 위치와 실제 단어 위치의 거리 (기울어지거나 밀린 스캔이면 커짐)
+    fitted = template_points * [sx, sy] + [dx, dy]
+    error = float(np.median(np.linalg.norm(fitted - ocr_points, axis=1)))
+    fit_score = float(np.clip((ALIGN_MAX_ERROR - error) / (ALIGN_MAX_ERROR - ALIGN_TOLERANCE), 0.0, 1.0))
+
+    alignment = min(1.0, len(template_points) / MIN_ANCHORS) * fit_score
+    return aligned, alignment, anchor_words
+
+
+def _join_lines(texts, boxes):
+    """단어를 줄 단위(y)로 묶고 줄 안에서는 x 순서로 이어 붙임"""
+    order = np.argsort(boxes[:, 1], kind="stable")
+    lines = []
+    for i in order:
+        center_y = (boxes[i, 1] + boxes[i, 3]) / 2
+        if lines and abs(center_y - lines[-1]["center_y"]) <= (boxes[i, 3] - boxes[i, 1]) / 2:
+            lines[-1]["words"].append(i)
+        else:
+            lines.append({"center_y": center_y, "words": [i]})
+    return " ".join(
+        " ".join(texts[i] for i in sorted(line["words"], key=lambda i: boxes[i, 0]))
+        for line in lines
+    )
+
+
+def match_template(df, template, fields, validators=None):
+    """
+    템플릿의 값 영역별로 OCR 단어를 배정해 필드 값을 추출
+
+    Args:
+        df (DataFrame): OCR 단어 목록 (Text, x1, y1, x2, y2)
+        template (FormTemplate): base_xy 템플릿
+        fields (dict): {필드 이름: 템플릿 항목 이름} (예: {"보증금_1": "(보증금_1)"})
+        validators (dict): {필드 이름: 정규식}. 추출한 텍스트가 형식과 맞지 않으면 신뢰도를 낮추고,
+            정규식이 없는 필드는 UNVALIDATED_CONFIDENCE 이하로 제한
+
+    Returns:
+        dict: {필드 이름: {"text", "bounding_box", "confidence"}}
+    """
+    validators = validators or {}
+    index = WordIndex(df)
+    aligned, alignment, anchor_words = align_template(index, template)
+    row_of = template.row_of
+
+    results = {}
+    for field, template_key in fields.items():
+        if template_key not in row_of:
+            continue
+        box = aligned[row_of[template_key]]
+        candidates = [i for i in index.query(box) if i not in anchor_words]
+
+        assigned, inside = [], 0
+        for i in candidates:
+            wx1, wy1, wx2, wy2 = index.boxes[i]
+            center_inside = box[0] <= (wx1 + wx2) / 2 <= box[2] and box[1] <= (wy1 + wy2) / 2 <= box[3]
+            area = max((wx2 - wx1) * (wy2 - wy1), 1.0)
+            overlap = max(0.0, min(wx2, box[2]) - max(wx1, box[0])) * max(0.0, min(wy2, box[3]) - max(wy1, box[1]))
+            if center_inside or overlap / area >= OVERLAP_MIN:
+                assigned.append(i)
+                inside += int(center_inside)
+
+        if not assigned:
+            results[field] = {"text": "NA", "bounding_box": dict(NA_BOX), "confidence": round(alignment * EMPTY_CONFIDENCE, 3)}
+            continue
+
+        boxes = index.boxes[assigned]
+        text = _join_lines(index.texts[assigned], boxes)
+        confidence = alignment * (inside / len(assigned))
+        pattern = validators.get(field)
+        if not pattern:
+            confidence = min(confidence, UNVALIDATED_CONFIDENCE)
+        elif not re.search(pattern, text):
+            confidence *= 0.5
+
+        results[field] = {
+            "text": text,
+            "bounding_box": {
+                "x1": int(boxes[:, 0].min()), "y1": int(boxes[:, 1].min()),
+                "x2": int(boxes[:, 2].max()), "y2": int(boxes[:, 3].max()),
+            },
+            "confidence": round(confidence, 3),
+        }
+    return results
+
+
+def split_by_confidence(matches, threshold=None):
+    """
+    신뢰도 기준으로 바로 사용할 필드와 GPT로 다시 추출할 필드를 나눔
+
+    Returns:
+        tuple: ({필드: {"text", "bounding_box"}} 확정 필드, [GPT로 보낼 필드 이름])
+    """
+    threshold = TEMPLATE_MATCH_THRESHOLD if threshold is None else threshold
+    confident, uncertain = {}, []
+    for field, match in matches.items():
+        if match["confidence"] >= threshold:
+            confident[field] = {"text": match["text"], "bounding_box": match["bounding_box"]}
+        else:
+            uncertain.append(field)
+    return confident, uncertain
@@ -0,0 +1,162 @@
+# 고정 양식 템플릿 저장소 (template_data/*.json을 import 시점에 한 번만 컴파일)
+# contract_ocr.py, registry_ocr.py(base_xy) -> template_registry.py(컴파일된 템플릿) -> ocr_serializer.py, template_matcher.py
+#
+# 양식 좌표는 바뀌지 않으므로 호출마다 DataFrame을 만들고 프롬프트용 텍스트로 변환할 필요가 없다.
+# 데이터 파일 하나가 템플릿 하나이고 (이름, 버전, 기준 페이지 크기, 항목 행), 컴파일 결과는 읽기 전용이다.
+#   texts / boxes: 항목 이름 배열과 (항목 수, 4) 좌표 배열
+#   prompt_text: ocr_serializer 형식("Text|x1|y1|x2|y2")으로 미리 직렬화한 텍스트
+#   row_of / label_rows: 항목 이름 -> 행, 라벨(괄호 없는 항목)의 행과 공백 제거 글자 (단어 배정, 위치 보정용)
+#
+# 양식이 바뀌면 데이터 파일의 rows와 version만 수정한다.
+
+import json
+import os
+import numpy as np
+from .ocr_serializer import COLUMNS, SEPARATOR
+from .template_matcher import _normalize_text
+
+TEMPLATE_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "template_data")
+
+
+def _number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class FormTemplate:
+    """
+    컴파일된 양식 템플릿 (읽기 전용, 여러 스레드에서 공유)
+
+    Attributes:
+        name (str): 템플릿 이름 (예: contract_page1, registry_page2)
+        version (int): 데이터 파일 버전
+        page_size (tuple): 좌표 기준 페이지 크기 (width, height). 없으면 None
+        texts (ndarray): 항목 이름
+        boxes (ndarray): (항목 수, 4) 좌표 [x1, y1, x2, y2]
+        names (frozenset): 항목 이름 집합
+        row_of (dict): {항목 이름: 행 인덱스} (같은 이름이 여러 행이면 마지막 행)
+        label_rows (tuple): (행 인덱스, 공백을 제거한 글자) 튜플 (괄호 없는 라벨 항목만, 행 순서)
+        prompt_text (str): 프롬프트용 직렬화 텍스트
+    """
+
+    __slots__ = ("name", "version", "page_size", "texts", "boxes", "names", "row_of", "label_rows", "prompt_text")
+
+    def __init__(self, name, texts, boxes, version=1, page_size=None):
+        self.name = name
+        self.version = version
+        self.page_size = tuple(page_size) if page_size else None
+        self.texts = np.array([str(text) for text in texts], dtype=object)
+        self.boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        self.texts.setflags(write=False)
+        self.boxes.setflags(write=False)
+
+        self.names = frozenset(self.texts)
+        self.row_of = {text: i for i, text in enumerate(self.texts)}
+        self.label_rows = tuple(
+            (i, _normalize_text(text)) for i, text in enumerate(self.texts) if not text.startswith("(")
+        )
+
+        # ocr_serializer.serialize_words와 같은 형식 (좌표는 반올림한 정수)
+        lines = [SEPARATOR.join(COLUMNS)]
+        for text, box in zip(self.texts, np.round(self.boxes).astype(int)):
+            text = text.replace(SEPARATOR, "/").replace("\n", " ")
+            lines.append(SEPARATOR.join([text, *map(str, box)]))
+        self.prompt_text = "\n".join(lines)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __repr__(self):
+        return f"FormTemplate({self.name!r}, version={self.version}, rows={len(self)})"
+
+    def rows(self):
+        """(항목 이름, x1, y1, x2, y2) 튜플 리스트"""
+        return [(text, *map(_number, box)) for text, box in zip(self.texts, self.boxes)]
+
+    def to_frame(self):
+        """Text, x1, y1, x2, y2 DataFrame (확인/디버깅용, 추출 경로에서는 사용하지 않음)"""
+        import pandas as pd
+        return pd.DataFrame(self.rows(), columns=COLUMNS)
+
+    def scaled(self, width, height, name=None):
+        """
+        0~1 상대 좌표 템플릿을 페이지 크기에 맞춘 정수 좌표 템플릿으로 변환
+
+        Args:
+            width (int): 페이지 너비
+            height (int): 페이지 높이
+            name (str): 새 템플릿 이름 (없으면 기존 이름)
+
+        Returns:
+            FormTemplate: 변환된 템플릿
+        """
+        boxes = np.round(self.boxes * [width, height, width, height])
+        return FormTemplate(name or self.name, self.texts, boxes, self.version, (width, height))
+
+    @classmethod
+    def stack(cls, templates, name):
+        """
+        페이지 템플릿을 세로로 이어 붙인 템플릿 (각 템플릿의 page_size 높이만큼 아래로 이동)
+
+        Args:
+            templates (list): page_size가 있는 FormTemplate 리스트
+            name (str): 새 템플릿 이름
+
+        Returns:
+            FormTemplate: 이어 붙인 좌표계의 템플릿
+        """
+        texts, boxes = [], []
+        y_offset = 0
+        for template in templates:
+            texts.extend(template.texts)
+            boxes.append(template.boxes + [0, y_offset, 0, y_offset])
+            y_offset += template.page_size[1]
+        version = max((template.version for template in templates), default=1)
+        return cls(name, texts, np.concatenate(boxes) if boxes else np.empty((0, 4)), version)
+
+
+def load_template(path):
+    """
+    템플릿 데이터 파일을 읽어 컴파일
+
+    Args:
+        path (str): JSON 파일 경로 (name, version, page_size, rows)
+
+    Returns:
+        FormTemplate: 컴파일된 템플릿
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    rows = data["rows"]
+    return FormTemplate(
+        data["name"],
+        [row[0] for row in rows],
+        [row[1:5] for row in rows],
+        data.get("version", 1),
+        data.get("page_size"),
+    )
+
+
+def _load_all():
+    templates = {}
+    for filename in sorted(os.listdir(TEMPLATE_DATA_DIR)):
+        if filename.endswith(".json"):
+            template = load_template(os.path.join(TEMPLATE_DATA_DIR, filename))
+            templates[template.name] = template
+    return templates
+
+
+_templates = _load_all()
+
+
+def get_template(name):
+    """
+    이름으로 컴파일된 템플릿 조회
+
+    Raises:
+        KeyError: 해당 이름의 템플릿 데이터 파일이 없을 때
+    """
+    try:
+        return _templates[name]
+    except KeyError:
+        raise KeyError(f"양식 템플릿이 없습니다: {name} ({TEMPLATE_DATA_DIR})") from None
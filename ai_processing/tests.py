@@ -0,0 +1,921 @@
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+import pandas as pd
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from PIL import Image
+
+from . import ai_analysis2, gpt, jobs, metrics, ocr_cache, ocr_client, price_store, registry_ocr
+from .ai_analysis2 import _field_matches, build_rule_payload, parse_address, price
+from .cache import MISS, MemoryCache, SQLiteCache, TieredCache
+from .http_client import _create_session
+from .image_store import parse_image_size
+from .ocr_serializer import serialize_words
+from .template_matcher import match_template, split_by_confidence
+from .template_registry import FormTemplate
+from .tracing import span, trace
+from .utils import run_concurrently
+
+_metrics_dir = None
+
+
+def setUpModule():
+    # 스팬을 기록하는 테스트가 저장소 루트의 metrics.sqlite3에 쓰지 않도록 임시 파일 사용
+    global _metrics_dir
+    _metrics_dir = tempfile.TemporaryDirectory()
+    metrics.METRICS_DB_PATH = os.path.join(_metrics_dir.name, "metrics.sqlite3")
+    metrics._schema_ready = False
+
+
+def tearDownModule():
+    metrics._pending.clear()
+    _metrics_dir.cleanup()
+
+
+def _encode(size, image_format, **options):
+    buffer = BytesIO()
+    Image.new("RGB", size, "white").save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+class ParseImageSizeTests(SimpleTestCase):
+    """image_store.parse_image_size: 헤더 바이트만으로 크기 확인"""
+
+    def test_jpeg(self):
+        self.assertEqual(parse_image_size(_encode((1240, 1755), "JPEG")), (1240, 1755))
+
+    def test_progressive_jpeg(self):
+        self.assertEqual(parse_image_size(_encode((640, 480), "JPEG", progressive=True)), (640, 480))
+
+    def test_jpeg_with_exif_before_frame_header(self):
+        exif = Image.Exif()
+        exif[0x010F] = "jibsin"  # Make
+        data = _encode((300, 200), "JPEG", exif=exif.tobytes())
+        self.assertIn(b"Exif", data[:data.find(b"\xff\xc0")])  # APP1(EXIF)가 SOF보다 앞에 있음
+        self.assertEqual(parse_image_size(data), (300, 200))
+
+    def test_png(self):
+        self.assertEqual(parse_image_size(_encode((1241, 1756), "PNG")), (1241, 1756))
+
+    def test_header_prefix_is_enough(self):
+        data = _encode((800, 600), "JPEG")
+        self.assertEqual(parse_image_size(data[:1024]), (800, 600))
+        self.assertEqual(parse_image_size(_encode((800, 600), "PNG")[:24]), (800, 600))
+
+    def test_truncated_header_returns_none(self):
+        self.assertIsNone(parse_image_size(_encode((800, 600), "JPEG")[:100]))
+        self.assertIsNone(parse_image_size(_encode((800, 600), "PNG")[:20]))
+
+    def test_unsupported_format_returns_none(self):
+        self.assertIsNone(parse_image_size(_encode((10, 10), "GIF")))
+        self.assertIsNone(parse_image_size(b""))
+
+
+class MemoryCacheTests(SimpleTestCase):
+    """cache.MemoryCache: TTL 만료와 LRU 제거"""
+
+    def test_entry_expires_after_ttl(self):
+        cache = MemoryCache(ttl=10)
+        with mock.patch("ai_processing.cache.time.time", return_value=1000.0):
+            cache.set("key", "value")
+        with mock.patch("ai_processing.cache.time.time", return_value=1009.0):
+            self.assertEqual(cache.get("key"), "value")
+        with mock.patch("ai_processing.cache.time.time", return_value=1011.0):
+            self.assertIs(cache.get("key"), MISS)
+
+    def test_per_entry_ttl_overrides_default(self):
+        cache = MemoryCache(ttl=10)
+        with mock.patch("ai_processing.cache.time.time", return_value=1000.0):
+            cache.set("short", 1, ttl=1)
+            cache.set("long", 2)
+        with mock.patch("ai_processing.cache.time.time", return_value=1005.0):
+            self.assertIs(cache.get("short"), MISS)
+            self.assertEqual(cache.get("long"), 2)
+
+    def test_none_value_is_cached(self):
+        cache = MemoryCache()
+        cache.set("key", None)
+        self.assertIsNone(cache.get("key"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = MemoryCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # a를 최근 사용으로 갱신
+        cache.set("c", 3)
+        self.assertIs(cache.get("b"), MISS)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+
+class TieredCacheTests(SimpleTestCase):
+    """cache.TieredCache.get_or_load: 적중 시 loader 생략, ttl=False이면 저장하지 않음"""
+
+    def test_loader_runs_once_per_key(self):
+        cache = TieredCache("test", MemoryCache())
+        loader = mock.Mock(return_value=("value", None))
+        self.assertEqual(cache.get_or_load("key", loader), "value")
+        self.assertEqual(cache.get_or_load("key", loader), "value")
+        loader.assert_called_once()
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_ttl_false_is_not_stored(self):
+        cache = TieredCache("test", MemoryCache())
+        loader = mock.Mock(return_value=({"error": "timeout"}, False))
+        self.assertEqual(cache.get_or_load("key", loader), {"error": "timeout"})
+        cache.get_or_load("key", loader)
+        self.assertEqual(loader.call_count, 2)
+        self.assertIs(cache.get("key"), MISS)
+
+    def test_loader_ttl_is_applied(self):
+        cache = TieredCache("test", MemoryCache(ttl=3600))
+        with mock.patch("ai_processing.cache.time.time", return_value=1000.0):
+            cache.get_or_load("key", lambda: ("value", 5))
+        with mock.patch("ai_processing.cache.time.time", return_value=1006.0):
+            self.assertIs(cache.get("key"), MISS)
+
+    def test_persistent_hit_is_promoted_to_memory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            persistent = SQLiteCache(os.path.join(directory, "cache.sqlite3"), "test")
+            persistent.set("key", {"x": 1})
+            cache = TieredCache("test", MemoryCache(), persistent)
+            loader = mock.Mock()
+            self.assertEqual(cache.get_or_load("key", loader), {"x": 1})
+            loader.assert_not_called()
+            self.assertEqual(cache.memory.get("key"), {"x": 1})
+            self.assertEqual(cache.stats()["persistent_hits"], 1)
+            persistent._conn().close()
+
+    def test_promoted_entry_keeps_persistent_expiry(self):
+        with tempfile.TemporaryDirectory() as directory:
+            persistent = SQLiteCache(os.path.join(directory, "cache.sqlite3"), "test")
+            cache = TieredCache("test", MemoryCache(ttl=30 * 24 * 3600), persistent)
+            with mock.patch("ai_processing.cache.time.time", return_value=1000.0):
+                persistent.set("short", "value", ttl=10)
+                persistent.set("forever", "value")
+            with mock.patch("ai_processing.cache.time.time", return_value=1005.0):
+                self.assertEqual(cache.get("short"), "value")
+                self.assertEqual(cache.get("forever"), "value")
+            with mock.patch("ai_processing.cache.time.time", return_value=1011.0):
+                self.assertIs(cache.memory.get("short"), MISS)
+                self.assertEqual(cache.memory.get("forever"), "value")
+            with mock.patch("ai_processing.cache.time.time", return_value=1000.0 + 31 * 24 * 3600):
+                self.assertEqual(cache.memory.get("forever"), "value")
+            persistent._conn().close()
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    """cache.SQLiteCache: 만료된 행 삭제"""
+
+    def count_rows(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_expired_rows_are_deleted_on_open(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite3")
+            writer = SQLiteCache(path, "test")
+            with mock.patch("ai_processing.cache.time.time", return_value=1000.0):
+                writer.set("old", 1, ttl=10)
+                writer.set("new", 2, ttl=3600)
+                writer.set("forever", 3)
+            writer._conn().close()
+
+            reader = SQLiteCache(path, "test")
+            with mock.patch("ai_processing.cache.time.time", return_value=2000.0):
+                self.assertEqual(reader.get("new"), 2)
+            reader._conn().close()
+            self.assertEqual(self.count_rows(path), 2)
+
+    def test_expired_rows_are_deleted_periodically(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite3")
+            cache = SQLiteCache(path, "test", purge_interval=60)
+            with mock.patch("ai_processing.cache.time.time", return_value=1000.0):
+                cache.set("old", 1, ttl=10)
+            with mock.patch("ai_processing.cache.time.time", return_value=1030.0):
+                cache.set("a", 2)
+            self.assertEqual(self.count_rows(path), 2)
+            with mock.patch("ai_processing.cache.time.time", return_value=1070.0):
+                cache.set("b", 3)
+            self.assertEqual(self.count_rows(path), 2)
+            cache._conn().close()
+
+
+class RulePayloadTests(SimpleTestCase):
+    """ai_analysis2.build_rule_payload: solution별로 필요한 필드만 전달"""
+
+    def test_field_matches_numbered_and_parenthesized_keys(self):
+        self.assertTrue(_field_matches("채권최고액", ["채권최고액"]))
+        self.assertTrue(_field_matches("(채권최고액_1)", ["채권최고액"]))
+        self.assertTrue(_field_matches("채권최고액_12", ["채권최고액"]))
+        self.assertTrue(_field_matches("성명1", ["성명"]))
+        self.assertFalse(_field_matches("채권최고액합계", ["채권최고액"]))
+        self.assertFalse(_field_matches("임대인_성명", ["성명"]))
+        self.assertFalse(_field_matches("보증금_a", ["보증금"]))
+
+    def test_payload_keeps_only_rule_fields(self):
+        data = {
+            "contract": {
+                "page1": {"보증금_1": {"text": "1억"}, "차임_2": {"text": "50만"}, "임대인": {"text": "김민수"}},
+                "page2": {"특약사항": {"text": "없음"}},
+            },
+            "registry_document": {
+                "page1": {"(채권최고액_1)": {"text": "1억2천"}, "소유자": {"text": "김민수"}},
+                "page2": "NA",
+            },
+            "building_registry": {"page1": {"면적": {"text": "84.9"}}},
+        }
+        payload = json.loads(build_rule_payload(data, "solution_3"))
+        self.assertEqual(payload, {
+            "contract": {"page1": {"보증금_1": {"text": "1억"}, "차임_2": {"text": "50만"}}},
+            "registry_document": {"page1": {"(채권최고액_1)": {"text": "1억2천"}}},
+        })
+
+    def test_solution_1_keeps_lease_period(self):
+        # edit_period가 만든 임대차기간은 규칙 4(계약기간과 임대차 기간 비교)에 필요
+        data = {
+            "contract": {
+                "page1": {
+                    "계약기간": {"text": "2년"},
+                    "임대차기간": {"text": "2024.01.01~2025.12.31"},
+                    "보증금_1": {"text": "1억"},
+                },
+            },
+        }
+        payload = json.loads(build_rule_payload(data, "solution_1"))
+        self.assertEqual(payload["contract"]["page1"], {
+            "계약기간": {"text": "2년"},
+            "임대차기간": {"text": "2024.01.01~2025.12.31"},
+        })
+
+    def test_payload_is_compact_json(self):
+        data = {"contract": {"page1": {"임대인": {"text": "김민수"}}}}
+        self.assertEqual(build_rule_payload(data, "solution_2"), '{"contract":{"page1":{"임대인":{"text":"김민수"}}}}')
+
+    def test_missing_sections_are_omitted(self):
+        self.assertEqual(build_rule_payload({}, "solution_1"), "{}")
+
+
+class SerializeWordsTests(SimpleTestCase):
+    """ocr_serializer.serialize_words: "Text|x1|y1|x2|y2" 한 줄에 단어 하나"""
+
+    def test_header_and_rows(self):
+        df = pd.DataFrame(
+            [{"Text": "보증금", "x1": 10, "y1": 20, "x2": 60, "y2": 40}, {"Text": "1억", "x1": 70, "y1": 20, "x2": 90, "y2": 40}]
+        )
+        self.assertEqual(serialize_words(df), "Text|x1|y1|x2|y2\n보증금|10|20|60|40\n1억|70|20|90|40")
+
+    def test_float_coordinates_are_rounded(self):
+        df = pd.DataFrame([{"Text": "a", "x1": 10.4, "y1": 19.6, "x2": 60.5, "y2": 41.5}])
+        self.assertEqual(serialize_words(df).splitlines()[1], "a|10|20|60|42")
+
+    def test_separator_and_newline_in_text_are_replaced(self):
+        df = pd.DataFrame([{"Text": "a|b\nc", "x1": 1, "y1": 2, "x2": 3, "y2": 4}])
+        self.assertEqual(serialize_words(df).splitlines()[1], "a/b c|1|2|3|4")
+
+    def test_non_string_text(self):
+        df = pd.DataFrame([{"Text": 123, "x1": 1, "y1": 2, "x2": 3, "y2": 4}])
+        self.assertEqual(serialize_words(df).splitlines()[1], "123|1|2|3|4")
+
+    def test_empty_or_missing_frame_returns_header(self):
+        self.assertEqual(serialize_words(None), "Text|x1|y1|x2|y2")
+        self.assertEqual(serialize_words(pd.DataFrame(columns=["Text", "x1", "y1", "x2", "y2"])), "Text|x1|y1|x2|y2")
+
+
+# 4개 라벨(네 모서리)과 값 영역으로 된 작은 양식
+_TEMPLATE_ROWS = [
+    ("보증금_1", 50, 80, 150, 120), ("(보증금_1)", 170, 80, 450, 120),
+    ("계약금", 650, 80, 750, 120), ("(계약금)", 770, 80, 1050, 120),
+    ("잔금", 50, 880, 150, 920), ("(잔금)", 170, 880, 450, 920),
+    ("임대인", 650, 880, 750, 920), ("(임대인)", 770, 880, 1050, 920),
+    ("(특약)", 50, 400, 1050, 600),
+]
+_FIELDS = {"보증금_1": "(보증금_1)", "계약금": "(계약금)", "잔금": "(잔금)", "임대인": "(임대인)", "특약": "(특약)"}
+_VALIDATORS = {"보증금_1": r"^[\d,]+원$", "계약금": r"^[\d,]+원$", "잔금": r"^[\d,]+원$", "임대인": r"^[가-힣]{2,4}$"}
+# 잔금 영역은 비어 있음
+_SCAN_WORDS = [
+    ("보증금_1", 60, 85, 140, 115), ("100,000,000원", 200, 85, 400, 115),
+    ("계약금", 660, 85, 740, 115), ("10,000,000원", 800, 85, 1000, 115),
+    ("잔금", 60, 885, 140, 915),
+    ("임대인", 660, 885, 740, 915), ("김민수", 800, 885, 900, 915),
+    ("반려동물", 100, 480, 250, 510), ("금지", 270, 480, 330, 510),
+]
+
+
+def _template():
+    return FormTemplate("test", [row[0] for row in _TEMPLATE_ROWS], [row[1:] for row in _TEMPLATE_ROWS])
+
+
+def _scan(transform=lambda x, y: (x, y), words=_SCAN_WORDS):
+    rows = []
+    for text, x1, y1, x2, y2 in words:
+        (x1, y1), (x2, y2) = transform(x1, y1), transform(x2, y2)
+        rows.append({"Text": text, "x1": x1, "y1": y1, "x2": x2, "y2": y2})
+    return pd.DataFrame(rows)
+
+
+class TemplateMatchTests(SimpleTestCase):
+    """template_matcher: 템플릿 영역별 단어 배정과 GPT 생략 기준"""
+
+    def match(self, df):
+        return match_template(df, _template(), _FIELDS, _VALIDATORS)
+
+    def test_aligned_scan_assigns_validated_fields(self):
+        matches = self.match(_scan())
+        self.assertEqual(matches["보증금_1"]["text"], "100,000,000원")
+        self.assertEqual(matches["보증금_1"]["bounding_box"], {"x1": 200, "y1": 85, "x2": 400, "y2": 115})
+        self.assertEqual(matches["임대인"]["text"], "김민수")
+
+        confident, uncertain = split_by_confidence(matches, threshold=0.8)
+        self.assertEqual(set(confident), {"보증금_1", "계약금", "임대인"})
+        self.assertEqual(set(uncertain), {"잔금", "특약"})
+
+    def test_empty_region_is_sent_to_gpt(self):
+        match = self.match(_scan())["잔금"]
+        self.assertEqual(match["text"], "NA")
+        self.assertLess(match["confidence"], 0.8)
+
+    def test_field_without_validator_is_sent_to_gpt(self):
+        match = self.match(_scan())["특약"]
+        self.assertEqual(match["text"], "반려동물 금지")
+        self.assertLess(match["confidence"], 0.8)
+
+    def test_format_mismatch_lowers_confidence(self):
+        words = [("100,000,000", *box) if text == "100,000,000원" else (text, *box) for text, *box in _SCAN_WORDS]
+        matches = self.match(_scan(words=words))
+        self.assertEqual(matches["보증금_1"]["text"], "100,000,000")
+        self.assertIn("보증금_1", split_by_confidence(matches, threshold=0.8)[1])
+
+    def test_shifted_scan_is_registered(self):
+        matches = self.match(_scan(lambda x, y: (x + 40, y + 60)))
+        self.assertEqual(matches["계약금"]["text"], "10,000,000원")
+        self.assertEqual(matches["계약금"]["bounding_box"], {"x1": 840, "y1": 145, "x2": 1040, "y2": 175})
+        self.assertIn("계약금", split_by_confidence(matches, threshold=0.8)[0])
+
+    def test_scaled_scan_is_registered(self):
+        matches = self.match(_scan(lambda x, y: (x * 1.1, y * 1.1)))
+        self.assertEqual(matches["임대인"]["text"], "김민수")
+        self.assertIn("임대인", split_by_confidence(matches, threshold=0.8)[0])
+
+    def test_skewed_scan_is_not_trusted(self):
+        # 기울어진 스캔: 축별 이동/배율로는 라벨 위치가 맞지 않음
+        matches = self.match(_scan(lambda x, y: (x, y + 0.1 * x)))
+        confident, _ = split_by_confidence(matches, threshold=0.8)
+        self.assertEqual(confident, {})
+
+    def test_too_few_anchors_lower_confidence(self):
+        words = [word for word in _SCAN_WORDS if word[0] not in ("잔금", "임대인")]
+        confident, _ = split_by_confidence(self.match(_scan(words=words)), threshold=0.8)
+        self.assertEqual(confident, {})
+
+
+class AnalysisJobQueueTests(SimpleTestCase):
+    """jobs: 계약별 중복 등록 방지, 작업 가져가기, 만료된 작업 재등록, 소유 워커만 결과 저장"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for target, value in [
+            ("JOB_DB_PATH", os.path.join(directory.name, "jobs.sqlite3")),
+            ("_schema_ready", False),
+            ("update_analysis_status", mock.Mock()),
+            ("start_workers", mock.Mock()),
+        ]:
+            patcher = mock.patch.object(jobs, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_enqueue_reuses_active_job_for_same_contract(self):
+        job_id = jobs.enqueue_analysis("user1", "contract1")
+        self.assertEqual(jobs.enqueue_analysis("user1", "contract1"), job_id)
+        self.assertNotEqual(jobs.enqueue_analysis("user1", "contract2"), job_id)
+        self.assertEqual(jobs.get_job(job_id)["status"], "queued")
+
+    def test_enqueue_creates_new_job_after_previous_one_finished(self):
+        job_id = jobs.enqueue_analysis("user1", "contract1")
+        jobs._claim_next_job("worker-a")
+        self.assertTrue(jobs._finish_job(job_id, "worker-a", 200, {"success": True}))
+        self.assertNotEqual(jobs.enqueue_analysis("user1", "contract1"), job_id)
+
+    def test_claim_takes_oldest_queued_job_once(self):
+        with mock.patch("ai_processing.jobs.time.time", return_value=1000.0):
+            first = jobs.enqueue_analysis("user1", "contract1")
+        with mock.patch("ai_processing.jobs.time.time", return_value=1001.0):
+            second = jobs.enqueue_analysis("user1", "contract2")
+        with mock.patch("ai_processing.jobs.time.time", return_value=1002.0):
+            self.assertEqual(jobs._claim_next_job("worker-a")["job_id"], first)
+            self.assertEqual(jobs._claim_next_job("worker-b")["job_id"], second)
+            self.assertIsNone(jobs._claim_next_job("worker-c"))
+        self.assertEqual(jobs.get_job(first)["status"], "running")
+
+    def test_running_job_is_requeued_only_after_lease_expires(self):
+        with mock.patch("ai_processing.jobs.time.time", return_value=1000.0):
+            job_id = jobs.enqueue_analysis("user1", "contract1")
+            jobs._claim_next_job("worker-a")
+        with mock.patch("ai_processing.jobs.time.time", return_value=1000.0 + jobs.JOB_STALE_SECONDS - 1):
+            self.assertIsNone(jobs._claim_next_job("worker-b"))
+        with mock.patch("ai_processing.jobs.time.time", return_value=1000.0 + jobs.JOB_STALE_SECONDS + 1):
+            self.assertEqual(jobs._claim_next_job("worker-b")["job_id"], job_id)
+
+    def test_only_owner_can_finish_job(self):
+        with mock.patch("ai_processing.jobs.time.time", return_value=1000.0):
+            job_id = jobs.enqueue_analysis("user1", "contract1")
+            jobs._claim_next_job("worker-a")
+        with mock.patch("ai_processing.jobs.time.time", return_value=1000.0 + jobs.JOB_STALE_SECONDS + 1):
+            jobs._claim_next_job("worker-b")
+
+        # 작업을 빼앗긴 worker-a의 결과는 저장되지 않음
+        self.assertFalse(jobs._finish_job(job_id, "worker-a", 500, {"success": False}))
+        self.assertEqual(jobs.get_job(job_id)["status"], "running")
+
+        self.assertTrue(jobs._finish_job(job_id, "worker-b", 200, {"success": True}))
+        job = jobs.get_job(job_id)
+        self.assertEqual((job["status"], job["http_status"], job["result"]), ("completed", 200, {"success": True}))
+        self.assertEqual([stage["stage"] for stage in job["stages"]], ["queued", "completed"])
+
+    def test_schema_migrates_once_across_threads(self):
+        with mock.patch.object(jobs, "_migrate", wraps=jobs._migrate) as migrate:
+            threads = [threading.Thread(target=lambda: jobs._connect().close()) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        migrate.assert_called_once()
+
+
+def _field(text):
+    return {"text": text, "bounding_box": {"x1": 0, "y1": 0, "x2": 0, "y2": 0}}
+
+
+class RegistryPageTests(SimpleTestCase):
+    """registry_ocr: 페이지별 템플릿 분리와 페이지별 추출 결과 정리"""
+
+    def test_page_index_of_page_edges(self):
+        starts = [0, 1755, 3510]
+        self.assertEqual(registry_ocr.page_index_of(-5, starts), 0)
+        self.assertEqual(registry_ocr.page_index_of(0, starts), 0)
+        self.assertEqual(registry_ocr.page_index_of(1754.9, starts), 0)
+        self.assertEqual(registry_ocr.page_index_of(1755, starts), 1)
+        self.assertEqual(registry_ocr.page_index_of(3510, starts), 2)
+        self.assertEqual(registry_ocr.page_index_of(9999, starts), 2)
+
+    def test_page_templates_split_base_xy_by_page(self):
+        xy = registry_ocr.base_xy()
+        width, height = registry_ocr.TEMPLATE_PAGE_SIZE
+        templates = registry_ocr.page_templates()
+
+        self.assertEqual([template.name for template in templates], ["registry_page1", "registry_page2", "registry_page3"])
+        self.assertEqual(sum(len(template.texts) for template in templates), len(xy.texts))
+        for template in templates:
+            self.assertTrue(((template.boxes >= 0) & (template.boxes <= 1)).all())
+
+        # 2페이지 항목은 2페이지 시작 기준 상대 좌표
+        label = "(대지권이 목적인 토지의 표시)"
+        x1, y1, x2, y2 = xy.boxes[list(xy.texts).index(label)]
+        page2 = templates[1]
+        self.assertEqual(
+            list(page2.boxes[list(page2.texts).index(label)]),
+            [x1 / width, (y1 - height) / height, x2 / width, (y2 - height) / height],
+        )
+
+    def test_extract_by_page_prunes_na_mortgage_and_page3_gapgu(self):
+        responses = {
+            "df1": {"종류": _field("집합건물"), "소유자": _field("NA"), "(채권최고액_1)": _field("NA"), "신탁": _field("NA")},
+            "df2": {"종류": _field("NA"), "소유자": _field("김민수"), "(채권최고액_1)": _field("금1억원")},
+            "df3": {"(갑구)": _field("갑구"), "(채권최고액_2)": _field("금2억원"), "신탁": _field("NA")},
+        }
+        pages = [
+            {"page_number": n, "width": 1240, "height": 1755, "df": f"df{n}"}
+            for n in (1, 2, 3)
+        ]
+        with mock.patch.object(registry_ocr, "page_template"), \
+                mock.patch.object(registry_ocr, "request_registry_fields",
+                                  side_effect=lambda df, xy, page_note: responses[df]):
+            result = registry_ocr.extract_by_page(pages)
+
+        self.assertEqual(result, {
+            # 모든 페이지에서 NA인 항목만 첫 페이지에 NA로 남음
+            "page1": {"종류": _field("집합건물"), "신탁": _field("NA")},
+            # 채권최고액은 마지막으로 나온 페이지의 것만 남음
+            "page2": {"소유자": _field("김민수")},
+            # 3페이지의 (갑구)는 잘못 인식된 항목으로 제거
+            "page3": {"(채권최고액_2)": _field("금2억원")},
+        })
+
+
+class HttpRetryTests(SimpleTestCase):
+    """http_client: 과금되는 OCR POST는 연결 실패만 재시도"""
+
+    def retry(self, upstream):
+        return _create_session(upstream).get_adapter("https://example.com").max_retries
+
+    def test_ocr_retries_only_connect_errors(self):
+        retry = self.retry("ocr")
+        self.assertGreater(retry.connect, 0)
+        self.assertEqual((retry.read, retry.status), (0, 0))
+        self.assertFalse(retry.is_retry("POST", 500))
+        self.assertFalse(retry.is_retry("POST", 429))
+
+    def test_get_upstreams_retry_server_errors(self):
+        for upstream in ("geocoding", "storage"):
+            retry = self.retry(upstream)
+            self.assertGreater(retry.read, 0)
+            self.assertTrue(retry.is_retry("GET", 503))
+
+
+PRICE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_data", "public_prices.csv")
+SINCHON_ADDRESS = "서울특별시 서대문구 창천동 신촌아파트 제101동 제12층 제1203호"
+
+
+class PriceStoreTests(SimpleTestCase):
+    """price_store: 로컬 CSV를 가져와 조회하고, 가져오지 않은 시도는 CSV로 조회"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for target, value in [
+            ("PRICE_DB_PATH", os.path.join(directory.name, "prices.sqlite3")),
+            ("_local", threading.local()),
+        ]:
+            patcher = mock.patch.object(price_store, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: getattr(price_store._local, "conn", None) and price_store._local.conn.close())
+
+    def test_import_command_loads_local_csv(self):
+        call_command("import_public_prices", PRICE_CSV, stdout=StringIO())
+        records = price_store.lookup(parse_address(SINCHON_ADDRESS))
+        self.assertEqual([record["공시가격"] for record in records], [350000000])
+
+    def test_lookup_falls_back_to_dong_when_unit_is_missing(self):
+        self.assertEqual(price_store.import_csv(PRICE_CSV), {"서울특별시": 5})
+        records = price_store.lookup(parse_address("서울특별시 서대문구 창천동 신촌아파트 제101동 제9999호"))
+        self.assertEqual(
+            sorted(record["공시가격"] for record in records), [301000000, 350000000, 352000000, 500000000]
+        )
+
+    def test_reimport_replaces_rows_of_same_sido(self):
+        price_store.import_csv(PRICE_CSV)
+        price_store.import_csv(PRICE_CSV)
+        self.assertEqual(len(price_store.lookup(parse_address(SINCHON_ADDRESS))), 1)
+
+    def test_sido_not_imported_returns_none(self):
+        price_store.import_csv(PRICE_CSV)
+        self.assertIsNone(price_store.lookup(parse_address("부산광역시 해운대구 우동 제101동 제1203호")))
+
+    def test_price_uses_store_without_download(self):
+        price_store.import_csv(PRICE_CSV)
+        with mock.patch("ai_processing.ai_analysis2.get_session") as get_session:
+            self.assertEqual(price(SINCHON_ADDRESS), {"공시가격": 350000000, "method": "direct_match"})
+        get_session.assert_not_called()
+
+    def test_price_falls_back_to_csv_when_sido_not_imported(self):
+        with open(PRICE_CSV, "rb") as f:
+            response = mock.Mock(content=f.read())
+        with mock.patch("ai_processing.ai_analysis2.get_session") as get_session:
+            get_session.return_value.get.return_value = response
+            self.assertEqual(price(SINCHON_ADDRESS), {"공시가격": 350000000, "method": "direct_match"})
+        get_session.return_value.get.assert_called_once_with(price_store.PUBLIC_PRICE_CSV_URLS["서울특별시"])
+
+
+def _completion(text):
+    return mock.Mock(choices=[mock.Mock(message=mock.Mock(content=text))], usage=None)
+
+
+class GptCacheTests(SimpleTestCase):
+    """gpt.chat_completion: 같은 요청은 캐시 응답 사용, use_cache/GPT_CACHE_OPT_OUT이면 매번 호출"""
+
+    def setUp(self):
+        for target, value in [
+            ("gpt_cache", TieredCache("gpt-test", MemoryCache())),
+            ("GPT_CACHE_ENABLED", True),
+            ("GPT_CACHE_OPT_OUT", {"summary"}),
+        ]:
+            patcher = mock.patch.object(gpt, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = mock.Mock()
+        self.client.chat.completions.create.return_value = _completion('{"ok": true}')
+        self.messages = [{"role": "user", "content": "보증금 확인"}]
+
+    def complete(self, site="analyze", **kwargs):
+        return gpt.chat_completion(self.client, site, model="gpt-4o", messages=self.messages, temperature=0.2, **kwargs)
+
+    def test_request_key_ignores_argument_order(self):
+        first = gpt.request_key({"model": "gpt-4o", "messages": self.messages, "temperature": 0.2})
+        second = gpt.request_key({"temperature": 0.2, "messages": self.messages, "model": "gpt-4o"})
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, gpt.request_key({"model": "gpt-4o", "messages": self.messages, "temperature": 0.3}))
+
+    def test_same_request_is_served_from_cache(self):
+        self.assertEqual(self.complete(), '{"ok": true}')
+        self.assertEqual(self.complete(), '{"ok": true}')
+        self.client.chat.completions.create.assert_called_once()
+
+    def test_use_cache_false_always_calls_api(self):
+        self.complete(use_cache=False)
+        self.complete(use_cache=False)
+        self.assertEqual(self.client.chat.completions.create.call_count, 2)
+        self.assertEqual(gpt.gpt_cache.stats()["misses"], 0)
+
+    def test_opted_out_site_always_calls_api(self):
+        self.complete(site="summary")
+        self.complete(site="summary")
+        self.assertEqual(self.client.chat.completions.create.call_count, 2)
+
+    def test_rejected_response_is_not_cached(self):
+        self.client.chat.completions.create.return_value = _completion("JSON이 아닌 응답")
+        self.complete(cache_if=gpt.is_json)
+        self.complete(cache_if=gpt.is_json)
+        self.assertEqual(self.client.chat.completions.create.call_count, 2)
+
+
+
+class PartialAnalysisTests(SimpleTestCase):
+    """utils.run_concurrently 시간 초과와 analyze_contract_data의 부분 병합"""
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def slow(self):
+        self.release.wait(5)
+        return {"late": True}
+
+    def test_run_concurrently_marks_only_slow_item_as_timed_out(self):
+        def func(item):
+            if item == "slow":
+                return self.slow()
+            if item == "fail":
+                raise ValueError("실패")
+            return item.upper()
+
+        outcomes = run_concurrently(func, ["a", "slow", "fail", "b"], 4, timeout=0.2)
+        self.assertEqual([result for result, _ in outcomes], ["A", None, None, "B"])
+        self.assertIsInstance(outcomes[1][1], TimeoutError)
+        self.assertIsInstance(outcomes[2][1], ValueError)
+
+    def test_failed_and_timed_out_solutions_are_listed_as_missing(self):
+        data = {"contract": {"page1": {"보증금_1": {"text": "1억"}, "임대인": {"text": "김민수"}}}}
+        solution_1 = {"contract": {"page1": {"보증금_1": {"notice": "문제 없음", "solution": "계약 진행 가능"}}}}
+        with mock.patch.object(ai_analysis2, "SOLUTION_TIMEOUT", 0.2), \
+                mock.patch.object(ai_analysis2, "solution_1", return_value=solution_1), \
+                mock.patch.object(ai_analysis2, "solution_2", side_effect=ValueError("GPT 응답 오류")), \
+                mock.patch.object(ai_analysis2, "solution_3", side_effect=lambda data, cost: self.slow()):
+            result = ai_analysis2.analyze_contract_data(data, "서울특별시 서대문구", 350000000)
+
+        self.assertEqual(result["contract"]["page1"]["보증금_1"]["notice"], "문제 없음")
+        self.assertEqual(data["contract"]["page1"]["보증금_1"], {"text": "1억"})
+        missing = {item["analysis"]: item for item in result["missing_analysis"]}
+        self.assertEqual(set(missing), {"solution_2", "solution_3"})
+        self.assertEqual(missing["solution_2"]["error"], "GPT 응답 오류")
+        self.assertEqual(missing["solution_3"]["description"], ai_analysis2.SOLUTION_DESCRIPTIONS["solution_3"])
+
+    def test_error_result_is_listed_as_missing(self):
+        data = {"contract": {"page1": {"임대인": {"text": "김민수"}}}}
+        with mock.patch.object(ai_analysis2, "solution_1", return_value={}), \
+                mock.patch.object(ai_analysis2, "solution_2", return_value={"error": "JSON 파싱 실패"}), \
+                mock.patch.object(ai_analysis2, "solution_3", return_value={}):
+            result = ai_analysis2.analyze_contract_data(data, "서울특별시 서대문구", 350000000)
+        self.assertEqual(
+            result["missing_analysis"],
+            [{"analysis": "solution_2", "description": ai_analysis2.SOLUTION_DESCRIPTIONS["solution_2"], "error": "JSON 파싱 실패"}],
+        )
+
+
+def _ocr_field(text, x1, y1, x2, y2):
+    vertices = [{"x": x1, "y": y1}, {"x": x2, "y": y1}, {"x": x2, "y": y2}, {"x": x1, "y": y2}]
+    return {"inferText": text, "boundingPoly": {"vertices": vertices}}
+
+
+class OcrClientTests(SimpleTestCase):
+    """ocr_client: 응답 파싱, 업로드 준비, 묶음 요청, 요청 실패 처리 (_post는 대역 사용)"""
+
+    def test_parse_fields_truncates_coordinates(self):
+        texts, boxes = ocr_client.parse_fields([_ocr_field("보증금", 10.9, 20.2, 110.5, 40.7), _ocr_field("금", 1, 2, 3, 4)])
+        self.assertEqual(list(texts), ["보증금", "금"])
+        self.assertEqual(boxes.tolist(), [[10, 20, 110, 40], [1, 2, 3, 4]])
+        self.assertEqual(ocr_client.parse_fields([])[1].shape, (0, 4))
+
+    def test_parse_images_matches_names_and_order(self):
+        response = {"images": [
+            {"name": "page1", "fields": [_ocr_field("둘", 0, 0, 1, 1)]},
+            {"name": "page0", "fields": [_ocr_field("하나", 0, 0, 1, 1)]},
+        ]}
+        frames = ocr_client.parse_images(response, ["page0", "page1", "page2"])
+        self.assertEqual([list(frame["Text"]) if frame is not None else None for frame in frames], [["하나"], ["둘"], None])
+        self.assertEqual(list(frames[0].columns), ocr_client.COLUMNS)
+
+        # 이름이 없는 응답은 순서로 대응
+        frames = ocr_client.parse_images({"images": [{"fields": []}]}, ["page0", "page1"])
+        self.assertTrue(frames[0].empty)
+        self.assertIsNone(frames[1])
+
+    def test_prepare_upload_keeps_original_jpeg_and_png(self):
+        for image_format, expected in (("JPEG", "jpg"), ("PNG", "png")):
+            data = _encode((40, 30), image_format)
+            upload, upload_format = ocr_client.prepare_upload(data)
+            self.assertIs(upload, data)
+            self.assertEqual(upload_format, expected)
+
+    def test_prepare_upload_converts_other_formats_and_oversized_images(self):
+        upload, upload_format = ocr_client.prepare_upload(_encode((40, 30), "BMP"))
+        self.assertEqual(upload_format, "jpg")
+        self.assertEqual(ocr_client.detect_format(upload), "jpg")
+
+        data = _encode((40, 30), "PNG")
+        with mock.patch.object(ocr_client, "OCR_MAX_UPLOAD_BYTES", len(data) - 1):
+            upload, upload_format = ocr_client.prepare_upload(data)
+        self.assertEqual((ocr_client.detect_format(upload), upload_format), ("jpg", "jpg"))
+
+    def submit_all(self, batcher, uploads):
+        results = [None] * len(uploads)
+
+        def submit(i):
+            try:
+                results[i] = batcher.submit(uploads[i])
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(uploads))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_batcher_sends_concurrent_pages_in_one_request(self):
+        uploads = [(f"page{i}".encode(), "jpg") for i in range(3)]
+        with mock.patch.object(ocr_client, "_post", side_effect=lambda chunk, *args: [data for data, _ in chunk]) as post:
+            results = self.submit_all(ocr_client.OcrBatcher(max_images=3, wait=5), uploads)
+        post.assert_called_once()
+        self.assertEqual(sorted(post.call_args[0][0]), uploads)
+        self.assertEqual(results, [b"page0", b"page1", b"page2"])
+
+    def test_batcher_passes_request_error_to_every_page(self):
+        error = ocr_client.OcrRequestError(500, "server error")
+        with mock.patch.object(ocr_client, "_post", side_effect=error):
+            results = self.submit_all(ocr_client.OcrBatcher(max_images=2, wait=5), [(b"a", "jpg"), (b"b", "jpg")])
+        self.assertEqual(results, [error, error])
+
+    def test_recognize_returns_none_or_raises_on_request_error(self):
+        data = _encode((40, 30), "JPEG")
+        with mock.patch.object(ocr_client, "_post", side_effect=ocr_client.OcrRequestError(400, "bad request")):
+            self.assertIsNone(ocr_client.recognize(data))
+            with self.assertRaises(ocr_client.OcrRequestError) as context:
+                ocr_client.recognize(data, raise_on_error=True)
+        self.assertEqual(context.exception.status_code, 400)
+
+    def test_recognize_many_chunks_requests_and_keeps_order(self):
+        images = [_encode((40 + i, 30), "JPEG") for i in range(5)]
+
+        def post(chunk, *args):
+            if images[4] in [data for data, _ in chunk]:
+                raise ocr_client.OcrRequestError(503, "unavailable")
+            return [len(data) for data, _ in chunk]
+
+        with mock.patch.object(ocr_client, "OCR_MAX_IMAGES_PER_REQUEST", 2), \
+                mock.patch.object(ocr_client, "_post", side_effect=post) as stub:
+            results = ocr_client.recognize_many(images)
+        self.assertEqual(stub.call_count, 3)
+        self.assertEqual(results, [len(data) for data in images[:4]] + [None])
+
+
+class OcrCacheTests(SimpleTestCase):
+    """ocr_cache: 키 구성, gzip 컬럼 형식 저장/복원, 실패/빈 결과는 저장하지 않음"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        for target, value in [("OCR_CACHE_DIR", self.directory), ("OCR_CACHE_ENABLED", True)]:
+            patcher = mock.patch.object(ocr_cache, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.df = pd.DataFrame(
+            {"Text": ["보증금", "100,000,000원"], "x1": [10, 200], "y1": [20, 20], "x2": [90, 400], "y2": [40, 40]}
+        )
+
+    def test_key_depends_on_image_variant_and_api_url(self):
+        key = ocr_cache.ocr_cache_key(b"image", "contract")
+        self.assertEqual(key, ocr_cache.ocr_cache_key(b"image", "contract"))
+        self.assertEqual(len(key), 64)
+        self.assertNotEqual(key, ocr_cache.ocr_cache_key(b"image", "registry"))
+        self.assertNotEqual(key, ocr_cache.ocr_cache_key(b"other", "contract"))
+        with mock.patch.dict(os.environ, {"OCR_API_URL": "https://other.example.com/ocr"}):
+            self.assertNotEqual(key, ocr_cache.ocr_cache_key(b"image", "contract"))
+
+    def test_round_trip_uses_gzip_columnar_file(self):
+        run_ocr = mock.Mock(return_value=self.df)
+        ocr_cache.cached_ocr(b"image", "contract", run_ocr)
+        cached = ocr_cache.cached_ocr(b"image", "contract", run_ocr)
+
+        run_ocr.assert_called_once()
+        pd.testing.assert_frame_equal(cached, self.df)
+
+        key = ocr_cache.ocr_cache_key(b"image", "contract")
+        path = os.path.join(self.directory, key[:2], f"{key}.json.gz")
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {column: self.df[column].tolist() for column in ocr_cache.COLUMNS})
+
+    def test_failed_or_empty_results_are_not_cached(self):
+        for result in (None, pd.DataFrame(columns=ocr_cache.COLUMNS)):
+            run_ocr = mock.Mock(return_value=result)
+            ocr_cache.cached_ocr(b"image", "contract", run_ocr)
+            ocr_cache.cached_ocr(b"image", "contract", run_ocr)
+            self.assertEqual(run_ocr.call_count, 2)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_corrupt_file_is_treated_as_miss(self):
+        key = ocr_cache.ocr_cache_key(b"image", "contract")
+        os.makedirs(os.path.join(self.directory, key[:2]))
+        with open(os.path.join(self.directory, key[:2], f"{key}.json.gz"), "wb") as f:
+            f.write(b"not gzip")
+        run_ocr = mock.Mock(return_value=self.df)
+        pd.testing.assert_frame_equal(ocr_cache.cached_ocr(b"image", "contract", run_ocr), self.df)
+        run_ocr.assert_called_once()
+
+
+class MetricsTests(SimpleTestCase):
+    """metrics: trace 밖 스팬은 모아서 저장하고, /metrics는 Prometheus 텍스트 형식으로 출력"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for target, value in [
+            ("METRICS_DB_PATH", os.path.join(directory.name, "metrics.sqlite3")),
+            ("METRICS_ENABLED", True),
+            ("_schema_ready", False),
+            ("_pending", []),
+            ("_last_flush", time.monotonic()),
+        ]:
+            patcher = mock.patch.object(metrics, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stored_rows(self):
+        conn = metrics._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM metric_values").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_render_prometheus_text(self):
+        metrics.record([
+            metrics.histogram("jibsin_stage_duration_seconds", {"stage": "clova_ocr"}, 0.3),
+            metrics.histogram("jibsin_stage_duration_seconds", {"stage": "clova_ocr"}, 2.0),
+            metrics.counter("jibsin_gpt_tokens_total", {"site": "contract_extract", "kind": "prompt"}, 1200),
+        ])
+        lines = metrics.render().splitlines()
+
+        self.assertIn("# TYPE jibsin_stage_duration_seconds histogram", lines)
+        self.assertIn('jibsin_stage_duration_seconds_bucket{stage="clova_ocr",le="0.25"} 0', lines)
+        self.assertIn('jibsin_stage_duration_seconds_bucket{stage="clova_ocr",le="0.5"} 1', lines)
+        self.assertIn('jibsin_stage_duration_seconds_bucket{stage="clova_ocr",le="+Inf"} 2', lines)
+        self.assertIn('jibsin_stage_duration_seconds_sum{stage="clova_ocr"} 2.3', lines)
+        self.assertIn('jibsin_stage_duration_seconds_count{stage="clova_ocr"} 2', lines)
+        self.assertIn('jibsin_gpt_tokens_total{kind="prompt",site="contract_extract"} 1200', lines)
+        self.assertIn("# TYPE jibsin_stage_bytes_total counter", lines)
+
+    def test_spans_outside_trace_are_buffered(self):
+        with mock.patch.object(metrics, "_write", wraps=metrics._write) as write:
+            for _ in range(3):
+                with span("image_download") as current:
+                    current.add(bytes_in=100)
+            write.assert_not_called()
+
+            # 다음 trace 저장 시 한 트랜잭션으로 함께 저장
+            with trace("analysis"):
+                pass
+            write.assert_called_once()
+        self.assertIn('jibsin_stage_bytes_total{direction="in",stage="image_download"} 300', metrics.render())
+
+    def test_buffer_is_flushed_by_size_and_render(self):
+        with mock.patch.object(metrics, "METRICS_FLUSH_SIZE", 2):
+            metrics.record([metrics.counter("jibsin_gpt_tokens_total", {"site": "a", "kind": "prompt"}, 1)], buffered=True)
+            self.assertEqual(self.stored_rows(), 0)
+            metrics.record([metrics.counter("jibsin_gpt_tokens_total", {"site": "a", "kind": "prompt"}, 1)], buffered=True)
+            self.assertEqual(self.stored_rows(), 1)
+
+        metrics.record([metrics.counter("jibsin_gpt_tokens_total", {"site": "b", "kind": "prompt"}, 5)], buffered=True)
+        self.assertIn('jibsin_gpt_tokens_total{kind="prompt",site="b"} 5', metrics.render())
+
+    def test_metrics_endpoint(self):
+        metrics.record([metrics.counter("jibsin_stage_bytes_total", {"stage": "clova_ocr", "direction": "out"}, 2048)])
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('jibsin_stage_bytes_total{direction="out",stage="clova_ocr"} 2048', response.content.decode("utf-8"))
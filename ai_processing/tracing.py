@@ -0,0 +1,230 @@
+# 분석 단계별 스팬 (소요 시간, 송수신 바이트, GPT 토큰) 기록
+# pipeline.py, gpt.py, http_client.py, ai_analysis2.py(단계 실행) -> tracing.py(스팬) -> metrics.py(지표 누적)
+#
+# 분석 1회를 trace 하나로 보고, 그 안의 단계(문서 URL 조회, 이미지 다운로드, Clova OCR,
+# 문서별 GPT 추출, 지오코딩, 공시가격 조회, solution, 요약, Firestore 저장)를 스팬으로 기록한다.
+# 현재 스팬은 contextvars에 두므로 run_concurrently로 다른 스레드에서 실행한 단계도
+# 호출한 쪽 스팬의 자식으로 기록된다.
+#
+# trace가 끝나면 스팬 전체를 JSON 한 줄로 출력하고(TRACE_LOG), 단계별 지표를 metrics.py에 누적한다.
+#
+# 스팬 카운터
+#   bytes_out / bytes_in: 외부 호출로 보내고 받은 바이트 (http_client.py 세션에서 기록)
+#   prompt_tokens / completion_tokens: GPT 응답의 usage (gpt.py에서 기록)
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from . import metrics
+
+TRACE_LOG = os.getenv("TRACE_LOG", "true").lower() == "true"  # trace 종료 시 JSON 로그 출력 여부
+
+COUNTER_FIELDS = ("bytes_out", "bytes_in", "prompt_tokens", "completion_tokens")
+
+_current_span = ContextVar("current_span", default=None)
+
+
+class Trace:
+    """분석 1회(요청 1건)에 속한 스팬 목록"""
+
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.spans = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        """
+        끝난 스팬을 추가
+
+        Returns:
+            bool: False면 trace가 이미 끝난 뒤 (시간 초과로 버려진 스레드 등) 끝난 스팬
+        """
+        with self._lock:
+            if self.finished:
+                return False
+            self.spans.append(span)
+            return True
+
+
+class Span:
+    """
+    단계 하나의 실행 기록
+
+    Attributes:
+        name (str): 단계 이름 (지표의 stage 라벨)
+        attributes (dict): 문서 타입, 호출 위치 등 부가 정보
+        counters (dict): bytes_out, bytes_in, prompt_tokens, completion_tokens
+    """
+
+    def __init__(self, name, trace, parent=None, attributes=None):
+        self.name = name
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes or {})
+        self.counters = dict.fromkeys(COUNTER_FIELDS, 0)
+        self.started_at = time.time()
+        self.duration = None
+        self.error = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def set(self, **attributes):
+        """부가 정보 추가"""
+        self.attributes.update(attributes)
+
+    def add(self, **counts):
+        """카운터 증가 (예: add(bytes_in=1024))"""
+        with self._lock:
+            for field, amount in counts.items():
+                self.counters[field] += amount or 0
+
+    def to_dict(self):
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.started_at, 3),
+            "duration_ms": round(self.duration * 1000, 1),
+            **{field: value for field, value in self.counters.items() if value},
+            **({"attributes": self.attributes} if self.attributes else {}),
+            **({"error": self.error} if self.error else {}),
+        }
+
+
+def current_span():
+    """현재 실행 중인 스팬 (trace 밖이면 None)"""
+    return _current_span.get()
+
+
+def add_counts(**counts):
+    """현재 스팬의 카운터 증가 (trace 밖이면 무시)"""
+    span = _current_span.get()
+    if span is not None:
+        span.add(**counts)
+
+
+def _observations(spans):
+    """스팬 목록을 단계별 지표 관측값으로 변환"""
+    observations = []
+    for span in spans:
+        observations.append(metrics.histogram("jibsin_stage_duration_seconds", {"stage": span.name}, span.duration))
+        for direction in ("out", "in"):
+            if span.counters[f"bytes_{direction}"]:
+                observations.append(metrics.counter(
+                    "jibsin_stage_bytes_total", {"stage": span.name, "direction": direction},
+                    span.counters[f"bytes_{direction}"]
+                ))
+        for kind in ("prompt", "completion"):
+            if span.counters[f"{kind}_tokens"]:
+                observations.append(metrics.counter(
+                    "jibsin_gpt_tokens_total", {"site": span.attributes.get("site", span.name), "kind": kind},
+                    span.counters[f"{kind}_tokens"]
+                ))
+    return observations
+
+
+def summarize(spans):
+    """
+    단계 이름별 호출 수, 소요 시간 합계/최대, 카운터 합계
+
+    Returns:
+        dict: {단계 이름: {"count", "total_ms", "max_ms", 카운터...}}
+    """
+    stages = {}
+    for span in spans:
+        stage = stages.setdefault(span.name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        duration_ms = span.duration * 1000
+        stage["count"] += 1
+        stage["total_ms"] = round(stage["total_ms"] + duration_ms, 1)
+        stage["max_ms"] = round(max(stage["max_ms"], duration_ms), 1)
+        for field, value in span.counters.items():
+            if value:
+                stage[field] = stage.get(field, 0) + value
+    return stages
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    단계 하나를 스팬으로 기록하는 컨텍스트 매니저
+
+    trace 안에서는 현재 스팬의 자식으로 기록되고, trace 밖에서 호출되면
+    지표만 기록한다 (로그는 남기지 않고, metrics.py가 모아서 저장).
+
+    Args:
+        name (str): 단계 이름
+        **attributes: 부가 정보 (문서 타입, 호출 위치 등)
+
+    Yields:
+        Span: 카운터/부가 정보를 추가할 수 있는 스팬
+    """
+    parent = _current_span.get()
+    current = Span(name, parent.trace if parent is not None else None, parent, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.duration = time.perf_counter() - current._start
+        if current.trace is None or not current.trace.add(current):
+            # trace 밖의 스팬은 호출마다 쓰지 않고 모아서 저장
+            metrics.record(_observations([current]), buffered=True)
+
+
+@contextmanager
+def trace(name, trace_id=None, **attributes):
+    """
+    분석 1회를 trace로 기록하는 컨텍스트 매니저 (최상위 스팬 생성)
+
+    종료 시 스팬 전체를 JSON 한 줄로 출력하고 단계별 지표를 한 번에 저장한다.
+
+    Args:
+        name (str): 최상위 단계 이름 (예: "analysis")
+        trace_id (str): trace ID (작업 ID 등). 없으면 새로 생성
+        **attributes: 사용자 ID, 계약 ID 등
+
+    Yields:
+        Span: 최상위 스팬
+    """
+    current_trace = Trace(trace_id or uuid.uuid4().hex)
+    root = Span(name, current_trace, None, attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        root.duration = time.perf_counter() - root._start
+        with current_trace._lock:
+            current_trace.finished = True
+            spans = [root] + current_trace.spans
+        metrics.record(_observations(spans))
+        if TRACE_LOG:
+            _log_trace(current_trace, root, spans)
+
+
+def _log_trace(current_trace, root, spans):
+    totals = {field: sum(span.counters[field] for span in spans) for field in COUNTER_FIELDS}
+    record = {
+        "event": "trace",
+        "trace_id": current_trace.trace_id,
+        "name": root.name,
+        "duration_ms": round(root.duration * 1000, 1),
+        **({"attributes": root.attributes} if root.attributes else {}),
+        **({"error": root.error} if root.error else {}),
+        "totals": totals,
+        "stages": summarize(spans[1:]),
+        "spans": [span.to_dict() for span in sorted(spans[1:], key=lambda span: span.started_at)],
+    }
+    print(json.dumps(record, ensure_ascii=False, default=str), flush=True)
@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import run_ocr, test_ai, start_ai_analysis
+from .views import run_ocr, test_ai, start_ai_analysis, analysis_status, analysis_events
 
 urlpatterns = [
     path("start_analysis/", start_ai_analysis, name="start_ai_analysis"),
+    path("analysis_status/<str:job_id>/", analysis_status, name="analysis_status"),
+    path("analysis_events/<str:job_id>/", analysis_events, name="analysis_events"),
     path('run_ocr/', run_ocr, name='run_ocr'),
     path("test/", test_ai, name="test_ai"),
 ]
@@ -1,10 +1,57 @@
 import base64
-import openai
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 def read_file(file_path):
     with open(file_path, "r", encoding="utf-8") as file:
         return file.read()
 
+def run_concurrently(func, items, max_workers, timeout=None):
+    """
+    items의 각 요소에 func를 스레드 풀에서 동시에 실행하는 함수
+
+    Args:
+        func (callable): 각 요소에 실행할 함수
+        items (list): 입력 리스트
+        max_workers (int): 최대 동시 실행 수 (1 이하이면 순차 실행)
+        timeout (float): 전체 대기 시간(초). 넘기면 끝나지 않은 요소는 TimeoutError로 처리 (동시 실행 시에만 적용)
+
+    Returns:
+        list: 입력 순서대로 정렬된 (결과, 예외) 튜플 리스트. 성공 시 예외는 None
+    """
+    def call(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [call(item) for item in items]
+
+    def submit(executor, item):
+        # 호출한 스레드의 contextvars(현재 스팬 등)를 요소마다 복사해 작업 스레드에서 사용
+        return executor.submit(contextvars.copy_context().run, call, item)
+
+    if timeout is None:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+            futures = [submit(executor, item) for item in items]
+            return [future.result() for future in futures]
+
+    # 시간 초과된 작업을 기다리지 않도록 with 대신 직접 종료 (남은 스레드는 끝나는 대로 정리됨)
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
+    deadline = time.monotonic() + timeout
+    futures = [submit(executor, item) for item in items]
+    outcomes = []
+    for future in futures:
+        try:
+            outcomes.append(future.result(timeout=max(0, deadline - time.monotonic())))
+        except FutureTimeoutError:
+            outcomes.append((None, TimeoutError(f"{timeout}초 안에 완료되지 않았습니다")))
+    executor.shutdown(wait=False, cancel_futures=True)
+    return outcomes
+
 def process_image(client, image_path, model, df):
     """이미지 OCR 및 분석"""
     content = read_file("data/p_1.txt")
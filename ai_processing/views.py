@@ -1,25 +1,28 @@
-from django.http import JsonResponse
+import asyncio
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from django.urls import reverse
 import json
-from firebase_admin import firestore
-from typing import Dict, Optional
-from datetime import datetime, timezone
 from .registry_ocr import registry_keyword_ocr
 from .contract_ocr import contract_keyword_ocr
 from .building_ocr import building_keyword_ocr
-from firebase_api.views import fetch_latest_documents
 from firebase_api.utils import (
-    get_latest_analysis_results,
-    save_combined_results,
+    build_ocr_page_records,
+    get_classified_document_urls,
+    get_ocr_results,
     save_analysis_result,
-    save_ocr_result_to_firestore,
+    save_ocr_results_batch,
     update_analysis_status
 )
 from .validation import validate_documents
+from .jobs import enqueue_analysis, get_job
+from .pipeline import document_url_cache
+from .events import stream_job_events
+from .metrics import render as render_metrics
+from .image_store import ImageStore
 import traceback
 #from .ai_analysis import (clean_json, remove_bounding_boxes, restore_bounding_boxes, adjust_owner_count, building, price, generate_and_save_summary)
-from .ai_analysis2 import (analyze_contract_data, remove_bounding_boxes, restore_bounding_boxes, adjust_owner_count, building, price, generate_and_save_summary)
 
 
 @csrf_exempt
@@ -50,22 +53,10 @@ def run_ocr(request):
                 "error": f"필수 파라미터가 누락되었습니다: {', '.join(missing_params)}"
             }, status=400)
         
-        # fetch_latest_documents 호출을 위한 request 객체 수정
-        request.GET = request.GET.copy()
-        request.GET['user_id'] = user_id
-        request.GET['contract_id'] = contract_id
-
-        response = fetch_latest_documents(request)
-        
-        # 디버깅을 위한 로그 추가
-        print("fetch_latest_documents response:", response.content)
-        try:
-            response_data = json.loads(response.content)
-            if 'classified_documents' not in response_data:
-                return JsonResponse({"error": "문서 URL을 찾을 수 없습니다"}, status=404)
-            document_urls = response_data['classified_documents']
-        except json.JSONDecodeError as e:
-            return JsonResponse({"error": f"응답 파싱 실패: {str(e)}"}, status=500)
+        # 문서 타입별 URL 조회
+        document_urls = get_classified_document_urls(user_id, contract_id, cache=document_url_cache)
+        if document_urls is None:
+            return JsonResponse({"error": "문서 URL을 찾을 수 없습니다"}, status=404)
         
         # 요청된 문서 타입의 URL 확인
         if document_type not in document_urls or not document_urls[document_type]:
@@ -103,42 +94,10 @@ def run_ocr(request):
         if not result:
             return JsonResponse({"error": "OCR 처리 실패"}, status=500)
 
-        # OCR 결과 저장
-        if result:
-            for page_number, page_result in result.items():
-                page_num = int(page_number.replace('page', ''))
-                
-                # 해당 페이지의 URL 찾기
-                page_url = next(
-                    (url for url in document_urls[document_type] 
-                     if f"page{page_num}" in url),
-                    None
-                )
-                
-                current_time = datetime.now(timezone.utc)
-
-                # 저장할 데이터 구조화
-                save_data = {
-                "pageNumber": page_num,
-                "document_type": document_type,
-                "userId": user_id,
-                "status": "completed",
-                "createdAt": current_time,  # UTC 시간 사용
-                "updatedAt": current_time,
-                "imageUrl": page_url,
-                "ocr_result": page_result
-                }
-                
-                save_success = save_ocr_result_to_firestore(
-                    user_id=user_id,
-                    contract_id=contract_id,
-                    document_type=document_type,
-                    page_number=page_num,
-                    json_data=save_data
-                )
-
-                if not save_success:
-                    return JsonResponse({"error": f"OCR 결과 저장 실패 (페이지 {page_num})"}, status=500)
+        # OCR 결과 저장 (모든 페이지를 배치 한 번으로)
+        page_records = {document_type: build_ocr_page_records(user_id, document_type, result, document_urls[document_type])}
+        if not save_ocr_results_batch(user_id, contract_id, page_records):
+            return JsonResponse({"error": "OCR 결과 저장 실패"}, status=500)
             
         return JsonResponse({
             "status": "success",
@@ -181,35 +140,23 @@ def start_analysis(request):
         update_analysis_status(user_id, contract_id, "processing")
 
         # 1. 최신 문서 URL 가져오기
-        request.GET = request.GET.copy()
-        request.GET['user_id'] = user_id
-        request.GET['contract_id'] = contract_id
-
         print("Fetching document URLs...")
-        response = fetch_latest_documents(request)
-        print(f"fetch_latest_documents response: {response.content}")
-        try:
-            response_data = json.loads(response.content)
-            if 'classified_documents' not in response_data:
-                print("No classified_documents found in response")
-                update_analysis_status(user_id, contract_id, "failed")
-                return JsonResponse({"error": "문서 URL을 찾을 수 없습니다"}, status=404)
-            document_urls = response_data['classified_documents']
-            print(f"Found document URLs: {document_urls}")
+        document_urls = get_classified_document_urls(user_id, contract_id, cache=document_url_cache)
+        if document_urls is None:
+            print("Contract document not found")
+            update_analysis_status(user_id, contract_id, "failed")
+            return JsonResponse({"error": "문서 URL을 찾을 수 없습니다"}, status=404)
+        print(f"Found document URLs: {document_urls}")
 
-            # URL이 하나도 없는지 확인
-            if not any(urls for urls in document_urls.values()):
-                print("No document URLs found for any type")
-                update_analysis_status(user_id, contract_id, "failed")
-                return JsonResponse({"error": "문서를 찾을 수 없습니다"}, status=404)
-                                    
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
+        # URL이 하나도 없는지 확인
+        if not any(urls for urls in document_urls.values()):
+            print("No document URLs found for any type")
             update_analysis_status(user_id, contract_id, "failed")
-            return JsonResponse({"error": f"응답 파싱 실패: {str(e)}"}, status=500)
+            return JsonResponse({"error": "문서를 찾을 수 없습니다"}, status=404)
 
         # 2. 각 문서 타입별 OCR 실행
         ocr_results = {}
+        page_records = {}
         document_types = ["registry_document", "contract", "building_registry"]
         
         for doc_type in document_types:
@@ -238,43 +185,11 @@ def start_analysis(request):
                 traceback.print_exc() 
                 continue
 
-            # OCR 결과 저장
-            for page_number, page_result in result.items():
-                page_num = int(page_number.replace('page', ''))
-                page_url = next(
-                    (url for url in document_urls[doc_type] 
-                     if f"page{page_num}" in url),
-                    None
-                )
-                
-                save_data = {
-                    "pageNumber": page_num,
-                    "document_type": doc_type,
-                    "userId": user_id,
-                    "status": "completed",
-                    "createdAt": datetime.now(timezone.utc),
-                    "updatedAt": datetime.now(timezone.utc),
-                    "imageUrl": page_url,
-                    "ocr_result": page_result
-                }
-                
-                save_success = save_ocr_result_to_firestore(
-                    user_id=user_id,
-                    contract_id=contract_id,
-                    document_type=doc_type,
-                    page_number=page_num,
-                    json_data=save_data
-                )
-
-                if not save_success:
-                    update_analysis_status(user_id, contract_id, "failed")
-                    return JsonResponse({
-                        "error": f"OCR 결과 저장 실패 (문서: {doc_type}, 페이지: {page_num})"
-                    }, status=500)
-
+            # 페이지별 저장 데이터 (아래에서 통합 결과와 함께 한 번에 저장)
+            page_records[doc_type] = build_ocr_page_records(user_id, doc_type, result, document_urls[doc_type])
             ocr_results[doc_type] = result
         
-        # OCR 결과 전체 저장
+        # OCR 결과 저장 (페이지별 결과 + 통합 결과를 배치 한 번으로)
         if ocr_results:
             combined_result = {
                 "document_type": "combined",
@@ -283,17 +198,16 @@ def start_analysis(request):
                 "analysisStatus": "completed"
             }
             
-            # 통합 OCR 결과 저장
-            save_combined_results(user_id, contract_id, combined_result)
+            if not save_ocr_results_batch(user_id, contract_id, page_records, combined_result):
+                update_analysis_status(user_id, contract_id, "failed")
+                return JsonResponse({"error": "OCR 결과 저장 실패"}, status=500)
 
         # 3. AI 분석 실행
         try:
-            # OCR 결과 가져오기
-            contract_results = get_latest_analysis_results(user_id, contract_id, "contract")
-            building_results = get_latest_analysis_results(user_id, contract_id, "building_registry")
-            registry_results = get_latest_analysis_results(user_id, contract_id, "registry_document")
+            # OCR 결과 가져오기 (이번에 OCR한 문서는 메모리 결과 사용, 없는 문서만 Firestore 조회)
+            analysis_inputs = get_ocr_results(user_id, contract_id, document_types, known_results=ocr_results)
 
-            if not all([contract_results, building_results, registry_results]):
+            if not all(analysis_inputs.get(doc_type) for doc_type in document_types):
                 update_analysis_status(user_id, contract_id, "failed")
                 return JsonResponse({
                     'success': False,
@@ -302,16 +216,16 @@ def start_analysis(request):
 
             # 데이터 통합
             merged_data = {
-                "contract": contract_results.get("contract", {}), # 계약서
-                "building_registry": building_results.get("building_registry", {}), #건축물대장
-                "registry_document": registry_results.get("registry_document", {}) #등기부 등본
+                "contract": analysis_inputs["contract"], # 계약서
+                "building_registry": analysis_inputs["building_registry"], #건축물대장
+                "registry_document": analysis_inputs["registry_document"] #등기부 등본
             }
 
             # 문서 검증 수행
             analysis_result = validate_documents(merged_data)
             
             # AI 분석 결과 저장
-            save_analysis_result(user_id, contract_id, analysis_result, image_urls=document_urls)
+            save_analysis_result(user_id, contract_id, analysis_result, image_urls=document_urls, image_store=ImageStore())
             
             # 분석 완료 상태 업데이트
             update_analysis_status(user_id, contract_id, "completed")
@@ -348,10 +262,9 @@ def test_ai(request):
 @require_http_methods(["POST"])
 def start_ai_analysis(request):
     """
-    통합 분석 프로세스 실행
-    1. 문서 URL 가져오기
-    2. OCR 실행
-    3. AI 분석 실행
+    통합 분석 작업 등록 엔드포인트
+    문서 URL 조회 → OCR → AI 분석은 백그라운드 워커에서 실행되며,
+    진행 상황은 analysis_status 엔드포인트로 조회한다.
     """
     try:
         print("Starting analysis process...")
@@ -367,262 +280,121 @@ def start_ai_analysis(request):
                 'message': '사용자 ID와 계약 ID가 필요합니다.'
             }, status=400)
 
-        # 상태 업데이트: 분석 시작
-        update_analysis_status(user_id, contract_id, "processing")
-
-        # 1. 최신 문서 URL 가져오기
-        request.GET = request.GET.copy()
-        request.GET['user_id'] = user_id
-        request.GET['contract_id'] = contract_id
-
-        print("Fetching document URLs...")
-        response = fetch_latest_documents(request)
-        print(f"fetch_latest_documents response: {response.content}")
-        
-        try:
-            response_data = json.loads(response.content)
-            if 'classified_documents' not in response_data:
-                print("No classified_documents found in response")
-                update_analysis_status(user_id, contract_id, "failed")
-                return JsonResponse({"error": "문서 URL을 찾을 수 없습니다"}, status=404)
-            document_urls = response_data['classified_documents']
-            print(f"Found document URLs: {document_urls}")
-
-            # URL이 하나도 없는지 확인
-            if not any(urls for urls in document_urls.values()):
-                print("No document URLs found for any type")
-                update_analysis_status(user_id, contract_id, "failed")
-                return JsonResponse({"error": "문서를 찾을 수 없습니다"}, status=404)
-                                    
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
-            update_analysis_status(user_id, contract_id, "failed")
-            return JsonResponse({"error": f"응답 파싱 실패: {str(e)}"}, status=500)
+        job_id = enqueue_analysis(user_id, contract_id)
 
-        # 2. 각 문서 타입별 OCR 실행
-        ocr_results = {}
-        document_types = ["registry_document", "contract", "building_registry"]
-        
-        for doc_type in document_types:
-            try:    
-                if doc_type not in document_urls or not document_urls[doc_type]:
-                    print(f"Warning: {doc_type} URL not found")
-                    continue
-
-                # OCR 실행
-                if doc_type == "registry_document":
-                    result = registry_keyword_ocr(document_urls[doc_type], doc_type, user_id, contract_id)
-                elif doc_type == "contract":
-                    result = contract_keyword_ocr(document_urls[doc_type], doc_type, user_id, contract_id)
-                elif doc_type == "building_registry":
-                    result = building_keyword_ocr(document_urls[doc_type], doc_type, user_id, contract_id)
-
-                print(f"OCR Result for {doc_type}: {result}") 
-                
-                if not result:
-                    update_analysis_status(user_id, contract_id, "failed")
-                    return JsonResponse({
-                        "error": f"{doc_type} OCR 처리 실패"
-                    }, status=500)
-            except Exception as ocr_error: 
-                print(f"OCR 처리 중 오류 발생 - {doc_type}: {str(ocr_error)}")
-                traceback.print_exc() 
-                continue
-
-            # OCR 결과 저장
-            for page_number, page_result in result.items():
-                page_num = int(page_number.replace('page', ''))
-                page_url = next(
-                    (url for url in document_urls[doc_type] 
-                     if f"page{page_num}" in url),
-                    None
-                )
-                
-                save_data = {
-                    "pageNumber": page_num,
-                    "document_type": doc_type,
-                    "userId": user_id,
-                    "status": "completed",
-                    "createdAt": datetime.now(timezone.utc),
-                    "updatedAt": datetime.now(timezone.utc),
-                    "imageUrl": page_url,
-                    "ocr_result": page_result
-                }
-                
-                save_success = save_ocr_result_to_firestore(
-                    user_id=user_id,
-                    contract_id=contract_id,
-                    document_type=doc_type,
-                    page_number=page_num,
-                    json_data=save_data
-                )
-
-                if not save_success:
-                    update_analysis_status(user_id, contract_id, "failed")
-                    return JsonResponse({
-                        "error": f"OCR 결과 저장 실패 (문서: {doc_type}, 페이지: {page_num})"
-                    }, status=500)
-
-            ocr_results[doc_type] = result
-        
-        # OCR 결과 전체 저장
-        if ocr_results:
-            combined_result = {
-                "document_type": "combined",
-                "userId": user_id,
-                "results": ocr_results,
-                "analysisStatus": "completed"
-            }
-            
-            # 통합 OCR 결과 저장
-            save_combined_results(user_id, contract_id, combined_result)
-
-        # 3. AI 분석 실행
-        try:
-            # OCR 결과 가져오기
-            contract_results = get_latest_analysis_results(user_id, contract_id, "contract")
-            building_results = get_latest_analysis_results(user_id, contract_id, "building_registry")
-            registry_results = get_latest_analysis_results(user_id, contract_id, "registry_document")
-
-            if not all([contract_results, building_results, registry_results]):
-                update_analysis_status(user_id, contract_id, "failed")
-                return JsonResponse({
-                    'success': False,
-                    'message': 'OCR 결과를 찾을 수 없습니다.'
-                }, status=404)
-
-    
-            merged_data = {
-                "contract": contract_results.get("contract", {}),
-                "building_registry": building_results.get("building_registry", {}),
-                "registry_document": registry_results.get("registry_document", {})
-            }
-            # 소유자 수 조정
-            merged_data = adjust_owner_count(
-            merged_data["building_registry"],
-            merged_data["registry_document"],
-            merged_data 
-            )
-
-            # Bounding Box 제거 및 저장
-            bounding_boxes = remove_bounding_boxes(merged_data)
-            
-            # 주소 일치 여부 확인 (새 building 함수로 변경)
-            try:
-                res_1, used_keys = building(merged_data)
-            except ValueError:  # 기존 함수가 값만 반환하는 경우를 대비
-                res_1 = building(merged_data)
-                used_keys = []
-
-            # 공시가격 조회
-            if res_1 != "nan":
-                try:
-                    res = price(res_1)
-                    cost = int(res['공시가격'])
-                except (ValueError, TypeError, KeyError):
-                    cost = 'nan'
-                    print("공시가격 조회 실패")
-            else:
-                cost = 'nan'
-                print("주소 불일치로 공시가격 조회 불가")
-
-            # AI 분석 실행
-            analysis_result = analyze_contract_data(merged_data, res_1, cost)
-
-            # 디버깅: 분석 결과 출력
-            print("📌 AI 분석 결과:", analysis_result)
-
-            # Bounding Box 복원
-            analysis_result = restore_bounding_boxes(analysis_result, bounding_boxes)
-            
-            # AI 분석 결과 저장
-            save_analysis_result(user_id, contract_id, analysis_result, image_urls=document_urls)
-
-            # 여기에 요약 생성 및 저장 로직 추가
-            try:
-                # 분석 결과 요약 생성 및 저장
-                summary_result = generate_and_save_summary(analysis_result, user_id, contract_id)
-                print(f"✅ 계약 요약 생성 및 저장 완료: {user_id}/{contract_id}")
-            except Exception as summary_error:
-                print(f"⚠️ 요약 생성 중 오류 발생 (분석은 계속 진행됨): {str(summary_error)}")
-                traceback.print_exc()
-        
-            
-            # 분석 완료 상태 업데이트
-            update_analysis_status(user_id, contract_id, "completed")
-
-            return JsonResponse({
-                'success': True,
-                'message': '문서 분석이 완료되었습니다.',
-                'data': analysis_result
-            })
-
-        except Exception as e:
-            print(f"AI 분석 중 오류 발생: {str(e)}")
-            update_analysis_status(user_id, contract_id, "failed")
-            return JsonResponse({
-                'success': False,
-                'message': f'AI 분석 중 오류가 발생했습니다: {str(e)}'
-            }, status=500)
+        return JsonResponse({
+            'success': True,
+            'message': '문서 분석이 시작되었습니다.',
+            'job_id': job_id,
+            'status_url': reverse("analysis_status", args=[job_id]),
+            'events_url': reverse("analysis_events", args=[job_id])
+        }, status=202)
 
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "잘못된 JSON 형식입니다"}, status=400)
     except Exception as e:
-        print(f"전체 분석 과정 중 오류 발생: {str(e)}")
+        print(f"분석 작업 등록 중 오류 발생: {str(e)}")
         traceback.print_exc()
-        if user_id and contract_id:
-            update_analysis_status(user_id, contract_id, "failed")
-        
         return JsonResponse({
             'success': False,
             'message': f'분석 처리 중 오류가 발생했습니다: {str(e)}'
         }, status=500)
 
+async def analysis_events(request, job_id):
+    """
+    분석 작업 진행 이벤트 스트리밍 엔드포인트 (Server-Sent Events, ASGI 서버에서 사용)
 
+    단계 시작(stage)과 중간 결과(ocr_done, page_extracted, geocoding_done, price_done, solution_done)를
+    발생하는 대로 전송하고, 작업이 끝나면 result 이벤트를 보낸 뒤 종료한다.
+    재연결 시 Last-Event-ID 헤더(또는 last_event_id 쿼리)의 이후 이벤트부터 전송한다.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
 
-# @csrf_exempt
-# @require_http_methods(["POST"])
-# def fake_start_analysis(request):
-    """AI 분석 엔드포인트"""
+    if await asyncio.to_thread(get_job, job_id) is None:
+        return JsonResponse({"error": "분석 작업을 찾을 수 없습니다"}, status=404)
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id") or "0"
     try:
-        data = json.loads(request.body)
-        user_id = data.get('user_id')
-        contract_id = data.get('contract_id')
+        last_event_id = int(last_event_id)
+    except ValueError:
+        last_event_id = 0
 
-        if not all([user_id, contract_id]):
-            return JsonResponse({
-                "error": "필수 파라미터가 누락되었습니다"
-            }, status=400)
+    response = StreamingHttpResponse(stream_job_events(job_id, last_event_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx 등 프록시 버퍼링 방지
+    return response
 
-        # OCR 결과 가져오기
-        results = get_latest_analysis_results(user_id, contract_id, "building_registry")
-        
-        if not results:
-            return JsonResponse({
-                "error": "OCR 결과를 찾을 수 없습니다"
-            }, status=404)
+@require_http_methods(["GET"])
+def metrics(request):
+    """
+    Prometheus 지표 엔드포인트
 
-        # 저장할 데이터 구조화 - combined_data가 아닌 results를 직접 저장
-        save_success = save_combined_results(
-            user_id=user_id,
-            contract_id=contract_id,
-            combined_data=results  # 이미 적절한 구조를 가진 results를 직접 저장
-        )
+    단계별 소요 시간 히스토그램, 송수신 바이트, GPT 토큰 수 (모든 워커 프로세스 누적)
+    """
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
-        if not save_success:
-            return JsonResponse({
-                "error": "분석 결과 저장 실패"
-            }, status=500)
+@require_http_methods(["GET"])
+def analysis_status(request, job_id):
+    """
+    분석 작업 진행 상황 조회 엔드포인트
 
-        return JsonResponse({
-            "status": "success",
-            "message": "OCR 결과 통합 완료",
-            "data": results
-        })
+    status: queued / running / completed / failed
+    stage: 현재 단계 (fetch_documents, ocr, save_ocr, ai_analysis, summary ...)
+    result: 작업 종료 시 기존 start_analysis 응답과 같은 형식의 결과
+    """
+    job = get_job(job_id)
+    if not job:
+        return JsonResponse({"error": "분석 작업을 찾을 수 없습니다"}, status=404)
+    return JsonResponse(job)
 
-    except json.JSONDecodeError:
-        return JsonResponse({
-            "error": "잘못된 JSON 형식입니다"
-        }, status=400)
-    except Exception as e:
-        return JsonResponse({
-            "error": str(e)
-        }, status=500)
\ No newline at end of file
+
+
+# @csrf_exempt
+# @require_http_methods(["POST"])
+# def fake_start_analysis(request):
+#     """AI 분석 엔드포인트"""
+#     try:
+#         data = json.loads(request.body)
+#         user_id = data.get('user_id')
+#         contract_id = data.get('contract_id')
+
+#         if not all([user_id, contract_id]):
+#             return JsonResponse({
+#                 "error": "필수 파라미터가 누락되었습니다"
+#             }, status=400)
+
+#         # OCR 결과 가져오기
+#         results = get_latest_analysis_results(user_id, contract_id, "building_registry")
+        
+#         if not results:
+#             return JsonResponse({
+#                 "error": "OCR 결과를 찾을 수 없습니다"
+#             }, status=404)
+
+#         # 저장할 데이터 구조화 - combined_data가 아닌 results를 직접 저장
+#         save_success = save_combined_results(
+#             user_id=user_id,
+#             contract_id=contract_id,
+#             combined_data=results  # 이미 적절한 구조를 가진 results를 직접 저장
+#         )
+
+#         if not save_success:
+#             return JsonResponse({
+#                 "error": "분석 결과 저장 실패"
+#             }, status=500)
+
+#         return JsonResponse({
+#             "status": "success",
+#             "message": "OCR 결과 통합 완료",
+#             "data": results
+#         })
+
+#     except json.JSONDecodeError:
+#         return JsonResponse({
+#             "error": "잘못된 JSON 형식입니다"
+#         }, status=400)
+#     except Exception as e:
+#         return JsonResponse({
+#             "error": str(e)
+#         }, status=500)
\ No newline at end of file
@@ -0,0 +1,98 @@
+# 로컬 Clova OCR 대역 서버 (실제 HTTP 요청으로 ocr_client를 확인할 때 사용)
+# python benchmarks/ocr_stub_server.py [--port 8089] [--latency-scale 1.0]
+# ocr_client.py(Clova OCR 호출) -> ocr_stub_server.py(HTTP) -> stand_ins.py(StandIns.ocr_response)
+#
+# offline.py는 세션에 어댑터를 mount해 네트워크 없이 실행하지만, 이 서버는 실제 소켓으로 요청을 받으므로
+# 연결 재사용, 타임아웃, multipart 인코딩까지 실제와 같은 경로를 탄다.
+# 응답은 stand_ins.py와 같다 (이미지 크기로 문서 타입/페이지를 알아내 해당 페이지 OCR 결과를 반환).
+# 서비스 쪽에서는 OCR_API_URL=http://127.0.0.1:8089/ocr 로 지정한다.
+# 대역 페이지 이미지는 GET /{문서 타입}/page{n}.jpg 로 받을 수 있다.
+
+import argparse
+import os
+import re
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class OcrStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive (http_client 세션의 연결 재사용 확인용)
+    stand_ins = None
+    documents = frozenset()
+
+    def _send(self, status, headers, body):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._send(*self.stand_ins.ocr_response(self.headers.get("Content-Type", ""), body))
+
+    def do_GET(self):
+        match = re.fullmatch(r"/(\w+)/page(\d+)\.jpg", self.path)
+        if not match or match.group(1) not in self.documents:
+            self._send(404, {"Content-Type": "text/plain"}, b"not found")
+            return
+        self._send(200, {"Content-Type": "image/jpeg"}, self.stand_ins.page(match.group(1), int(match.group(2)))["image"])
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(host="127.0.0.1", port=8089, latency_scale=1.0, verbose=False):
+    """
+    OCR 대역 서버 생성 (serve_forever()는 호출한 쪽에서 실행)
+
+    Args:
+        host (str): 바인드 주소
+        port (int): 포트 (0이면 빈 포트)
+        latency_scale (float): 주입 지연 배율 (0이면 지연 없음)
+        verbose (bool): 요청 로그 출력 여부
+
+    Returns:
+        ThreadingHTTPServer: 서버 (server.server_address로 실제 주소 확인)
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "jibsinpj.settings")
+    # stand_ins가 import하는 문서 모듈이 import 시점에 OpenAI 클라이언트를 만들므로 키가 없으면 임시 값 사용
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    import django
+    django.setup()
+    from benchmarks.stand_ins import DOCUMENT_CODES, Latency, StandIns
+
+    stand_ins = StandIns(Latency(scale=latency_scale))
+    handler = type("Handler", (OcrStubHandler,), {"stand_ins": stand_ins, "documents": frozenset(DOCUMENT_CODES)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 Clova OCR 대역 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="주입 지연 배율 (0이면 지연 없음)")
+    parser.add_argument("--verbose", action="store_true", help="요청 로그 출력")
+    args = parser.parse_args()
+
+    sys.path.insert(0, PROJECT_DIR)
+    server = create_server(args.host, args.port, args.latency_scale, args.verbose)
+    host, port = server.server_address[:2]
+    print(f"✅ OCR 대역 서버 실행: http://{host}:{port}/ocr (Ctrl+C로 종료)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+# 오프라인 end-to-end 벤치마크 (외부 서비스는 기록된 응답 + 지연 주입으로 대체)
+# python benchmarks/offline.py [--scenarios analysis,ocr,price,visualize] [--pages 1,3,5] [--concurrency 1,4,8]
+# offline.py(조합별 자식 프로세스) -> stand_ins.py(외부 서비스 대역) -> views.py, pipeline.py, ai_analysis2.py, visualize_boxes.py
+#
+# 네트워크, 인증 키 없이 실제 코드 경로를 그대로 실행한다.
+# Clova OCR, OpenAI, 네이버 지오코딩, 문서 이미지/공시가격 CSV 다운로드, Firestore, Storage 업로드만
+# stand_ins.py의 대역으로 바꾸고, 대역마다 실제와 비슷한 지연을 넣는다 (--latency-scale로 조절).
+#
+# 시나리오
+#   analysis: start_ai_analysis 요청 → 작업 큐 워커에서 분석 완료까지 (작업 등록~종료 시간)
+#   ocr: run_ocr 요청 (문서 타입별로 ocr.contract, ocr.registry_document, ocr.building_registry)
+#   price: ai_analysis2.price(주소) (--price-source store면 SQLite 저장소, csv면 매번 CSV 다운로드)
+#   visualize: visualize_bounding_boxes_and_upload (OCR 결과는 미리 저장해 둠)
+#
+# (시나리오, 페이지 수, 동시 요청 수) 조합마다 새 자식 프로세스에서 실행해 조합별 최대 RSS를 잰다.
+# 부하는 동시 요청 수만큼의 클라이언트 스레드가 응답을 받으면 바로 다음 요청을 보내는 방식이다.
+# 기본은 캐시를 모두 끈 상태이고, --warm-caches를 주면 캐시를 켜고 한 번 실행한 뒤 측정한다.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DOCUMENT_TYPES = ["contract", "registry_document", "building_registry"]
+SCENARIOS = ["analysis", "ocr", "price", "visualize"]
+USER_ID = "bench"
+JOB_POLL_SECONDS = 0.02
+
+
+def child_env(config, workdir):
+    """자식 프로세스 환경 변수 (설정 모듈이 import 시점에 읽는 값들)"""
+    env = dict(os.environ)
+    env.update({
+        "DJANGO_SETTINGS_MODULE": "jibsinpj.settings",
+        "PYTHONPATH": os.pathsep.join(filter(None, [PROJECT_DIR, os.environ.get("PYTHONPATH")])),
+        "ANALYSIS_JOB_DB": os.path.join(workdir, "analysis_jobs.sqlite3"),
+        "ANALYSIS_JOB_WORKERS": str(config["concurrency"]),
+        "ANALYSIS_JOB_POLL_INTERVAL": "0.05",
+        "METRICS_DB": os.path.join(workdir, "metrics.sqlite3"),
+        "PUBLIC_PRICE_DB": os.path.join(workdir, "public_prices.sqlite3"),
+        "OCR_CACHE_DIR": os.path.join(workdir, "ocr_cache"),
+        "GPT_CACHE_DB": "",
+        "GEOCODE_CACHE_DB": "",
+        "OCR_API_URL": "https://clova.bench.local/ocr",
+        "OCR_SECRET_KEY": "bench",
+        "OPENAI_API_KEY": "bench",
+        "NAVER_MAP_CLIENT_ID": "bench",
+        "NAVER_MAP_CLIENT_SECRET": "bench",
+        "OCR_MAX_IMAGES_PER_REQUEST": str(config["ocr_images"]),
+        "TRACE_LOG": "true" if config["trace_log"] else "false",
+        "MPLBACKEND": "Agg",
+    })
+    if not config["warm_caches"]:
+        env.update({
+            "GPT_CACHE_ENABLED": "false",
+            "OCR_CACHE_ENABLED": "false",
+            "GEOCODE_CACHE_TTL": "0.000001",
+            "GEOCODE_NEGATIVE_TTL": "0.000001",
+            "DOCUMENT_URL_CACHE_TTL": "0.000001",
+        })
+    return env
+
+
+def percentile(values, q):
+    """정렬한 값에서 선형 보간한 q 분위수"""
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def run_load(request, count, concurrency):
+    """
+    동시 요청 수만큼의 클라이언트 스레드로 count번 요청
+
+    Args:
+        request (callable): request(i) -> (성공 여부, 소요 시간 또는 None)
+            소요 시간이 None이면 호출 시간을 그대로 사용
+
+    Returns:
+        tuple: (소요 시간 리스트, 실패 리스트, 전체 경과 시간)
+    """
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    next_index = iter(range(count))
+
+    def client():
+        while True:
+            with lock:
+                i = next(next_index, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            error = None
+            try:
+                ok, seconds = request(i)
+                if not ok:
+                    error = f"request {i} failed"
+            except Exception as e:
+                seconds = None
+                error = f"request {i}: {type(e).__name__}: {e}"
+            seconds = seconds if seconds is not None else time.perf_counter() - start
+            with lock:
+                latencies.append(seconds)
+                if error:
+                    errors.append(error)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def stage_summary(metrics_db):
+    """자식 프로세스의 지표 DB에서 단계별 평균 소요 시간과 GPT 토큰 합계"""
+    conn = sqlite3.connect(metrics_db)
+    try:
+        rows = conn.execute(
+            "SELECT name, labels, field, value FROM metric_values WHERE field IN ('sum', 'count', 'total')"
+        ).fetchall()
+    except sqlite3.OperationalError:  # 기록된 스팬이 없어 테이블이 아직 없음
+        rows = []
+    finally:
+        conn.close()
+
+    stages = {}
+    tokens = {}
+    for name, labels, field, value in rows:
+        labels = json.loads(labels)
+        if name == "jibsin_stage_duration_seconds":
+            stages.setdefault(labels["stage"], {})[field] = value
+        elif name == "jibsin_gpt_tokens_total":
+            tokens[labels["kind"]] = tokens.get(labels["kind"], 0) + value
+    return {
+        stage: {"count": int(values["count"]), "mean_ms": round(values["sum"] / values["count"] * 1000, 1)}
+        for stage, values in sorted(stages.items()) if values.get("count")
+    }, tokens
+
+
+def run_child(config):
+    """자식 프로세스: 대역 설치 → 데이터 준비 → 부하 실행 → 결과 JSON 반환"""
+    import django
+    django.setup()
+
+    from django.test import RequestFactory
+    from ai_processing import ai_analysis2, metrics, views
+    from ai_processing import price_store
+    from ai_processing.image_store import ImageStore
+    from ai_processing.jobs import get_job
+    from firebase_api.client import set_db
+    from firebase_api.fake_firestore import FakeFirestore
+    from firebase_api.utils import build_ocr_page_records, save_ocr_results_batch
+    from firebase_api.visualize_boxes import visualize_bounding_boxes_and_upload
+    from stand_ins import Latency, StandIns
+
+    scenario, doc_type = (config["scenario"].split(".", 1) + [None])[:2]
+    pages = config["pages"]
+    count = config["requests"]
+
+    latency = Latency(scale=config["latency_scale"])
+    stand_ins = StandIns(latency, price_rows=config["price_rows"])
+    stand_ins.install()
+    db = FakeFirestore()
+    set_db(db)
+    factory = RequestFactory()
+
+    # 데이터 준비 (지연 없이)
+    latency.enabled = False
+    for i in range(count):
+        db.document(f"users/{USER_ID}/contracts/c{i}").set({
+            doc: [{"imageUrl": stand_ins.image_url(doc, page)} for page in range(1, pages + 1)]
+            for doc in DOCUMENT_TYPES
+        })
+        for doc in DOCUMENT_TYPES:
+            for page in range(1, pages + 1):
+                stand_ins.page(doc, page)
+    if config["price_source"] == "store":
+        price_store.import_csv(price_store.PUBLIC_PRICE_CSV_URLS["서울특별시"])
+    else:
+        stand_ins.price_csv()
+
+    def request_ocr(i, document_type):
+        request = factory.post("/api/run-ocr/", data=json.dumps({
+            "user_id": USER_ID, "contract_id": f"c{i}", "document_type": document_type
+        }), content_type="application/json")
+        response = views.run_ocr(request)
+        return response.status_code == 200, json.loads(response.content).get("result")
+
+    def analysis(i):
+        request = factory.post("/api/start-ai-analysis/", data=json.dumps({
+            "userId": USER_ID, "contractId": f"c{i}"
+        }), content_type="application/json")
+        job_id = json.loads(views.start_ai_analysis(request).content)["job_id"]
+        while True:
+            job = get_job(job_id)
+            if job["status"] in ("completed", "failed"):
+                break
+            time.sleep(JOB_POLL_SECONDS)
+        ok = job["status"] == "completed" and job["http_status"] == 200
+        return ok, job["updated_at"] - job["created_at"]
+
+    drivers = {
+        "analysis": analysis,
+        "ocr": lambda i: (request_ocr(i, doc_type)[0], None),
+        "price": lambda i: (ai_analysis2.price(stand_ins.fixtures["address"]).get("공시가격") != "NA", None),
+        "visualize": lambda i: (visualize_bounding_boxes_and_upload(USER_ID, f"c{i}", ImageStore()), None),
+    }
+    request = drivers[scenario]
+
+    output = sys.stderr if config["verbose"] else io.StringIO()
+    with contextlib.redirect_stdout(output):
+        if scenario == "visualize":
+            for doc in DOCUMENT_TYPES:
+                ok, result = request_ocr(0, doc)
+                if not ok:
+                    raise RuntimeError(f"{doc} OCR 결과 준비 실패")
+                urls = [stand_ins.image_url(doc, page) for page in range(1, pages + 1)]
+                for i in range(1, count):
+                    save_ocr_results_batch(USER_ID, f"c{i}", {doc: build_ocr_page_records(USER_ID, doc, result, urls)})
+        if config["warm_caches"]:
+            request(0)
+
+        # 준비 단계에서 쌓인 지표/호출 수는 버리고 측정 시작 (모아 둔 지표도 먼저 써서 함께 지움)
+        metrics.flush()
+        conn = sqlite3.connect(metrics.METRICS_DB_PATH)
+        try:
+            conn.execute("DELETE FROM metric_values")
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.close()
+        stand_ins.calls.clear()
+        stand_ins.bucket.uploads.clear()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        latency.enabled = True
+        db.latency = latency.values["firestore"] * config["latency_scale"]
+        latencies, errors, elapsed = run_load(request, count, config["concurrency"])
+
+    metrics.flush()
+    stages, tokens = stage_summary(metrics.METRICS_DB_PATH)
+    return {
+        **{key: config[key] for key in ("scenario", "pages", "concurrency")},
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "max": max(latencies),
+        "mean": statistics.mean(latencies),
+        "throughput": len(latencies) / elapsed,
+        "elapsed": elapsed,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "upstream_calls": dict(sorted(stand_ins.calls.items())),
+        "uploads": len(stand_ins.bucket.uploads),
+        "gpt_tokens": tokens,
+        "stages": stages,
+    }
+
+
+def run_combination(config):
+    with tempfile.TemporaryDirectory(prefix="jibsin-bench-") as workdir:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", json.dumps(config)],
+            cwd=workdir, env=child_env(config, workdir),
+            stdout=subprocess.PIPE, stderr=None if config["verbose"] else subprocess.PIPE, text=True
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{config['scenario']} 실행 실패:\n{completed.stderr or ''}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_result(result):
+    print(
+        f"  {result['scenario']:<24} pages {result['pages']:<2} conc {result['concurrency']:<3} "
+        f"n {result['requests']:<4} err {result['errors']:<3} "
+        f"p50 {result['p50']:7.3f}s  p95 {result['p95']:7.3f}s  max {result['max']:7.3f}s  "
+        f"{result['throughput']:6.2f} req/s  peak RSS {result['peak_rss_mb']:.1f} MB"
+    )
+    for sample in result["error_samples"]:
+        print(f"      ❌ {sample}")
+
+
+def print_stages(result, limit):
+    stages = sorted(result["stages"].items(), key=lambda item: item[1]["mean_ms"] * item[1]["count"], reverse=True)
+    tokens = result["gpt_tokens"]
+    print(f"\n📊 {result['scenario']} (pages {result['pages']}, conc {result['concurrency']}) 단계별 평균")
+    for stage, values in stages[:limit]:
+        print(f"  {values['mean_ms']:9.1f} ms  x{values['count']:<5} {stage}")
+    if tokens:
+        per_request = {kind: round(value / result["requests"]) for kind, value in tokens.items()}
+        print(f"  GPT 토큰/요청: {per_request}")
+    print(f"  외부 호출: {result['upstream_calls']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="오프라인 end-to-end 벤치마크 (기록된 응답 + 지연 주입)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="실행할 시나리오 (쉼표로 구분)")
+    parser.add_argument("--pages", default="1,3,5", help="문서 타입별 페이지 수 (쉼표로 구분)")
+    parser.add_argument("--concurrency", default="1,4,8", help="동시 요청 수 (쉼표로 구분)")
+    parser.add_argument("--requests", type=int, default=16, help="조합별 요청 수 (동시 요청 수보다 작으면 동시 요청 수)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="주입 지연 배율 (0이면 지연 없음)")
+    parser.add_argument("--price-rows", type=int, default=20000, help="공시가격 CSV 행 수")
+    parser.add_argument("--price-source", choices=["store", "csv"], default="store", help="공시가격 조회 경로")
+    parser.add_argument("--ocr-images", type=int, default=1, help="Clova OCR 요청당 최대 이미지 수 (2 이상이면 페이지 묶음 요청)")
+    parser.add_argument("--warm-caches", action="store_true", help="캐시를 켜고 한 번 실행한 뒤 측정")
+    parser.add_argument("--trace-log", action="store_true", help="trace JSON 로그 출력 (--verbose와 함께 사용)")
+    parser.add_argument("--stages", type=int, default=12, help="조합별 단계 평균 상위 N개 출력 (0이면 생략)")
+    parser.add_argument("--verbose", action="store_true", help="서비스 로그를 stderr로 출력")
+    parser.add_argument("--json", help="결과를 JSON 파일로 저장할 경로")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        try:
+            result = run_child(json.loads(args.child))
+        except Exception:
+            traceback.print_exc()
+            sys.exit(1)
+        print(json.dumps(result, ensure_ascii=False))
+        return
+
+    scenarios = []
+    for scenario in args.scenarios.split(","):
+        scenario = scenario.strip()
+        if scenario not in SCENARIOS:
+            parser.error(f"알 수 없는 시나리오: {scenario}")
+        scenarios += [f"ocr.{doc_type}" for doc_type in DOCUMENT_TYPES] if scenario == "ocr" else [scenario]
+    pages = [int(value) for value in args.pages.split(",")]
+    concurrency = [int(value) for value in args.concurrency.split(",")]
+
+    print(f"📊 오프라인 벤치마크 (지연 x{args.latency_scale}, 캐시 {'warm' if args.warm_caches else 'cold'}, "
+          f"공시가격 {args.price_source}, OCR 묶음 {args.ocr_images}장, python {sys.version.split()[0]})")
+    results = []
+    for scenario in scenarios:
+        # 공시가격 조회는 페이지 수와 무관하므로 한 번만
+        for page_count in (pages[:1] if scenario == "price" else pages):
+            for workers in concurrency:
+                result = run_combination({
+                    "scenario": scenario,
+                    "pages": page_count,
+                    "concurrency": workers,
+                    "requests": max(args.requests, workers),
+                    "latency_scale": args.latency_scale,
+                    "price_rows": args.price_rows,
+                    "price_source": args.price_source,
+                    "ocr_images": args.ocr_images,
+                    "warm_caches": args.warm_caches,
+                    "trace_log": args.trace_log,
+                    "verbose": args.verbose,
+                })
+                print_result(result)
+                results.append(result)
+
+    if args.stages:
+        for result in results:
+            print_stages(result, args.stages)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 결과 저장: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
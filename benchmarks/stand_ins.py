@@ -0,0 +1,555 @@
+# 오프라인 벤치마크용 외부 서비스 대역 (기록된 응답 재생 + 지연 주입)
+# offline.py(시나리오 실행) -> stand_ins.py(Clova OCR, OpenAI, 네이버 지오코딩, Storage, 공시가격 CSV, 업로드 버킷)
+#
+# 네트워크 없이 실제 코드 경로를 그대로 타도록 대역은 가장 바깥 경계에만 둔다.
+#   requests: http_client.get_session()의 업스트림별 세션에 ReplayAdapter를 mount
+#   OpenAI: httpx MockTransport를 쓰는 실제 openai 클라이언트로 각 모듈의 client를 교체
+#   Firestore: firebase_api.fake_firestore.FakeFirestore (offline.py에서 set_db)
+#   Firebase Storage 업로드: FakeBucket (set_bucket)
+#
+# 페이지 이미지는 (문서 타입, 페이지 번호)를 이미지 크기에 담아 생성한다
+# (너비 = 1240 + 문서 코드, 높이 = 1755 + 페이지 번호). Clova 대역은 요청에 담긴 이미지마다
+# JPEG 헤더만 읽고 해당 페이지의 OCR 결과를 요청한 이미지 이름으로 돌려준다 (묶음 요청 포함).
+# OCR 단어는 실제 양식 템플릿(base_xy) 위치에 fixtures/recorded.json의 값을 배치해 만든다.
+
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from io import BytesIO
+from urllib.parse import urlparse
+
+import httpx
+import openai
+import pandas as pd
+from PIL import Image, ImageDraw
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3 import HTTPResponse
+
+from ai_processing import ai_analysis2, building_ocr, contract_ocr, registry_ocr
+from ai_processing.gpt import count_tokens
+from ai_processing.http_client import get_session
+from ai_processing.image_store import parse_image_size
+from firebase_api.client import set_bucket
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "recorded.json")
+
+OCR_API_URL = "https://clova.bench.local/ocr"
+STORAGE_URL = "https://storage.bench.local"
+GEOCODE_URL = "https://naveropenapi.apigw.ntruss.com/"
+PRICE_CSV_URL = "https://storage.googleapis.com/"
+
+DOCUMENT_CODES = {"contract": 0, "registry_document": 1, "building_registry": 2}
+BASE_PAGE_SIZE = (1240, 1755)
+IMAGE_TOKENS = 765  # gpt-4o 이미지 1장(high detail, 1240x1755) 입력 토큰 추정치
+NA_BOX = {"x1": 0, "y1": 0, "x2": 0, "y2": 0}
+
+# 업스트림별 기본 지연(초). gpt_per_token은 completion 토큰 1개당, ocr_per_image는 묶음 요청의 두 번째 이미지부터 1장당 추가 지연
+DEFAULT_LATENCY = {
+    "ocr": 1.2,
+    "ocr_per_image": 0.4,
+    "gpt": 0.8,
+    "gpt_per_token": 0.015,
+    "geocoding": 0.08,
+    "storage": 0.1,
+    "firestore": 0.03,
+    "upload": 0.2,
+}
+
+# 프롬프트에 들어 있는 문구로 GPT 호출 위치를 구분 (위에서부터 먼저 일치하는 것)
+SITE_MARKERS = [
+    ("registry_extract", "JSON 형식으로만 응답하세요"),
+    ("contract_extract", "**위치 데이터 (xy):**"),
+    ("building_extract", "**건축물대장**"),
+    ("summary", "출력 양식은 다음과 같습니다"),
+    ("building", "주소 유사도 분석 및 도로명 주소 추출"),
+    ("price", "주소 유사도 분석 및 공시가격 추출"),
+    ("solution_1", "'위반건축물'이 있는지 확인"),
+    ("solution_2", "'소유자'이 일치하는지 확인"),
+    ("solution_3", "는 공시가격이다"),
+]
+
+
+def parse_ocr_request(content_type, body):
+    """
+    Clova OCR multipart 요청 본문에서 message JSON과 file 파트 바이트 목록을 꺼냄
+
+    Returns:
+        tuple: (message dict 또는 None, 파일 바이트 리스트)
+    """
+    match = re.search(r'boundary="?([^";]+)"?', content_type or "")
+    if not match or not body:
+        return None, []
+
+    message, files = None, []
+    for part in body.split(b"--" + match.group(1).encode("latin-1"))[1:]:
+        if part.startswith(b"--"):
+            break
+        headers, _, content = part.partition(b"\r\n\r\n")
+        content = content[:-2] if content.endswith(b"\r\n") else content
+        if b'name="message"' in headers:
+            message = json.loads(content)
+        elif b'name="file"' in headers:
+            files.append(content)
+    return message, files
+
+
+def load_fixtures(path=FIXTURES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Latency:
+    """
+    업스트림별 주입 지연
+
+    Args:
+        overrides (dict): DEFAULT_LATENCY 중 바꿀 값
+        scale (float): 모든 지연에 곱할 배율 (0이면 지연 없음)
+        jitter (float): ±비율로 흔드는 폭 (0.2면 0.8~1.2배)
+    """
+
+    def __init__(self, overrides=None, scale=1.0, jitter=0.2, seed=0):
+        self.values = {**DEFAULT_LATENCY, **(overrides or {})}
+        self.scale = scale
+        self.jitter = jitter
+        self.enabled = True
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def seconds(self, upstream, tokens=0, images=1):
+        base = self.values[upstream]
+        if upstream == "gpt":
+            base += tokens * self.values["gpt_per_token"]
+        elif upstream == "ocr":
+            base += (images - 1) * self.values["ocr_per_image"]
+        with self._lock:
+            factor = 1 + self._random.uniform(-self.jitter, self.jitter)
+        return max(base * factor * self.scale, 0.0)
+
+    def wait(self, upstream, tokens=0, images=1):
+        if self.enabled and self.scale:
+            time.sleep(self.seconds(upstream, tokens, images))
+
+
+class ReplayAdapter(BaseAdapter):
+    """handler(PreparedRequest) -> (상태 코드, 헤더, 본문)으로 응답하는 requests 어댑터"""
+
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self._builder = HTTPAdapter()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        status, headers, body = self.handler(request)
+        raw = HTTPResponse(
+            body=BytesIO(body), headers=headers, status=status,
+            preload_content=False, decode_content=False, reason="OK" if status < 400 else "Error"
+        )
+        return self._builder.build_response(request, raw)
+
+    def close(self):
+        pass
+
+
+def _box_words(text, box):
+    """값 텍스트를 공백 단위 단어로 나눠 박스 안에 가로로 배치"""
+    words = str(text).split()
+    x1, y1, x2, y2 = box
+    total = sum(len(word) for word in words) + len(words) - 1
+    step = (x2 - x1) / max(total, 1)
+    result = []
+    x = x1
+    for word in words:
+        width = max(len(word) * step, 4)
+        result.append((word, int(x), int(y1), int(min(x + width, x2)), int(y2)))
+        x += width + step
+    return result
+
+
+def _entry(value, key):
+    """fixture의 추출 값 항목을 {key, text, template, box} 형태로 변환"""
+    if isinstance(value, str):
+        value = {"text": value}
+    return {
+        "key": value.get("key", key),
+        "text": value["text"],
+        "template": value.get("template"),
+        "box": value.get("box"),
+    }
+
+
+class StandIns:
+    """
+    외부 서비스 대역 전체 (install()로 세션, OpenAI 클라이언트, 업로드 버킷을 교체)
+
+    Args:
+        latency (Latency): 주입 지연
+        fixtures (dict): 기록된 응답 (없으면 fixtures/recorded.json)
+        filler_words (int): 페이지마다 양식 밖에 추가할 OCR 단어 수 (실제 스캔의 단어 수에 맞춤)
+        price_rows (int): 공시가격 CSV 행 수 (기록된 행 + 같은 형식의 다른 주소)
+    """
+
+    def __init__(self, latency, fixtures=None, filler_words=250, price_rows=20000):
+        self.latency = latency
+        self.fixtures = fixtures or load_fixtures()
+        self.filler_words = filler_words
+        self.price_rows = price_rows
+        self.bucket = FakeBucket(self)
+        self.calls = {}
+        self._pages = {}
+        self._price_csv = None
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    # 페이지 이미지 / OCR 응답
+
+    def image_url(self, doc_type, page_number):
+        return f"{STORAGE_URL}/{doc_type}/page{page_number}.jpg"
+
+    def page_size(self, doc_type, page_number):
+        return BASE_PAGE_SIZE[0] + DOCUMENT_CODES[doc_type], BASE_PAGE_SIZE[1] + page_number
+
+    def _page_words(self, doc_type, page_number, size):
+        words = []
+        reserved = []  # 양식 칸 (값이 NA인 칸에도 본문 단어가 들어가지 않도록)
+        if doc_type == "contract":
+            values = self.fixtures["extract"]["contract_extract"]
+            template = contract_ocr.base_xy(page_number)
+            names = template.names
+            for text, x1, y1, x2, y2 in template.rows():
+                reserved.append((x1, y1, x2, y2))
+                key = text.strip("()")
+                # '(필드)' 칸, 또는 괄호 없이 영역 전체가 값인 칸 (특약사항 등)
+                if text.startswith("(") or (key in values and f"({key})" not in names):
+                    value = _entry(values[key], key)["text"] if key in values else "NA"
+                    if value != "NA":
+                        words += _box_words(value, (x1, y1, x2, y2))
+                else:
+                    words += _box_words(text, (x1, y1, x2, y2))
+        elif doc_type == "registry_document":
+            entries = [_entry(value, key) for key, value in self.fixtures["extract"]["registry_extract"].items()]
+            by_template = {entry["template"]: entry["text"] for entry in entries}
+            template = registry_ocr.page_template(page_number - 1, *size)
+            for text, x1, y1, x2, y2 in template.rows():
+                reserved.append((x1, y1, x2, y2))
+                words += _box_words(by_template.get(text, text.strip("()")), (x1, y1, x2, y2))
+        else:
+            for field in self.fixtures["responses"]["building_extract"].values():
+                box = field["bounding_box"]
+                reserved.append((box["x1"], box["y1"], box["x2"], box["y2"]))
+                if field["text"] != "NA":
+                    words += _box_words(field["text"], (box["x1"], box["y1"], box["x2"], box["y2"]))
+
+        # 양식 밖 영역에 본문 단어 추가 (기존 단어와 겹치지 않는 위치만)
+        rng = random.Random(f"{doc_type}:{page_number}")
+        occupied = reserved + [word[1:] for word in words]
+        attempts = 0
+        added = 0
+        while added < self.filler_words and attempts < self.filler_words * 20:
+            attempts += 1
+            x1 = rng.randrange(40, size[0] - 160)
+            y1 = rng.randrange(40, size[1] - 40)
+            box = (x1, y1, x1 + rng.randrange(30, 120), y1 + 24)
+            if any(box[0] < o[2] and box[2] > o[0] and box[1] < o[3] and box[3] > o[1] for o in occupied):
+                continue
+            occupied.append(box)
+            words.append(("".join(rng.choice("가나다라마바사아자차카타파하") for _ in range(rng.randrange(1, 5))), *box))
+            added += 1
+        return words
+
+    def page(self, doc_type, page_number):
+        """
+        (문서 타입, 페이지)의 이미지 바이트와 Clova 응답 본문 (처음 요청 시 생성 후 재사용)
+
+        Returns:
+            dict: image(JPEG 바이트), fields(Clova 응답의 fields), words(단어 수)
+        """
+        key = (doc_type, page_number)
+        with self._lock:
+            if key in self._pages:
+                return self._pages[key]
+
+        size = self.page_size(doc_type, page_number)
+        words = self._page_words(doc_type, page_number, size)
+
+        image = Image.new("RGB", size, "white")
+        draw = ImageDraw.Draw(image)
+        for _, x1, y1, x2, y2 in words:
+            draw.rectangle([(x1, y1 + 4), (x2, y2 - 4)], fill=(60, 60, 60))
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+
+        fields = [
+            {
+                "valueType": "ALL",
+                "boundingPoly": {"vertices": [
+                    {"x": x1, "y": y1}, {"x": x2, "y": y1}, {"x": x2, "y": y2}, {"x": x1, "y": y2}
+                ]},
+                "inferText": text,
+                "inferConfidence": 0.99,
+                "type": "NORMAL",
+                "lineBreak": False,
+            }
+            for text, x1, y1, x2, y2 in words
+        ]
+        page = {"image": buffer.getvalue(), "fields": fields, "words": len(words)}
+        with self._lock:
+            self._pages[key] = page
+        return page
+
+    # requests 대역
+
+    def handle_storage(self, request):
+        self._count("storage")
+        self.latency.wait("storage")
+        match = re.search(r"/(\w+)/page(\d+)\.jpg$", urlparse(request.url).path)
+        if not match or match.group(1) not in DOCUMENT_CODES:
+            return 404, {}, b"not found"
+        data = self.page(match.group(1), int(match.group(2)))["image"]
+
+        range_header = request.headers.get("Range")
+        if range_header:
+            start, end = re.match(r"bytes=(\d+)-(\d*)", range_header).groups()
+            end = min(int(end) if end else len(data) - 1, len(data) - 1)
+            part = data[int(start):end + 1]
+            headers = {"Content-Type": "image/jpeg", "Content-Length": str(len(part)),
+                       "Content-Range": f"bytes {start}-{end}/{len(data)}"}
+            return 206, headers, part
+        return 200, {"Content-Type": "image/jpeg", "Content-Length": str(len(data))}, data
+
+    def page_of_image(self, data):
+        """업로드된 이미지 바이트의 크기로 (문서 타입, 페이지 번호) 확인 (알 수 없으면 None)"""
+        size = parse_image_size(data)
+        if not size:
+            return None
+        codes = {code: doc_type for doc_type, code in DOCUMENT_CODES.items()}
+        doc_type = codes.get(size[0] - BASE_PAGE_SIZE[0])
+        page_number = size[1] - BASE_PAGE_SIZE[1]
+        if doc_type is None or page_number < 1:
+            return None
+        return doc_type, page_number
+
+    def ocr_response(self, content_type, body):
+        """
+        Clova General OCR 요청(multipart: message + file 여러 개)에 대한 응답
+
+        Returns:
+            tuple: (상태 코드, 헤더, 본문)
+        """
+        message, files = parse_ocr_request(content_type, body)
+        images = message.get("images", []) if message else []
+        if not images or len(images) != len(files):
+            return 400, {"Content-Type": "application/json"}, b'{"code":"0011","message":"Invalid request"}'
+
+        self._count("ocr")
+        self.latency.wait("ocr", images=len(files))
+        results = []
+        for image, data in zip(images, files):
+            page = self.page_of_image(data)
+            if page is None:
+                return 400, {"Content-Type": "application/json"}, b'{"code":"0011","message":"Unknown page"}'
+            results.append({
+                "uid": uuid.uuid4().hex, "name": image.get("name"), "inferResult": "SUCCESS", "message": "SUCCESS",
+                "validationResult": {"result": "NO_REQUESTED"}, "fields": self.page(*page)["fields"],
+            })
+        response = {
+            "version": "V2",
+            "requestId": message.get("requestId", str(uuid.uuid4())),
+            "timestamp": int(time.time() * 1000),
+            "images": results,
+        }
+        return 200, {"Content-Type": "application/json"}, json.dumps(response, ensure_ascii=False).encode("utf-8")
+
+    def handle_ocr(self, request):
+        return self.ocr_response(request.headers.get("Content-Type", ""), request.body)
+
+    def handle_geocode(self, request):
+        self._count("geocoding")
+        self.latency.wait("geocoding")
+        return 200, {"Content-Type": "application/json"}, json.dumps(self.fixtures["geocode"], ensure_ascii=False).encode("utf-8")
+
+    def price_csv(self):
+        """기록된 공시가격 행 + 같은 시도의 다른 주소 행으로 만든 CSV 바이트"""
+        with self._lock:
+            if self._price_csv is not None:
+                return self._price_csv
+
+        recorded = self.fixtures["price_rows"]
+        rng = random.Random("price")
+        rows = list(recorded)
+        template = recorded[0]
+        for i in range(max(self.price_rows - len(rows), 0)):
+            rows.append({
+                **template,
+                "동리": f"{rng.choice('가나다라마바사')}{rng.choice('가나다라마바사')}동",
+                "동명": rng.randrange(101, 130),
+                "호명": rng.randrange(101, 2505),
+                "단지명": f"단지{i % 500}",
+                "공시가격": rng.randrange(100, 2000) * 1000000,
+            })
+        data = pd.DataFrame(rows).to_csv(index=False).encode("utf-8")
+        with self._lock:
+            self._price_csv = data
+        return data
+
+    def handle_price_csv(self, request):
+        self._count("price_csv")
+        self.latency.wait("storage")
+        data = self.price_csv()
+        return 200, {"Content-Type": "text/csv", "Content-Length": str(len(data))}, data
+
+    # OpenAI 대역
+
+    def _extract_response(self, site, text):
+        """요청된 항목만 기록된 값으로, 좌표는 프롬프트 템플릿(xy)의 박스로 채운 추출 결과"""
+        requested = re.findall(r"^- \*\*(.+?)\*\*:", text, re.M)
+        xy_section = text.split("**위치 데이터 (xy):**\n", 1)[1].split("\n\n", 1)[0]
+        boxes = {}
+        for line in xy_section.splitlines()[1:]:
+            name, x1, y1, x2, y2 = line.rsplit("|", 4)
+            boxes.setdefault(name, {"x1": int(x1), "y1": int(y1), "x2": int(x2), "y2": int(y2)})
+
+        values = self.fixtures["extract"][site]
+        result = {}
+        for key in requested:
+            entry = _entry(values[key], key) if key in values else {"key": key, "text": "NA", "template": None, "box": None}
+            if entry["box"]:
+                box = dict(zip(("x1", "y1", "x2", "y2"), entry["box"]))
+            else:
+                box = boxes.get(entry["template"]) or boxes.get(f"({key})") or boxes.get(key)
+            if entry["text"] == "NA" or box is None:
+                result[entry["key"]] = {"text": "NA", "bounding_box": dict(NA_BOX)}
+            else:
+                result[entry["key"]] = {"text": entry["text"], "bounding_box": box}
+        return result
+
+    def _solution_response(self, text):
+        """solution 프롬프트의 입력 데이터에 notice/solution을 붙여 돌려줌"""
+        payload = {}
+        for line in text.splitlines():
+            if line.startswith("{") and "에서 'contract'" in line:
+                payload = json.loads(line.split("에서 'contract'", 1)[0])
+                break
+        for pages in payload.values():
+            for fields in pages.values():
+                for key, value in fields.items():
+                    value = value if isinstance(value, dict) else {"text": value}
+                    fields[key] = {**value, "notice": "문제 없음", "solution": "계약 진행 가능"}
+        return payload
+
+    def completion(self, messages):
+        """
+        chat.completions 요청에 대한 응답 내용과 호출 위치
+
+        Returns:
+            tuple: (호출 위치, 응답 텍스트, prompt 토큰 수)
+        """
+        texts = []
+        images = 0
+        for message in messages:
+            content = message.get("content")
+            if isinstance(content, str):
+                texts.append(content)
+                continue
+            for part in content or []:
+                if part.get("type") == "text":
+                    texts.append(part["text"])
+                elif part.get("type") == "image_url":
+                    images += 1
+        text = "\n".join(texts)
+        site = next((site for site, marker in SITE_MARKERS if marker in text), "unknown")
+
+        responses = self.fixtures["responses"]
+        if site in ("contract_extract", "registry_extract"):
+            content = self._extract_response(site, text)
+        elif site.startswith("solution_"):
+            content = self._solution_response(text)
+        elif site == "building":
+            content = {"result": self.fixtures["address"]}
+        else:
+            content = responses.get(site, {})
+        return site, json.dumps(content, ensure_ascii=False), count_tokens(text) + images * IMAGE_TOKENS
+
+    def handle_openai(self, request):
+        body = json.loads(request.content)
+        site, content, prompt_tokens = self.completion(body.get("messages", []))
+        completion_tokens = count_tokens(content)
+        self._count(f"gpt.{site}")
+        self.latency.wait("gpt", completion_tokens)
+        return httpx.Response(200, json={
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def install(self):
+        """세션, OpenAI 클라이언트, 업로드 버킷을 대역으로 교체"""
+        get_session("ocr").mount(OCR_API_URL, ReplayAdapter(self.handle_ocr))
+        get_session("storage").mount(STORAGE_URL, ReplayAdapter(self.handle_storage))
+        get_session("storage").mount(PRICE_CSV_URL, ReplayAdapter(self.handle_price_csv))
+        get_session("geocoding").mount(GEOCODE_URL, ReplayAdapter(self.handle_geocode))
+
+        client = openai.OpenAI(
+            api_key="bench",
+            max_retries=0,
+            http_client=httpx.Client(transport=httpx.MockTransport(self.handle_openai)),
+        )
+        for module in (contract_ocr, registry_ocr, building_ocr, ai_analysis2):
+            module.client = client
+        # OCR 모듈은 import 시점의 환경 변수로 주소를 읽으므로 대역 주소로 교체
+        for module in (contract_ocr, registry_ocr, building_ocr):
+            module.api_url = OCR_API_URL
+            module.secret_key = "bench"
+
+        set_bucket(self.bucket)
+
+
+class FakeBlob:
+    def __init__(self, bucket, path):
+        self.bucket = bucket
+        self.name = path
+
+    def upload_from_filename(self, filename):
+        self.upload_from_string(open(filename, "rb").read())
+
+    def upload_from_string(self, data, content_type=None):
+        self.bucket.stand_ins.latency.wait("upload")
+        with self.bucket.lock:
+            self.bucket.uploads[self.name] = len(data)
+
+    def make_public(self):
+        pass
+
+    @property
+    def public_url(self):
+        return f"{STORAGE_URL}/uploads/{self.name}"
+
+
+class FakeBucket:
+    """Firebase Storage 버킷 대역 (업로드한 경로와 크기만 기록)"""
+
+    def __init__(self, stand_ins):
+        self.stand_ins = stand_ins
+        self.uploads = {}
+        self.lock = threading.Lock()
+
+    def blob(self, path):
+        return FakeBlob(self, path)
@@ -0,0 +1,80 @@
+# gunicorn 워커 시작 시간 / 메모리 측정
+# python benchmarks/startup.py [--runs 5] [--importtime 15]
+#
+# 새 파이썬 프로세스에서 워커가 하는 일(jibsinpj.wsgi import → 첫 요청 시 URLconf 로드)을
+# 그대로 실행해 단계별 시간과 최대 RSS를 측정한다. --importtime을 주면
+# python -X importtime 결과에서 누적 import 시간이 긴 모듈을 함께 출력한다.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 자식 프로세스에서 실행할 코드 (결과는 마지막 줄에 JSON으로 출력)
+CHILD_CODE = """
+import json, os, resource, time
+start = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "jibsinpj.settings")
+import jibsinpj.wsgi
+wsgi_loaded = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls_loaded = time.perf_counter()
+print(json.dumps({
+    "wsgi": wsgi_loaded - start,
+    "urls": urls_loaded - wsgi_loaded,
+    "total": urls_loaded - start,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def run_once(extra_args=()):
+    completed = subprocess.run(
+        [sys.executable, *extra_args, "-c", CHILD_CODE],
+        cwd=PROJECT_DIR, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"워커 시작 실패:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def slowest_imports(stderr, limit):
+    """-X importtime 출력에서 누적 시간이 긴 모듈 목록"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  self [us] | cumulative | imported package"
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gunicorn 워커 시작 시간/메모리 측정")
+    parser.add_argument("--runs", type=int, default=5, help="측정 반복 횟수")
+    parser.add_argument("--importtime", type=int, default=0, help="누적 import 시간 상위 N개 모듈 출력")
+    args = parser.parse_args()
+
+    results = [run_once()[0] for _ in range(args.runs)]
+    print(f"📊 워커 시작 측정 ({args.runs}회, python {sys.version.split()[0]})")
+    for field in ["wsgi", "urls", "total"]:
+        values = [result[field] for result in results]
+        print(f"  {field:<6} median {statistics.median(values):.3f}s  min {min(values):.3f}s  max {max(values):.3f}s")
+    print(f"  max RSS median {statistics.median(result['max_rss_mb'] for result in results):.1f} MB")
+
+    if args.importtime:
+        _, stderr = run_once(["-X", "importtime"])
+        print(f"\n📊 누적 import 시간 상위 {args.importtime}개")
+        for cumulative_us, name in slowest_imports(stderr, args.importtime):
+            print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
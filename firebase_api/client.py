@@ -0,0 +1,77 @@
+# Firebase 앱 / Firestore / Storage 공용 클라이언트 (처음 사용할 때 한 번만 초기화)
+# utils.py, views.py, visualize_boxes.py(Firestore/Storage 사용) -> client.py(클라이언트 제공)
+#
+# 모듈을 import 하는 시점에는 Firebase에 연결하지 않으므로 gunicorn 워커 시작,
+# manage.py 명령 실행 시 인증서 로드와 gRPC 채널 생성 비용이 들지 않는다.
+
+import threading
+from django.conf import settings
+
+_lock = threading.Lock()
+_db = None
+_bucket = None
+
+
+def get_app():
+    """기본 Firebase 앱 반환 (없으면 settings의 키 파일, 버킷으로 초기화)"""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    with _lock:
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(settings.FIREBASE_KEY_PATH)
+            firebase_admin.initialize_app(cred, {"storageBucket": settings.FIREBASE_STORAGE_BUCKET})
+        return firebase_admin.get_app()
+
+
+def get_db():
+    """
+    공용 Firestore 클라이언트 반환
+
+    Returns:
+        google.cloud.firestore.Client: Firestore 클라이언트 (set_db로 바꾼 경우 해당 클라이언트)
+    """
+    global _db
+    if _db is None:
+        app = get_app()
+        from firebase_admin import firestore
+        with _lock:
+            if _db is None:
+                _db = firestore.client(app)
+    return _db
+
+
+def get_bucket():
+    """공용 Storage 버킷 반환"""
+    global _bucket
+    if _bucket is None:
+        app = get_app()
+        from firebase_admin import storage
+        with _lock:
+            if _bucket is None:
+                _bucket = storage.bucket(app=app)
+    return _bucket
+
+
+def set_db(client):
+    """
+    Firestore 클라이언트를 교체 (로컬 실행/테스트에서 FakeFirestore 사용 시)
+
+    Args:
+        client: Firestore 클라이언트. None이면 다음 get_db 호출 시 다시 초기화
+    """
+    global _db
+    with _lock:
+        _db = client
+
+
+def set_bucket(bucket):
+    """
+    Storage 버킷을 교체 (벤치마크에서 업로드를 메모리에 받는 버킷 사용 시)
+
+    Args:
+        bucket: blob(path)를 제공하는 버킷. None이면 다음 get_bucket 호출 시 다시 초기화
+    """
+    global _bucket
+    with _lock:
+        _bucket = bucket
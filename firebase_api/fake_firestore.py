@@ -0,0 +1,203 @@
+# 테스트/로컬 실행용 인메모리 Firestore
+# utils.py(저장/조회 함수, client 인자) -> fake_firestore.py(실제 Firestore 대신 사용)
+#
+# 이 서비스가 사용하는 기능만 구현한다.
+# collection / document / set(merge) / update / get / where("==", "in") / stream / batch
+# 배치는 commit 시점에 한 번에 반영되고, 중간에 실패하면 아무것도 반영되지 않는다.
+# latency를 주면 조회/커밋마다 그만큼 기다려 실제 Firestore 왕복 시간을 흉내 낸다 (벤치마크용).
+# 실제 Firestore 에뮬레이터를 쓰려면 FIRESTORE_EMULATOR_HOST 환경 변수를 설정하면
+# firebase_admin 클라이언트가 그대로 에뮬레이터에 연결된다.
+
+import copy
+import threading
+import time
+from datetime import datetime, timezone
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+
+_OPERATORS = {
+    "==": lambda field, value: field == value,
+    "in": lambda field, value: field in value,
+}
+
+
+class FakeNotFound(Exception):
+    """존재하지 않는 문서를 update 할 때 발생 (google.api_core.exceptions.NotFound 대응)"""
+
+
+def _resolve(data):
+    """SERVER_TIMESTAMP 자리에 현재 시각을 넣은 사본"""
+    if data is SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    if isinstance(data, dict):
+        return {key: _resolve(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_resolve(value) for value in data]
+    return copy.deepcopy(data)
+
+
+def _merge(target, data):
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return copy.deepcopy(self._data.get(field)) if self._data else None
+
+
+class FakeDocumentReference:
+    def __init__(self, store, path):
+        self._store = store
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name):
+        return FakeCollectionReference(self._store, f"{self.path}/{name}")
+
+    def get(self):
+        self._store.round_trip()
+        with self._store.lock:
+            return FakeSnapshot(self, self._store.documents.get(self.path))
+
+    def set(self, data, merge=False):
+        batch = self._store.batch()
+        batch.set(self, data, merge=merge)
+        batch.commit()
+
+    def update(self, data):
+        batch = self._store.batch()
+        batch.update(self, data)
+        batch.commit()
+
+    def delete(self):
+        batch = self._store.batch()
+        batch.delete(self)
+        batch.commit()
+
+
+class FakeQuery:
+    def __init__(self, collection, filters=()):
+        self._collection = collection
+        self._filters = list(filters)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in _OPERATORS:
+            raise NotImplementedError(f"FakeFirestore가 지원하지 않는 조건입니다: {op_string}")
+        return FakeQuery(self._collection, self._filters + [(field_path, op_string, value)])
+
+    def stream(self):
+        prefix = self._collection.path + "/"
+        store = self._collection._store
+        store.round_trip()
+        with store.lock:
+            items = [
+                (path, copy.deepcopy(data)) for path, data in sorted(store.documents.items())
+                if path.startswith(prefix) and "/" not in path[len(prefix):]
+            ]
+        for path, data in items:
+            if all(_OPERATORS[op](data.get(field), value) for field, op, value in self._filters):
+                yield FakeSnapshot(FakeDocumentReference(store, path), data)
+
+    def get(self):
+        return list(self.stream())
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, store, path):
+        self._store = store
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+        super().__init__(self)
+
+    def document(self, document_id):
+        return FakeDocumentReference(self._store, f"{self.path}/{document_id}")
+
+
+class FakeWriteBatch:
+    def __init__(self, store):
+        self._store = store
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(("set", reference.path, _resolve(data), merge))
+        return self
+
+    def update(self, reference, data):
+        self._writes.append(("update", reference.path, _resolve(data), True))
+        return self
+
+    def delete(self, reference):
+        self._writes.append(("delete", reference.path, None, False))
+        return self
+
+    def commit(self):
+        """쓰기를 한 번에 반영 (하나라도 실패하면 전체 취소)"""
+        self._store.round_trip()
+        with self._store.lock:
+            documents = dict(self._store.documents)
+            for operation, path, data, merge in self._writes:
+                if operation == "delete":
+                    documents.pop(path, None)
+                elif operation == "update" and path not in documents:
+                    raise FakeNotFound(f"No document to update: {path}")
+                elif merge and path in documents:
+                    merged = copy.deepcopy(documents[path])
+                    _merge(merged, data)
+                    documents[path] = merged
+                else:
+                    documents[path] = data
+            self._store.documents = documents
+            self._store.commit_count += 1
+        return []
+
+
+class FakeFirestore:
+    """
+    firestore.Client 대신 사용하는 인메모리 클라이언트
+
+    Attributes:
+        documents (dict): {문서 경로: 데이터}
+        commit_count (int): 반영된 쓰기(배치 또는 단일 set/update) 횟수. 왕복 횟수 확인용
+        latency (float): 조회/커밋 1회마다 기다릴 시간(초)
+    """
+
+    def __init__(self, latency=0.0):
+        self.documents = {}
+        self.commit_count = 0
+        self.latency = latency
+        self.lock = threading.Lock()
+
+    def round_trip(self):
+        """서버 왕복 1회 (latency만큼 대기)"""
+        if self.latency:
+            time.sleep(self.latency)
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def document(self, path):
+        return FakeDocumentReference(self, path)
+
+    def batch(self):
+        return FakeWriteBatch(self)
@@ -1,3 +1,113 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .fake_firestore import FakeFirestore
+from .utils import build_ocr_page_records, get_classified_document_urls, get_ocr_results, save_ocr_results_batch
+
+USER_ID = "user1"
+CONTRACT_ID = "contract1"
+RESULTS_PATH = f"users/{USER_ID}/contracts/{CONTRACT_ID}/ocr_results"
+IMAGE_URLS = ["https://storage/contract/page1.jpg", "https://storage/contract/page2.jpg"]
+
+
+class OcrResultStoreTests(SimpleTestCase):
+    """OCR 결과 일괄 저장 / 조회 (FakeFirestore 사용)"""
+
+    def setUp(self):
+        self.client = FakeFirestore()
+        self.result = {"page1": {"보증금_1": {"text": "100,000,000원"}}, "page2": {"특약": {"text": "NA"}}}
+
+    def save(self, combined_data=None):
+        records = {"contract": build_ocr_page_records(USER_ID, "contract", self.result, IMAGE_URLS)}
+        return save_ocr_results_batch(USER_ID, CONTRACT_ID, records, combined_data, client=self.client)
+
+    def test_build_page_records(self):
+        records = build_ocr_page_records(USER_ID, "contract", self.result, IMAGE_URLS)
+        self.assertEqual([page_num for page_num, _ in records], [1, 2])
+        page_num, data = records[1]
+        self.assertEqual(data["imageUrl"], IMAGE_URLS[1])
+        self.assertEqual(data["document_type"], "contract")
+        self.assertEqual(data["ocr_result"], self.result["page2"])
+
+    def test_batch_saves_pages_and_combined_result_in_one_commit(self):
+        self.assertTrue(self.save(combined_data={"contract": self.result}))
+        self.assertEqual(self.client.commit_count, 1)
+        self.assertEqual(
+            self.client.documents[f"{RESULTS_PATH}/contract_page1"]["ocr_result"], self.result["page1"]
+        )
+        self.assertEqual(self.client.documents[f"{RESULTS_PATH}/combined_analysis"]["contract"], self.result)
+
+    def test_empty_batch_does_not_commit(self):
+        self.assertTrue(save_ocr_results_batch(USER_ID, CONTRACT_ID, {}, client=self.client))
+        self.assertEqual(self.client.commit_count, 0)
+
+    def test_get_reads_only_missing_document_types(self):
+        self.save()
+        known = {"registry_document": {"page1": {"소유자": {"text": "김민수"}}}}
+        results = get_ocr_results(
+            USER_ID, CONTRACT_ID, ["registry_document", "contract"], known_results=known, client=self.client
+        )
+        self.assertEqual(results["contract"], self.result)
+        self.assertEqual(results["registry_document"], known["registry_document"])
+
+        # 분석 단계에서 결과를 수정해도 메모리의 원본은 바뀌지 않음
+        results["registry_document"]["page1"]["소유자"]["text"] = "이영희"
+        self.assertEqual(known["registry_document"]["page1"]["소유자"]["text"], "김민수")
+
+    def test_get_skips_firestore_when_all_results_are_known(self):
+        client = FakeFirestore()
+        client.round_trip = lambda: self.fail("Firestore를 조회하면 안 됨")
+        results = get_ocr_results(USER_ID, CONTRACT_ID, ["contract"], known_results={"contract": self.result}, client=client)
+        self.assertEqual(results, {"contract": self.result})
+
+    def test_get_omits_document_types_without_results(self):
+        results = get_ocr_results(USER_ID, CONTRACT_ID, ["building_registry"], client=self.client)
+        self.assertEqual(results, {})
+
+
+class _DictCache:
+    """get_or_load/set만 있는 테스트용 캐시"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get_or_load(self, key, loader):
+        if key not in self.data:
+            value, ttl = loader()
+            if ttl is False:
+                return value
+            self.data[key] = value
+        return self.data[key]
+
+    def set(self, key, value, ttl=None):
+        self.data[key] = value
+
+
+class DocumentUrlTests(SimpleTestCase):
+    """get_classified_document_urls: 호출한 쪽에서 넘긴 캐시 사용"""
+
+    def setUp(self):
+        self.client = FakeFirestore()
+        self.client.document(f"users/{USER_ID}/contracts/{CONTRACT_ID}").set({
+            "contract": [{"imageUrl": IMAGE_URLS[0]}, {"imageUrl": IMAGE_URLS[1]}],
+            "registry_document": [{"name": "이미지 없음"}],
+        })
+
+    def test_urls_are_classified_by_document_type(self):
+        urls = get_classified_document_urls(USER_ID, CONTRACT_ID, client=self.client)
+        self.assertEqual(urls, {"registry_document": [], "contract": IMAGE_URLS, "building_registry": []})
+
+    def test_cache_skips_firestore_and_returns_copies(self):
+        cache = _DictCache()
+        urls = get_classified_document_urls(USER_ID, CONTRACT_ID, client=self.client, cache=cache)
+        urls["contract"].clear()
+
+        self.client.documents.clear()
+        self.assertEqual(
+            get_classified_document_urls(USER_ID, CONTRACT_ID, client=self.client, cache=cache)["contract"], IMAGE_URLS
+        )
+        self.assertIsNone(get_classified_document_urls(USER_ID, CONTRACT_ID, use_cache=False, client=self.client, cache=cache))
+
+    def test_missing_contract_is_not_cached(self):
+        cache = _DictCache()
+        self.assertIsNone(get_classified_document_urls(USER_ID, "missing", client=self.client, cache=cache))
+        self.assertEqual(cache.data, {})
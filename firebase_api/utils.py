@@ -1,32 +1,75 @@
-# Firebase를 초기화하고, 최신 이미지의 URL을 가져오는 함수 제공
+# Firestore 데이터 조회/저장 함수 제공 (클라이언트는 client.py에서 처음 사용할 때 초기화)
 # urls -> views.py(api 엔드포인트) -> utils.py(기능구현)
 
-from firebase_admin import firestore
 from typing import Dict, Optional
+import copy
 import json
 from django.http import JsonResponse
-import firebase_admin
-from firebase_admin import credentials, storage, firestore 
+from firebase_admin import firestore
 import os
 from google.cloud.firestore import FieldFilter
 from datetime import datetime, timezone
+from typing import Dict, List, TypedDict
+import traceback
 from io import BytesIO
 from PIL import Image
 import requests
-from typing import Dict, List
-import traceback
+from .client import get_db
 
-#  Firebase 설정
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-FIREBASE_KEY_PATH = os.path.join(BASE_DIR, "firebase_key.json")
+DOCUMENT_TYPES = ("registry_document", "contract", "building_registry")
+
+
+class ClassifiedDocumentUrls(TypedDict):
+    """문서 타입별 이미지 URL 리스트 (contract 문서의 각 배열에 있는 imageUrl 순서대로)"""
+    registry_document: List[str]
+    contract: List[str]
+    building_registry: List[str]
+
+
+def get_classified_document_urls(user_id: str, contract_id: str, use_cache: bool = True,
+                                 client=None, cache=None) -> Optional[ClassifiedDocumentUrls]:
+    """
+    계약 문서에서 문서 타입별 이미지 URL 조회
+
+    Args:
+        user_id (str): 사용자 ID
+        contract_id (str): 계약 ID
+        use_cache (bool): False면 캐시를 무시하고 Firestore에서 다시 조회
+        client: Firestore 클라이언트 (없으면 get_db())
+        cache: get_or_load/set을 제공하는 캐시 (ai_processing의 TieredCache). 없으면 매번 Firestore 조회
+
+    Returns:
+        ClassifiedDocumentUrls: 문서 타입별 URL 리스트. 계약 문서가 없으면 None
+    """
+    def load():
+        contract_doc = (client or get_db()).collection("users").document(user_id)\
+            .collection("contracts").document(contract_id).get()
+        if not contract_doc.exists:
+            return None, False  # 없는 계약은 캐시하지 않음
+
+        contract_data = contract_doc.to_dict()
+        classified_docs = {doc_type: [] for doc_type in DOCUMENT_TYPES}
+        for doc_type in DOCUMENT_TYPES:
+            for doc in contract_data.get(doc_type) or []:
+                if 'imageUrl' in doc:
+                    classified_docs[doc_type].append(doc['imageUrl'])
+        return classified_docs, None
+
+    key = f"{user_id}/{contract_id}"
+    if cache is None:
+        classified_docs, _ = load()
+    elif use_cache:
+        classified_docs = cache.get_or_load(key, load)
+    else:
+        classified_docs, ttl = load()
+        if ttl is not False:
+            cache.set(key, classified_docs)
+
+    if classified_docs is None:
+        return None
+    # 호출한 쪽에서 리스트를 수정해도 캐시된 값은 바뀌지 않도록 사본 반환
+    return {doc_type: list(urls) for doc_type, urls in classified_docs.items()}
 
-# Firebase 앱 초기화 (이미 초기화되지 않았다면)
-if not firebase_admin._apps:
-    cred = credentials.Certificate(FIREBASE_KEY_PATH)
-    firebase_admin.initialize_app(cred, {
-        'storageBucket': 'jibsin.firebasestorage.app'  #  Firebase 스토리지 버킷 이름
-    })
-db = firebase_admin.firestore.client()
 
 def get_latest_images_by_type(): # Firebase Storage에서 가장 최근 업로드된 이미지 URL을 가져오는 함수.
     
@@ -34,7 +77,7 @@ def get_latest_images_by_type(): # Firebase Storage에서 가장 최근 업로
     
     try:
         # Firestore 'scanned_documents' 컬렉션에서 최신 데이터 가져오기
-        docs = db.collection("scanned_documents").order_by("uploadDate", direction=firestore.Query.DESCENDING).stream()
+        docs = get_db().collection("scanned_documents").order_by("uploadDate", direction=firestore.Query.DESCENDING).stream()
 
         latest_type = None  # 가장 최신 문서의 type (예: "building_registry", "contract")
         latest_images = []  # 해당 type에 속하는 이미지 리스트
@@ -60,22 +103,29 @@ from google.cloud import firestore
 import json
 
 
+FIRESTORE_BATCH_LIMIT = 500  # Firestore WriteBatch 1회 최대 쓰기 수
+
+
+def _ocr_results_collection(client, user_id: str, contract_id: str):
+    return (
+        client.collection("users")
+        .document(user_id)
+        .collection("contracts")
+        .document(contract_id)
+        .collection("ocr_results")
+    )
+
+
 def save_ocr_result_to_firestore(user_id: str, contract_id: str, 
                                document_type: str, page_number: int, 
-                               json_data: Dict) -> bool:
+                               json_data: Dict, client=None) -> bool:
     """
     OCR 결과를 Firestore에 저장
     """
+    client = client or get_db()
     try:
         # OCR 결과를 저장할 문서 참조 생성
-        doc_ref = (
-            db.collection("users")
-            .document(user_id)
-            .collection("contracts")
-            .document(contract_id)
-            .collection("ocr_results")
-            .document(f"{document_type}_page{page_number}")
-        )
+        doc_ref = _ocr_results_collection(client, user_id, contract_id).document(f"{document_type}_page{page_number}")
         
         # 데이터 저장
         doc_ref.set(json_data)
@@ -85,6 +135,85 @@ def save_ocr_result_to_firestore(user_id: str, contract_id: str,
     except Exception as e:
         print(f"❌ OCR 결과 저장 실패: {e}")
         return False
+
+
+def build_ocr_page_records(user_id: str, document_type: str, result: Dict, image_urls: List[str]) -> List[tuple]:
+    """
+    문서 하나의 OCR 결과를 페이지별 저장 데이터로 변환
+
+    Args:
+        user_id (str): 사용자 ID
+        document_type (str): 문서 타입
+        result (Dict): {"page1": {...}, ...} 형태의 OCR 결과
+        image_urls (List[str]): 문서 타입의 이미지 URL 리스트
+
+    Returns:
+        List[tuple]: (페이지 번호, 저장할 데이터) 리스트
+    """
+    records = []
+    for page_key, page_result in result.items():
+        page_num = int(page_key.replace('page', ''))
+        page_url = next((url for url in image_urls if f"page{page_num}" in url), None)
+        current_time = datetime.now(timezone.utc)
+        records.append((page_num, {
+            "pageNumber": page_num,
+            "document_type": document_type,
+            "userId": user_id,
+            "status": "completed",
+            "createdAt": current_time,
+            "updatedAt": current_time,
+            "imageUrl": page_url,
+            "ocr_result": page_result
+        }))
+    return records
+
+
+def save_ocr_results_batch(user_id: str, contract_id: str, page_records: Dict[str, List[tuple]],
+                           combined_data: Optional[Dict] = None, client=None) -> bool:
+    """
+    페이지별 OCR 결과와 통합 결과를 WriteBatch 한 번으로 저장 (모두 저장되거나 모두 실패)
+
+    Args:
+        user_id (str): 사용자 ID
+        contract_id (str): 계약 ID
+        page_records (Dict[str, List[tuple]]): {문서 타입: build_ocr_page_records 결과}
+        combined_data (Dict): combined_analysis 문서에 저장할 통합 결과 (없으면 저장하지 않음)
+        client: Firestore 클라이언트 (없으면 get_db(), 테스트에서는 FakeFirestore)
+
+    Returns:
+        bool: 저장 성공 여부
+    """
+    client = client or get_db()
+    results_ref = _ocr_results_collection(client, user_id, contract_id)
+
+    writes = []
+    for document_type, records in page_records.items():
+        for page_num, json_data in records:
+            writes.append((results_ref.document(f"{document_type}_page{page_num}"), json_data, False))
+    if combined_data is not None:
+        combined_data = dict(combined_data, createdAt=firestore.SERVER_TIMESTAMP, updatedAt=firestore.SERVER_TIMESTAMP)
+        writes.append((results_ref.document("combined_analysis"), combined_data, True))
+
+    if not writes:
+        return True
+    if len(writes) > FIRESTORE_BATCH_LIMIT:
+        # 한 배치에 담을 수 없으면 나눠서 저장 (배치 사이에는 원자성이 보장되지 않음)
+        print(f"⚠️ 저장할 문서 {len(writes)}개가 배치 한도({FIRESTORE_BATCH_LIMIT})를 넘어 나눠서 저장합니다.")
+
+    try:
+        for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT):
+            batch = client.batch()
+            for doc_ref, json_data, merge in writes[start:start + FIRESTORE_BATCH_LIMIT]:
+                batch.set(doc_ref, json_data, merge=merge)
+            batch.commit()
+
+        page_count = sum(len(records) for records in page_records.values())
+        print(f"✅ OCR 결과 일괄 저장 완료: {page_count}페이지" + (" + 통합 결과" if combined_data is not None else ""))
+        return True
+
+    except Exception as e:
+        print(f"❌ OCR 결과 일괄 저장 실패: {e}")
+        return False
     
 """
 # 목표 구조 - 추후 구현을 위해 주석 처리
@@ -108,27 +237,15 @@ def save_ocr_result_to_analyses(user_id, contract_id, document_type, page_number
 """
 
 
-from firebase_admin import firestore
-from typing import Dict, Optional
-import json
-from django.http import JsonResponse
-db = firestore.client()
-
-
 def get_latest_analysis_results(user_id: str, contract_id: str, 
-                              document_type: str) -> Optional[Dict]:
+                              document_type: str, client=None) -> Optional[Dict]:
     """
     Firestore에서 최신 OCR 결과 가져오기
     """
+    client = client or get_db()
     try:
         # OCR 결과 문서 가져오기
-        results_ref = (
-            db.collection("users")
-            .document(user_id)
-            .collection("contracts")
-            .document(contract_id)
-            .collection("ocr_results")
-        )
+        results_ref = _ocr_results_collection(client, user_id, contract_id)
         
         # 해당 문서 타입의 모든 페이지 결과 가져오기
         query = results_ref.where("document_type", "==", document_type)
@@ -145,6 +262,50 @@ def get_latest_analysis_results(user_id: str, contract_id: str,
     except Exception as e:
         print(f"❌ OCR 결과 조회 실패: {e}")
         return None
+
+
+def get_ocr_results(user_id: str, contract_id: str, document_types: List[str],
+                    known_results: Optional[Dict] = None, client=None) -> Dict[str, Dict]:
+    """
+    AI 분석에 사용할 문서 타입별 OCR 결과 조회
+    이번 실행에서 OCR한 결과(known_results)는 Firestore에서 다시 읽지 않고 그대로 사용하고,
+    없는 문서 타입만 한 번의 쿼리로 Firestore에서 가져온다.
+
+    Args:
+        user_id (str): 사용자 ID
+        contract_id (str): 계약 ID
+        document_types (List[str]): 필요한 문서 타입 리스트
+        known_results (Dict): {문서 타입: {"page1": {...}}} 메모리에 있는 OCR 결과
+        client: Firestore 클라이언트 (없으면 get_db())
+
+    Returns:
+        Dict[str, Dict]: {문서 타입: 페이지별 결과}. 결과를 찾지 못한 타입은 포함되지 않음
+    """
+    known_results = known_results or {}
+    # 분석 단계에서 결과를 수정하므로 저장된 결과와 분리된 사본 사용
+    results = {
+        document_type: copy.deepcopy(known_results[document_type])
+        for document_type in document_types if known_results.get(document_type)
+    }
+    missing = [document_type for document_type in document_types if document_type not in results]
+    if not missing:
+        return results
+
+    client = client or get_db()
+    try:
+        query = _ocr_results_collection(client, user_id, contract_id).where(
+            filter=FieldFilter("document_type", "in", missing)
+        )
+        for doc in query.stream():
+            data = doc.to_dict()
+            if "ocr_result" in data:
+                results.setdefault(data["document_type"], {})[f"page{data['pageNumber']}"] = data["ocr_result"]
+        print(f"📊 OCR 결과 Firestore 조회: {missing}")
+    except Exception as e:
+        print(f"❌ OCR 결과 조회 실패: {e}")
+
+    return results
+
 def save_summary_to_firestore(user_id, contract_id, summary_data):
     """
     요약 결과를 Firestore에 저장하는 함수
@@ -158,7 +319,7 @@ def save_summary_to_firestore(user_id, contract_id, summary_data):
         bool: 저장 성공 여부
     """
     try:
-        from firebase_api.utils import db
+        db = get_db()
         
         # 'summaries' 컬렉션에 저장
         summary_ref = db.collection('users').document(user_id)\
@@ -175,17 +336,11 @@ def save_summary_to_firestore(user_id, contract_id, summary_data):
         return False
 
 
-def save_combined_results(user_id: str, contract_id: str, combined_data: Dict) -> bool:
+def save_combined_results(user_id: str, contract_id: str, combined_data: Dict, client=None) -> bool:
     """통합된 OCR 결과를 Firestore에 저장"""
+    client = client or get_db()
     try:
-        doc_ref = (
-            db.collection("users")
-            .document(user_id)
-            .collection("contracts")
-            .document(contract_id)
-            .collection("ocr_results")
-            .document("combined_analysis")
-        )
+        doc_ref = _ocr_results_collection(client, user_id, contract_id).document("combined_analysis")
         combined_data['createdAt'] = firestore.SERVER_TIMESTAMP
         combined_data['updatedAt'] = firestore.SERVER_TIMESTAMP
         
@@ -199,7 +354,8 @@ def save_combined_results(user_id: str, contract_id: str, combined_data: Dict) -
         return False
     
     
-def save_analysis_result(user_id: str, contract_id: str, analysis_result: Dict, image_urls: Dict[str, list[str]]) -> bool:
+def save_analysis_result(user_id: str, contract_id: str, analysis_result: Dict, image_urls: Dict[str, list[str]],
+                         image_store=None) -> bool:
     """
     AI 분석 결과를 AI_analysis 컬렉션에 저장
     
@@ -208,6 +364,7 @@ def save_analysis_result(user_id: str, contract_id: str, analysis_result: Dict,
         contract_id (str): 계약서 ID
         analysis_result (Dict): 분석 결과 데이터
         image_urls (Dict[str, List[str]]): 문서 타입별 이미지 URL 리스트
+        image_store: OCR 단계에서 받아 둔 ai_processing의 ImageStore (없으면 이미지를 내려받아 크기 측정)
         
     Returns:
         bool: 저장 성공 여부
@@ -225,13 +382,14 @@ def save_analysis_result(user_id: str, contract_id: str, analysis_result: Dict,
                 page_key = f"page{page_num}"
                 
                 if page_key in analysis_result[doc_type]:
+                    width, height = get_page_size(url, image_store)
                     analysis_result[doc_type][page_key]["image_dimensions"] = {
-                        "width": get_page_width(url),
-                        "height": get_page_height(url)
+                        "width": width,
+                        "height": height
                     }
                     
         doc_ref = (
-            db.collection("users")
+            get_db().collection("users")
             .document(user_id)
             .collection("contracts")
             .document(contract_id)
@@ -254,21 +412,24 @@ def save_analysis_result(user_id: str, contract_id: str, analysis_result: Dict,
         print(f"❌ AI 분석 결과 저장 실패: {e}")
         return False
     
-def update_analysis_status(user_id: str, contract_id: str, status: str):
-    """contract 문서의 analysisStatus 필드만 업데이트"""
+def update_analysis_status(user_id: str, contract_id: str, status: str, stage: Optional[str] = None):
+    """contract 문서의 analysisStatus 필드(및 진행 단계 analysisStage)만 업데이트"""
     try:
         contract_ref = (
-            db.collection("users")
+            get_db().collection("users")
             .document(user_id)
             .collection("contracts")
             .document(contract_id)
         )
         
-        contract_ref.update({
+        update_data = {
             "analysisStatus": status,
             "updatedAt": firestore.SERVER_TIMESTAMP
-        })
-        print(f"✅ 분석 상태 업데이트: {status}")
+        }
+        if stage:
+            update_data["analysisStage"] = stage
+        contract_ref.update(update_data)
+        print(f"✅ 분석 상태 업데이트: {status}" + (f" ({stage})" if stage else ""))
         return True
 
     except Exception as e:
@@ -276,26 +437,46 @@ def update_analysis_status(user_id: str, contract_id: str, status: str):
         return False
     
 
-def get_page_height(url: str) -> int:
+def get_page_size(url: str, image_store=None) -> tuple:
     """
-    이미지 URL로부터 높이를 가져오는 함수
+    이미지 URL로부터 (너비, 높이)를 한 번에 가져오는 함수
     
     Args:
         url (str): 이미지 URL
+        image_store: get_size(url)를 제공하는 이미지 저장소 (ai_processing의 ImageStore).
+            있으면 이미 받은 이미지나 헤더만 읽어 크기를 구하고, 없으면 이미지를 내려받아 측정
         
     Returns:
-        int: 이미지 높이. 실패 시 기본값 1755 반환
+        tuple: (너비, 높이). 실패 시 기본값 (1240, 1755) 반환
     """
     try:
-        response = requests.get(url)
+        if image_store is not None:
+            size = image_store.get_size(url)
+            if size:
+                return size
+            return 1240, 1755
+
+        response = requests.get(url, timeout=30)
         if response.status_code == 200:
             with Image.open(BytesIO(response.content)) as img:
-                return img.height
+                return img.size
         print(f"❌ 이미지 다운로드 실패 (상태 코드: {response.status_code})")
-        return 1755
+        return 1240, 1755
     except Exception as e:
-        print(f"❌ 이미지 높이 측정 실패: {e}")
-        return 1755
+        print(f"❌ 이미지 크기 측정 실패: {e}")
+        return 1240, 1755
+
+def get_page_height(url: str) -> int:
+    """
+    이미지 URL로부터 높이를 가져오는 함수
+    
+    Args:
+        url (str): 이미지 URL
+        
+    Returns:
+        int: 이미지 높이. 실패 시 기본값 1755 반환
+    """
+    return get_page_size(url)[1]
 
 def get_page_width(url: str) -> int:
     """
@@ -307,13 +488,4 @@ def get_page_width(url: str) -> int:
     Returns:
         int: 이미지 너비. 실패 시 기본값 1240 반환
     """
-    try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            with Image.open(BytesIO(response.content)) as img:
-                return img.width
-        print(f"❌ 이미지 다운로드 실패 (상태 코드: {response.status_code})")
-        return 1240
-    except Exception as e:
-        print(f"❌ 이미지 너비 측정 실패: {e}")
-        return 1240
+    return get_page_size(url)[0]
@@ -2,27 +2,13 @@ import os
 import requests
 from io import BytesIO
 from PIL import Image, ImageDraw, ImageFont
-import matplotlib.pyplot as plt
 import numpy as np
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
+from firebase_admin import firestore
 import json
 import datetime
 import uuid
 import tempfile
-
-# Firebase 설정
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-FIREBASE_KEY_PATH = os.path.join(BASE_DIR, "firebase_key.json")
-
-# Firebase 앱 초기화 (이미 초기화되지 않았다면)
-if not firebase_admin._apps:
-    cred = credentials.Certificate(FIREBASE_KEY_PATH)
-    firebase_admin.initialize_app(cred, {
-        'storageBucket': 'jibsin.firebasestorage.app'  # Firebase 스토리지 버킷 이름
-    })
-db = firestore.client()
-bucket = storage.bucket()
+from .client import get_bucket, get_db
 
 def upload_image_to_firebase(image, user_id, contract_id, doc_type, page_num):
     """
@@ -49,7 +35,7 @@ def upload_image_to_firebase(image, user_id, contract_id, doc_type, page_num):
         storage_path = f"bounding_box_images/{user_id}/{contract_id}/{doc_type}_page{page_num}_{timestamp}.png"
         
         # 이미지 업로드
-        blob = bucket.blob(storage_path)
+        blob = get_bucket().blob(storage_path)
         blob.upload_from_filename(temp_filename)
         
         # 임시 파일 삭제
@@ -85,7 +71,7 @@ def save_bounding_box_info_to_firestore(user_id, contract_id, doc_type, page_num
     try:
         # bounding_box_images 컬렉션 참조
         doc_ref = (
-            db.collection("users")
+            get_db().collection("users")
             .document(user_id)
             .collection("contracts")
             .document(contract_id)
@@ -113,7 +99,7 @@ def save_bounding_box_info_to_firestore(user_id, contract_id, doc_type, page_num
         traceback.print_exc()
         return False
 
-def process_image_with_boxes_and_upload(image_url, ocr_result, doc_type, page_num, user_id, contract_id):
+def process_image_with_boxes_and_upload(image_url, ocr_result, doc_type, page_num, user_id, contract_id, image_store=None):
     """
     이미지를 다운로드하고 바운딩 박스를 그린 후 Firebase에 업로드합니다.
     
@@ -124,18 +110,23 @@ def process_image_with_boxes_and_upload(image_url, ocr_result, doc_type, page_nu
         page_num (int): 페이지 번호
         user_id (str): 사용자 ID
         contract_id (str): 계약서 ID
+        image_store: get_image(url)를 제공하는 ai_processing의 ImageStore (없으면 직접 다운로드)
     """
     try:
         print(f"{doc_type} 페이지 {page_num} 처리 중...")
         print(f"이미지 URL: {image_url}")
         
-        # 이미지 다운로드
-        response = requests.get(image_url)
-        if response.status_code != 200:
-            print(f"이미지 다운로드 실패 (상태 코드: {response.status_code})")
-            return
-            
-        image = Image.open(BytesIO(response.content))
+        # 이미지 다운로드 (저장소가 있으면 이미 받은 이미지를 가져옴)
+        if image_store is not None:
+            image = image_store.get_image(image_url)
+            if image is None:
+                return
+        else:
+            response = requests.get(image_url, timeout=30)
+            if response.status_code != 200:
+                print(f"이미지 다운로드 실패 (상태 코드: {response.status_code})")
+                return
+            image = Image.open(BytesIO(response.content))
         
         # 바운딩 박스 그리기
         draw = ImageDraw.Draw(image)
@@ -167,7 +158,8 @@ def process_image_with_boxes_and_upload(image_url, ocr_result, doc_type, page_nu
             if save_success:
                 print(f"Firebase에 {doc_type} 페이지 {page_num}의 바운딩 박스 이미지가 업로드되었습니다.")
             
-        # 미리보기 표시
+        # 미리보기 표시 (matplotlib은 미리보기에서만 사용하므로 여기서 import)
+        import matplotlib.pyplot as plt
         plt.figure(figsize=(12, 16))
         plt.imshow(np.array(image))
         plt.axis('off')
@@ -383,7 +375,7 @@ def fetch_document_urls_from_ocr_results(user_id, contract_id):
     try:
         # ocr_results 컬렉션 참조
         ocr_results_ref = (
-            db.collection("users")
+            get_db().collection("users")
             .document(user_id)
             .collection("contracts")
             .document(contract_id)
@@ -422,13 +414,14 @@ def fetch_document_urls_from_ocr_results(user_id, contract_id):
         print(f"ocr_results에서 URL 가져오기 실패: {str(e)}")
         return {}, {}
 
-def visualize_bounding_boxes_and_upload(user_id, contract_id):
+def visualize_bounding_boxes_and_upload(user_id, contract_id, image_store=None):
     """
     Firebase에서 이미지와 OCR 결과를 가져와 바운딩 박스를 시각화하고 업로드합니다.
     
     Args:
         user_id (str): 사용자 ID
         contract_id (str): 계약서 ID
+        image_store: 분석 단위로 공유하는 ai_processing의 ImageStore (없으면 페이지마다 직접 다운로드)
     """
     try:
         # 1. Firestore에서 문서 URL 가져오기
@@ -436,7 +429,7 @@ def visualize_bounding_boxes_and_upload(user_id, contract_id):
         
         # 계약서 문서 확인
         contract_ref = (
-            db.collection("users")
+            get_db().collection("users")
             .document(user_id)
             .collection("contracts")
             .document(contract_id)
@@ -559,7 +552,7 @@ def visualize_bounding_boxes_and_upload(user_id, contract_id):
                 
                 # 이미지 다운로드 및 바운딩 박스 그리기 후 Firebase에 업로드
                 process_image_with_boxes_and_upload(
-                    page_url, ocr_result, doc_type, page_num, user_id, contract_id
+                    page_url, ocr_result, doc_type, page_num, user_id, contract_id, image_store
                 )
                 processed_any = True
         
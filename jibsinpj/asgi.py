@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jibsinpj.settings')
 
 application = get_asgi_application()
+
+# 분석 작업 워커 스레드를 프로세스 시작 시 시작 (재시작 전에 남은 queued 작업을 첫 요청 전에 처리)
+from ai_processing.jobs import start_workers  # noqa: E402
+
+start_workers()
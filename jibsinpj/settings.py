@@ -2,8 +2,6 @@
 from pathlib import Path
 import os
 import json
-import firebase_admin
-from firebase_admin import credentials, storage
 from dotenv import load_dotenv
 
 
@@ -24,10 +22,7 @@ if os.path.exists(FIREBASE_KEY_PATH):
 else:
     FIREBASE_CONFIG = None
 
-# Firebase 앱 초기화
-if not firebase_admin._apps:
-    cred = credentials.Certificate(FIREBASE_KEY_PATH)
-    firebase_admin.initialize_app(cred, {"storageBucket": FIREBASE_STORAGE_BUCKET})
+# Firebase 앱은 처음 사용할 때 firebase_api/client.py에서 초기화
 
 # Firebase 앱 초기화
 
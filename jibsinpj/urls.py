@@ -1,10 +1,12 @@
 
 from django.contrib import admin
 from django.urls import path, include
+from ai_processing.views import metrics
 
 urlpatterns = [
     path( "", include("intro.urls")),
     path('admin/', admin.site.urls),
     path("api/", include("firebase_api.urls")),
     path("ai/", include("ai_processing.urls")),
+    path("metrics", metrics, name="metrics"),
 ]